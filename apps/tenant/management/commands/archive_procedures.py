@@ -0,0 +1,39 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.tramite.core.partitions import archive_procedures, closed_procedures
+
+class Command(BaseCommand):
+
+    help = (
+        "Mueve los flujos de los trámites cerrados (finalizados o anulados) sin movimientos "
+        "en los últimos FLOW_ARCHIVE_DAYS días a las particiones de archivo: dejan de "
+        "aparecer en las bandejas y siguen en el historial y los PDF (programar cada semana)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.FLOW_ARCHIVE_DAYS)
+        parser.add_argument("--batch-size", type=int, default=500, help="Trámites por transacción")
+        parser.add_argument("--limit", type=int, default=None, help="Máximo de trámites a archivar")
+        parser.add_argument("--dry-run", action="store_true", help="Solo cuenta los trámites a archivar")
+
+    def handle(self, *args, **options):
+
+        cutoff = timezone.now() - timedelta(days=options["days"])
+
+        if options["dry_run"]:
+            total = closed_procedures(cutoff).count()
+            self.stdout.write(f"{total} trámites cerrados antes del {timezone.localdate(cutoff):%d/%m/%Y}")
+            return
+
+        start = time.perf_counter()
+        result = archive_procedures(cutoff, batch_size=options["batch_size"], limit=options["limit"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Archivados {result['procedures']} trámites ({result['flows']} movimientos) "
+            f"en {time.perf_counter() - start:.1f}s"
+        ))
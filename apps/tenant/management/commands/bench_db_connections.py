@@ -0,0 +1,81 @@
+import copy
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.utils import ConnectionHandler
+
+
+class Command(BaseCommand):
+
+    help = "Mide la latencia por petición con y sin reutilización de conexiones a PostgreSQL"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=300)
+        parser.add_argument("--queries", type=int, default=5, help="Consultas por petición simulada")
+
+    def handle(self, *args, **options):
+
+        base = copy.deepcopy(settings.DATABASES["default"])
+        base["OPTIONS"].pop("pool", None)
+
+        modes = {
+            "sin_reutilizar": {**base, "CONN_MAX_AGE": 0},
+            "persistente": {**base, "CONN_MAX_AGE": 600, "CONN_HEALTH_CHECKS": True},
+        }
+
+        pool_options = settings.DATABASES["default"]["OPTIONS"].get("pool")
+        if pool_options:
+            modes["pool"] = {
+                **base,
+                "CONN_MAX_AGE": 0,
+                "OPTIONS": {**base["OPTIONS"], "pool": pool_options},
+            }
+        else:
+            self.stdout.write(self.style.WARNING(
+                "psycopg 3 / psycopg_pool no disponible: se omite el modo pool"
+            ))
+
+        for name, db_settings in modes.items():
+            alias = f"bench_{name}"
+            handler = ConnectionHandler({"default": base, alias: db_settings})
+            connection = handler[alias]
+
+            try:
+                times = self.run(connection, options["requests"], options["queries"])
+            finally:
+                connection.close()
+                if hasattr(connection, "close_pool"):
+                    connection.close_pool()
+
+            self.report(name, times)
+
+    def run(self, connection, total, queries):
+
+        times = []
+
+        for _ in range(total):
+            start = time.perf_counter()
+
+            # 🔁 Igual que Django: request_started / request_finished
+            connection.close_if_unusable_or_obsolete()
+            with connection.cursor() as cursor:
+                for _ in range(queries):
+                    cursor.execute("SELECT 1")
+                    cursor.fetchone()
+            connection.close_if_unusable_or_obsolete()
+
+            times.append(time.perf_counter() - start)
+
+        return times
+
+    def report(self, name, times):
+
+        times = sorted(times)
+        p95 = times[int(len(times) * 0.95) - 1]
+
+        self.stdout.write(
+            f"{name:<15} media {statistics.mean(times) * 1000:.2f} ms | "
+            f"p50 {statistics.median(times) * 1000:.2f} ms | p95 {p95 * 1000:.2f} ms"
+        )
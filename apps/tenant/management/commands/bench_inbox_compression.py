@@ -0,0 +1,83 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from rest_framework.authtoken.models import Token
+
+from apps.tramite.models import UserArea
+
+INBOX_URLS = [
+    "/api/pending/",
+    "/api/reception/",
+    "/api/sent/",
+    "/api/copies/",
+    "/api/finalize/",
+    "/api/list-tramite/",
+]
+
+ENCODINGS = {
+    "identity": "identity",
+    "gzip": "gzip",
+    "br": "br, gzip",
+}
+
+
+class Command(BaseCommand):
+
+    help = "Mide tamaño de respuesta y latencia de las bandejas con y sin compresión"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--username", required=True)
+        parser.add_argument("--area", type=int, help="Área activa (X-Area-Id); por defecto la primera del usuario")
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--bandwidth", type=float, default=2000, help="Enlace simulado en kbit/s")
+
+    def handle(self, *args, **options):
+
+        user_area = (
+            UserArea.objects
+            .select_related("user")
+            .filter(user__username=options["username"])
+            .order_by("area_id")
+        )
+        if options["area"]:
+            user_area = user_area.filter(area_id=options["area"])
+
+        user_area = user_area.first()
+        if not user_area:
+            raise CommandError("El usuario no tiene el área indicada")
+
+        token, _ = Token.objects.get_or_create(user=user_area.user)
+        client = Client(
+            HTTP_AUTHORIZATION=f"Token {token.key}",
+            HTTP_X_AREA_ID=str(user_area.area_id),
+        )
+
+        bytes_per_second = options["bandwidth"] * 1000 / 8
+
+        for url in INBOX_URLS:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{url}?page_size={options['page_size']}"))
+
+            for label, accept in ENCODINGS.items():
+                times = []
+                size = 0
+
+                for _ in range(options["repeat"]):
+                    start = time.perf_counter()
+                    response = client.get(
+                        url,
+                        {"page_size": options["page_size"]},
+                        HTTP_ACCEPT_ENCODING=accept
+                    )
+                    times.append(time.perf_counter() - start)
+                    size = len(response.content)
+
+                server_ms = statistics.median(times) * 1000
+                transfer_ms = size / bytes_per_second * 1000
+
+                self.stdout.write(
+                    f"  {label:<9} {size / 1024:>9.1f} KB | servidor {server_ms:>7.1f} ms | "
+                    f"transferencia {transfer_ms:>8.1f} ms | total {server_ms + transfer_ms:>8.1f} ms"
+                )
@@ -0,0 +1,111 @@
+import json
+import statistics
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from rest_framework.authtoken.models import Token
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from apps.tramite.core.renderers import ORJSONParser, ORJSONRenderer
+from apps.tramite.models import UserArea
+
+from apps.tenant.management.commands.bench_inbox_compression import INBOX_URLS
+
+
+class Command(BaseCommand):
+
+    help = "Compara JSONRenderer/JSONParser de DRF con orjson sobre páginas reales de las bandejas"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--username", help="Usuario con el que se graban las bandejas")
+        parser.add_argument("--area", type=int, help="Área activa (X-Area-Id); por defecto la primera del usuario")
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument("--repeat", type=int, default=50)
+        parser.add_argument("--save", help="Guarda los payloads grabados en este archivo")
+        parser.add_argument("--load", help="Usa payloads grabados previamente en vez de consultar las bandejas")
+
+    def handle(self, *args, **options):
+
+        if options["load"]:
+            with open(options["load"], encoding="utf-8") as fh:
+                payloads = json.load(fh)
+        elif options["username"]:
+            payloads = self.record(options)
+        else:
+            raise CommandError("Indique --username o --load")
+
+        if options["save"]:
+            with open(options["save"], "w", encoding="utf-8") as fh:
+                json.dump(payloads, fh, ensure_ascii=False)
+
+        renderers = {"drf": JSONRenderer(), "orjson": ORJSONRenderer()}
+        parsers = {"drf": JSONParser(), "orjson": ORJSONParser()}
+
+        for url, data in payloads.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{url} ({len(data.get('results', []))} filas)"))
+
+            for name in renderers:
+                render_times, content = self.time_render(renderers[name], data, options["repeat"])
+                parse_times = self.time_parse(parsers[name], content, options["repeat"])
+
+                self.stdout.write(
+                    f"  {name:<7} {len(content) / 1024:>8.1f} KB | "
+                    f"render {statistics.median(render_times) * 1000:>7.2f} ms | "
+                    f"parse {statistics.median(parse_times) * 1000:>7.2f} ms"
+                )
+
+    def record(self, options):
+
+        user_area = (
+            UserArea.objects
+            .select_related("user")
+            .filter(user__username=options["username"])
+            .order_by("area_id")
+        )
+        if options["area"]:
+            user_area = user_area.filter(area_id=options["area"])
+
+        user_area = user_area.first()
+        if not user_area:
+            raise CommandError("El usuario no tiene el área indicada")
+
+        token, _ = Token.objects.get_or_create(user=user_area.user)
+        client = Client(
+            HTTP_AUTHORIZATION=f"Token {token.key}",
+            HTTP_X_AREA_ID=str(user_area.area_id),
+        )
+
+        payloads = {}
+        for url in INBOX_URLS:
+            response = client.get(url, {"page_size": options["page_size"]})
+            if response.status_code != 200:
+                raise CommandError(f"{url} respondió {response.status_code}")
+            # Datos antes de renderizar: el mismo objeto que recibe el renderer
+            payloads[url] = response.data
+
+        return payloads
+
+    def time_render(self, renderer, data, repeat):
+
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            content = renderer.render(data)
+            times.append(time.perf_counter() - start)
+
+        return times, content
+
+    def time_parse(self, parser, content, repeat):
+
+        # El parser recibe un stream, como en request.data
+        times = []
+        for _ in range(repeat):
+            stream = BytesIO(content)
+            start = time.perf_counter()
+            parser.parse(stream, parser_context={"encoding": "utf-8"})
+            times.append(time.perf_counter() - start)
+
+        return times
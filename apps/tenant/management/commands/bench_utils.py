@@ -0,0 +1,368 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.template.loader import render_to_string
+from django.utils import timezone
+from weasyprint import HTML
+
+from apps.tramite.models import Agency, Company, Procedure, ProcedureFlow, ProcedureSequence
+from apps.tramite.utils import (
+    check_schedule,
+    generar_qr_base64,
+    generate_procedure_code,
+    generate_unique_tracking_code,
+    get_flow_global_status_display,
+    get_flow_status_display,
+    get_next_sequence,
+)
+
+def summarize(times):
+
+    times = sorted(times)
+
+    return {
+        "runs": len(times),
+        "mean_ms": statistics.mean(times) * 1000,
+        "median_ms": statistics.median(times) * 1000,
+        "p95_ms": times[max(int(len(times) * 0.95) - 1, 0)] * 1000,
+        "min_ms": times[0] * 1000,
+        "max_ms": times[-1] * 1000,
+    }
+
+def measure(fn, repeat, warmup=1):
+
+    for _ in range(warmup):
+        fn()
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    return summarize(times)
+
+def current_commit():
+
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Códigos de relleno 000000-199999
+FILL_CAPACITY = 200_000
+
+class Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+
+    help = (
+        "Micro-benchmarks de apps/tramite/utils.py y de los PDF (WeasyPrint); "
+        "guarda los resultados en JSON para comparar entre commits"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=200, help="Repeticiones de las funciones rápidas")
+        parser.add_argument("--pdf-repeat", type=int, default=5, help="Repeticiones por plantilla PDF")
+        parser.add_argument("--threads", default="1,4,16", help="Hilos concurrentes para generate_procedure_code")
+        parser.add_argument("--codes-per-thread", type=int, default=50)
+        parser.add_argument(
+            "--fill-levels", default="0,10000,100000",
+            help="Trámites con tracking_code insertados (y revertidos) antes de medir generate_unique_tracking_code"
+        )
+        parser.add_argument("--only", help="Solo los benchmarks cuyo nombre contiene este texto")
+        parser.add_argument("--output", help="Archivo JSON de resultados (por defecto bench-utils-<commit>.json)")
+        parser.add_argument("--compare", help="JSON de una corrida anterior para mostrar la diferencia")
+
+    def handle(self, *args, **options):
+
+        self.options = options
+        self.results = {}
+
+        benchmarks = [
+            ("generate_procedure_code", self.bench_procedure_code),
+            ("get_next_sequence", self.bench_next_sequence),
+            ("generate_unique_tracking_code", self.bench_tracking_code),
+            ("check_schedule", self.bench_check_schedule),
+            ("generar_qr_base64", self.bench_qr),
+            ("flow_status_display", self.bench_status_display),
+            ("pdf", self.bench_pdf),
+        ]
+
+        for name, bench in benchmarks:
+            if options["only"] and options["only"] not in name:
+                continue
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            bench()
+
+        commit = current_commit()
+        payload = {
+            "commit": commit,
+            "created_at": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "database": connection.vendor,
+            "options": {
+                key: options[key]
+                for key in ("repeat", "pdf_repeat", "threads", "codes_per_thread", "fill_levels")
+            },
+            "results": self.results,
+        }
+
+        output = Path(options["output"] or f"bench-utils-{commit or 'local'}.json")
+        output.write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
+        self.stdout.write(self.style.SUCCESS(f"Resultados en {output}"))
+
+        if options["compare"]:
+            self.compare(options["compare"])
+
+    def record(self, name, summary, **extra):
+
+        self.results[name] = {**summary, **extra}
+        self.stdout.write(
+            f"  {name:<48} p50 {summary['median_ms']:>9.3f} ms | "
+            f"p95 {summary['p95_ms']:>9.3f} ms | {summary['runs']} corridas"
+        )
+
+    # 🔢 Correlativos
+
+    def bench_procedure_code(self):
+        """
+        Corridas reales (confirmadas): select_for_update solo serializa entre transacciones distintas
+        """
+        agency = Agency.objects.create(name="bench_utils (temporal)")
+        per_thread = self.options["codes_per_thread"]
+
+        def worker(_):
+            times = []
+            try:
+                for _ in range(per_thread):
+                    start = time.perf_counter()
+                    code = generate_procedure_code(agency)
+                    times.append((time.perf_counter() - start, code))
+            finally:
+                connection.close()
+            return times
+
+        try:
+            for threads in [int(value) for value in self.options["threads"].split(",")]:
+                ProcedureSequence.objects.filter(agency=agency).delete()
+
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=threads) as pool:
+                    calls = [call for result in pool.map(worker, range(threads)) for call in result]
+                elapsed = time.perf_counter() - start
+
+                codes = [code for _, code in calls]
+                if len(set(codes)) != len(codes):
+                    raise CommandError(f"generate_procedure_code repitió códigos con {threads} hilos")
+
+                self.record(
+                    f"generate_procedure_code[threads={threads}]",
+                    summarize([duration for duration, _ in calls]),
+                    codes_per_second=len(codes) / elapsed,
+                )
+        finally:
+            agency.delete()
+
+    def bench_next_sequence(self):
+
+        procedure = (
+            Procedure.objects
+            .annotate(total=Count("flows"))
+            .order_by("-total")
+            .first()
+        )
+        if not procedure:
+            self.stdout.write(self.style.WARNING("  sin trámites: se omite"))
+            return
+
+        self.record(
+            "get_next_sequence",
+            measure(lambda: get_next_sequence(procedure), self.options["repeat"]),
+            flows=procedure.total,
+        )
+
+    def bench_tracking_code(self):
+        """
+        Mide con la tabla cada vez más llena; los trámites de relleno se revierten al final
+        """
+        levels = sorted(int(value) for value in self.options["fill_levels"].split(","))
+        template = Procedure.objects.filter(is_virtual=False).order_by("id").first()
+        if not template:
+            self.stdout.write(self.style.WARNING("  sin trámites de plantilla: se omite"))
+            return
+
+        if levels[-1] > FILL_CAPACITY:
+            raise CommandError(f"--fill-levels admite hasta {FILL_CAPACITY} trámites de relleno")
+
+        existing = Procedure.objects.exclude(tracking_code=None).count()
+        inserted = 0
+
+        try:
+            with transaction.atomic():
+                for level in levels:
+                    if level > inserted:
+                        self.fill_tracking_codes(template, inserted, level)
+                        inserted = level
+
+                    self.record(
+                        f"generate_unique_tracking_code[fill={existing + inserted}]",
+                        measure(generate_unique_tracking_code, self.options["repeat"]),
+                    )
+                raise Rollback
+        except Rollback:
+            pass
+
+    def fill_tracking_codes(self, template, start, stop, batch_size=5000):
+
+        # Empiezan con 0 o 1 (fuera del alfabeto de generate_tracking_code): no chocan con los reales
+        for offset in range(start, stop, batch_size):
+            Procedure.objects.bulk_create([
+                Procedure(
+                    code=f"BENCH-{n}",
+                    agency_id=template.agency_id,
+                    document_type_id=template.document_type_id,
+                    sender_name="bench_utils",
+                    from_area_id=template.from_area_id,
+                    to_area_id=template.to_area_id,
+                    subject="bench_utils",
+                    created_by_id=template.created_by_id,
+                    tracking_code=f"{n:06d}",
+                )
+                for n in range(offset, min(offset + batch_size, stop))
+            ])
+
+    # 🕘 Horario
+
+    def bench_check_schedule(self):
+
+        now = timezone.localtime()
+        cases = {
+            "now": now,
+            "sunday": now + timedelta(days=(6 - now.weekday()) % 7),
+            "night": now.replace(hour=23, minute=30),
+        }
+
+        for label, moment in cases.items():
+            self.record(
+                f"check_schedule[{label}]",
+                measure(lambda: check_schedule(moment), self.options["repeat"]),
+            )
+
+    def bench_qr(self):
+
+        self.record(
+            "generar_qr_base64",
+            measure(lambda: generar_qr_base64("https://tu-dominio.pe/seguimiento/ABC234"), self.options["repeat"]),
+        )
+
+    def bench_status_display(self):
+
+        flows = [
+            ProcedureFlow(status=status, is_to_finalize=to_finalize)
+            for status, _ in ProcedureFlow.STATUS_CHOICES
+            for to_finalize in (False, True)
+        ]
+
+        for fn in (get_flow_status_display, get_flow_global_status_display):
+            self.record(
+                f"{fn.__name__}[{len(flows)} flujos]",
+                measure(lambda: [fn(flow) for flow in flows], self.options["repeat"]),
+            )
+
+    # 🧾 PDF
+
+    def bench_pdf(self):
+
+        procedure = (
+            Procedure.objects
+            .select_related("created_by", "from_area", "to_area", "document_type")
+            .annotate(total=Count("flows"))
+            .order_by("-total")
+            .first()
+        )
+        if not procedure:
+            self.stdout.write(self.style.WARNING("  sin trámites: se omite"))
+            return
+
+        flows = list(
+            ProcedureFlow.objects
+            .filter(procedure=procedure, flow_type=ProcedureFlow.NORMAL)
+            .select_related("from_area", "to_area", "sent_by")
+            .order_by("sequence")
+        )
+
+        logo = Path(settings.MEDIA_ROOT) / "logo.png"
+        common = {
+            "company": Company.objects.first(),
+            "procedure": procedure,
+            "company_logo": logo.as_uri() if logo.exists() else "",
+        }
+
+        templates = {
+            "reports/procedure_history.html": {
+                **common,
+                "flows": [{"flow": flow, "status": get_flow_global_status_display(flow)} for flow in flows],
+            },
+            "reports/procedure_history_simple.html": {
+                **common,
+                "first_flow": flows[0] if flows else None,
+                "authorized_flow": flows[-1] if flows else None,
+                "first_flow_status": get_flow_status_display(flows[0]) if flows else None,
+                "authorized_flow_status": get_flow_status_display(flows[-1]) if flows else None,
+            },
+            "ticket/ticket.html": {
+                **common,
+                "codigo": "ABC234",
+                "qr_base64": generar_qr_base64("https://tu-dominio.pe/seguimiento/ABC234"),
+            },
+        }
+
+        base_url = Path(settings.BASE_DIR).as_uri()
+
+        for template, context in templates.items():
+            html_string = render_to_string(template, context)
+
+            self.record(
+                f"render_to_string[{template}]",
+                measure(lambda: render_to_string(template, context), self.options["repeat"]),
+            )
+            self.record(
+                f"write_pdf[{template}]",
+                measure(
+                    lambda: HTML(string=html_string, base_url=base_url).write_pdf(),
+                    self.options["pdf_repeat"],
+                ),
+                flows=len(flows),
+            )
+
+    def compare(self, path):
+
+        with open(path, encoding="utf-8") as fh:
+            previous = json.load(fh)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Comparación con {previous.get('commit') or path}"))
+
+        for name, result in self.results.items():
+            before = previous.get("results", {}).get(name)
+            if not before:
+                continue
+
+            change = (result["median_ms"] - before["median_ms"]) / before["median_ms"] * 100 if before["median_ms"] else 0
+            style = self.style.ERROR if change > 10 else self.style.SUCCESS if change < -10 else str
+            self.stdout.write(style(
+                f"  {name:<48} {before['median_ms']:>9.3f} → {result['median_ms']:>9.3f} ms ({change:+.1f}%)"
+            ))
@@ -0,0 +1,344 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from apps.tramite.models import (
+    Agency, Area, Document, Procedure, ProcedureFlow, ProcedureSequence, UserArea,
+)
+from apps.tramite.utils import generate_tracking_code
+from apps.user.models import User
+
+NR = ProcedureFlow.NORMAL
+CP = ProcedureFlow.COPY
+
+# Distribuciones del ciclo de vida (aprox. producción)
+ORIGIN_WEIGHTS = {"TE": 60, "TI": 30, "TV": 10}
+
+# Estado final del trámite en la última área que lo recibe
+OUTCOME_WEIGHTS = {
+    "pending": 15,      # SENT sin recepcionar
+    "received": 20,     # RECEIVED en bandeja
+    "finalized": 45,
+    "observed": 8,      # OBSERVED sin reenviar
+    "resent": 7,        # OBSERVED -> reenviado (SENT is_to_observed)
+    "rejected": 5,
+}
+
+COPY_PROBABILITY = 0.3
+DERIVE_CONTINUE = 0.45
+MAX_DERIVES = 6
+
+SUBJECTS = [
+    "Solicitud de licencia de funcionamiento",
+    "Informe técnico de obra",
+    "Requerimiento de bienes",
+    "Solicitud de acceso a la información pública",
+    "Reclamo por servicio de agua",
+    "Memorando de coordinación",
+    "Oficio de remisión de documentos",
+]
+
+@contextmanager
+def manual_timestamps(*models):
+    """
+    Permite fijar created_at en bulk_create (auto_now_add lo sobrescribiría con now())
+    """
+    fields = [model._meta.get_field("created_at") for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+def weighted_choice(rng, weights):
+
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+class Command(BaseCommand):
+
+    help = "Genera agencias, áreas, usuarios y trámites sintéticos (bulk_create) para pruebas de carga"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--agencies", type=int, default=3)
+        parser.add_argument("--areas", type=int, default=15, help="Áreas por agencia")
+        parser.add_argument("--users", type=int, default=2, help="Usuarios por área")
+        parser.add_argument("--procedures", type=int, default=100_000)
+        parser.add_argument("--days", type=int, default=365, help="Antigüedad máxima de los trámites")
+        parser.add_argument("--batch-size", type=int, default=2000, help="Trámites por transacción")
+        parser.add_argument("--seed", type=int, default=None)
+        parser.add_argument("--prefix", default="synth", help="Prefijo de usernames y nombres")
+
+    def handle(self, *args, **options):
+
+        rng = random.Random(options["seed"])
+        self.rng = rng
+        started = time.perf_counter()
+
+        documents = list(Document.objects.all())
+        if not documents:
+            raise CommandError("No hay tipos de documento: registre al menos uno")
+
+        agencies, areas_by_agency, users_by_area = self.create_structure(options)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(agencies)} agencias, {sum(map(len, areas_by_agency.values()))} áreas, "
+            f"{sum(map(len, users_by_area.values()))} usuarios"
+        ))
+
+        self.tracking_codes = set(
+            Procedure.objects.exclude(tracking_code=None).values_list("tracking_code", flat=True)
+        )
+        self.next_number = {
+            agency.id: self.last_number(agency) for agency in agencies
+        }
+
+        total = options["procedures"]
+        batch_size = options["batch_size"]
+        created_flows = 0
+
+        for offset in range(0, total, batch_size):
+            size = min(batch_size, total - offset)
+
+            with transaction.atomic():
+                created_flows += self.create_batch(
+                    size, agencies, areas_by_agency, users_by_area, documents, options
+                )
+
+            done = offset + size
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"  {done:>10,} trámites | {created_flows:>11,} flujos | "
+                f"{done / elapsed:,.0f} trámites/s"
+            )
+
+        # Correlativos: los trámites nuevos deben continuar después de los generados
+        year = timezone.now().year
+        for agency in agencies:
+            ProcedureSequence.objects.update_or_create(
+                agency=agency, year=year,
+                defaults={"last_number": self.next_number[agency.id]}
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Listo: {total:,} trámites y {created_flows:,} flujos en "
+            f"{time.perf_counter() - started:.1f}s"
+        ))
+
+    def create_structure(self, options):
+
+        prefix = options["prefix"]
+        run = timezone.now().strftime("%y%m%d%H%M%S")
+
+        agencies = Agency.objects.bulk_create([
+            Agency(name=f"{prefix} agencia {run}-{n}")
+            for n in range(options["agencies"])
+        ])
+
+        # Area.code es único de 3 dígitos: se continúa desde el mayor existente
+        last_code = max(
+            [int(code) for code in Area.objects.values_list("code", flat=True) if code.isdigit()],
+            default=0
+        )
+        needed = options["agencies"] * options["areas"]
+        if last_code + needed > 999:
+            raise CommandError(f"Area.code admite hasta 999 áreas; hay {last_code} y se piden {needed}")
+
+        types = list(ORIGIN_WEIGHTS)
+        areas = []
+        for agency in agencies:
+            for n in range(options["areas"]):
+                last_code += 1
+                areas.append(Area(
+                    name=f"{prefix} área {last_code:03d}",
+                    code=f"{last_code:03d}",
+                    # Una mesa de partes (TE) y una virtual (TV) por agencia; el resto internas
+                    type=types[n] if n < len(types) else "TI",
+                    agency=agency,
+                ))
+        areas = Area.objects.bulk_create(areas)
+
+        areas_by_agency = {}
+        for area in areas:
+            areas_by_agency.setdefault(area.agency_id, []).append(area)
+
+        # Un solo hash para todos (make_password es deliberadamente lento)
+        password = make_password(prefix)
+
+        users = []
+        user_areas = []
+        for area in areas:
+            for n in range(options["users"]):
+                username = f"{prefix}_{run}_{area.code}_{n}"
+                users.append(User(
+                    username=username,
+                    email=f"{username}@example.com",
+                    name=f"Usuario {area.code}-{n}",
+                    password=password,
+                    agency_id=area.agency_id,
+                ))
+        users = User.objects.bulk_create(users, batch_size=1000)
+
+        users_by_area = {}
+        per_area = options["users"]
+        for index, area in enumerate(areas):
+            for user in users[index * per_area:(index + 1) * per_area]:
+                users_by_area.setdefault(area.id, []).append(user)
+                user_areas.append(UserArea(user=user, area=area))
+
+        UserArea.objects.bulk_create(user_areas, batch_size=1000)
+
+        return agencies, areas_by_agency, users_by_area
+
+    def last_number(self, agency):
+
+        year = timezone.now().year
+        sequence = ProcedureSequence.objects.filter(agency=agency, year=year).first()
+        current = Procedure.objects.filter(agency=agency).count()
+
+        return max(sequence.last_number if sequence else 0, current)
+
+    def unique_tracking_code(self):
+
+        while True:
+            code = generate_tracking_code()
+            if code not in self.tracking_codes:
+                self.tracking_codes.add(code)
+                return code
+
+    def create_batch(self, size, agencies, areas_by_agency, users_by_area, documents, options):
+
+        rng = self.rng
+        now = timezone.now()
+        year = now.year
+        plans = []
+        procedures = []
+
+        for _ in range(size):
+            agency = rng.choice(agencies)
+            areas = areas_by_agency[agency.id]
+            origin_type = weighted_choice(rng, ORIGIN_WEIGHTS)
+
+            origin = next(area for area in areas if area.type == origin_type) if origin_type != "TI" else rng.choice(areas)
+            internal = [area for area in areas if area.type == "TI" and area != origin]
+            destination = rng.choice(internal)
+
+            created_at = now - timedelta(seconds=rng.randint(0, options["days"] * 86400))
+            author = rng.choice(users_by_area[origin.id])
+
+            self.next_number[agency.id] += 1
+            is_virtual = origin_type == "TV"
+
+            procedures.append(Procedure(
+                code=f"{self.next_number[agency.id]:06d}-{year}",
+                agency=agency,
+                document_type=rng.choice(documents),
+                document_number=str(rng.randint(1, 9999)),
+                folios=rng.randint(1, 40),
+                sender_dni=f"{rng.randint(10_000_000, 79_999_999)}",
+                sender_name=f"Remitente {rng.randint(1, 10**6)}",
+                from_area=origin,
+                to_area=destination,
+                subject=rng.choice(SUBJECTS),
+                is_virtual=is_virtual,
+                tracking_code=self.unique_tracking_code() if is_virtual else None,
+                created_by=author,
+                created_at=created_at,
+            ))
+            plans.append((origin, destination, internal, created_at))
+
+        with manual_timestamps(Procedure, ProcedureFlow):
+            Procedure.objects.bulk_create(procedures)
+
+            flows = []
+            for procedure, plan in zip(procedures, plans):
+                flows.extend(self.lifecycle(procedure, *plan, users_by_area))
+
+            ProcedureFlow.objects.bulk_create(flows, batch_size=5000)
+
+        return len(flows)
+
+    def lifecycle(self, procedure, origin, destination, internal, created_at, users_by_area):
+        """
+        Secuencia de flujos de un trámite, con la misma forma que generan los serializers:
+        envío -> (recepción -> derivación)* -> estado final; copias opcionales
+        """
+        rng = self.rng
+        flows = []
+        stamp = created_at
+
+        def user(area):
+            return rng.choice(users_by_area[area.id])
+
+        def add(status, from_area, to_area, **extra):
+            nonlocal stamp
+            stamp = stamp + timedelta(minutes=rng.randint(5, 60 * 48))
+            for flow in flows:
+                if flow.flow_type == NR:
+                    flow.is_active = False
+            flow = ProcedureFlow(
+                procedure=procedure,
+                sequence=len([f for f in flows if f.flow_type == NR]) + 1,
+                flow_type=NR,
+                status=status,
+                from_area=from_area,
+                to_area=to_area,
+                sent_by=user(from_area or to_area),
+                subject=procedure.subject,
+                is_active=True,
+                created_at=stamp,
+                **extra,
+            )
+            flows.append(flow)
+            return flow
+
+        first = add(ProcedureFlow.SENT, origin, destination)
+        first.created_at = created_at
+
+        if rng.random() < COPY_PROBABILITY:
+            for area in rng.sample(internal, k=min(len(internal), rng.randint(1, 2))):
+                if area != destination:
+                    flows.append(ProcedureFlow(
+                        procedure=procedure, sequence=1, flow_type=CP, status=ProcedureFlow.SENT,
+                        from_area=origin, to_area=area, sent_by=first.sent_by,
+                        subject=procedure.subject, is_active=True, created_at=created_at,
+                    ))
+
+        outcome = weighted_choice(rng, OUTCOME_WEIGHTS)
+        current = destination
+        sender = origin
+
+        if outcome == "pending":
+            return flows
+
+        if outcome == "rejected":
+            add(ProcedureFlow.REJECTED, current, current)
+            return flows
+
+        add(ProcedureFlow.RECEIVED, sender, current)
+
+        # 🔁 Cadena de derivaciones
+        derives = 0
+        while derives < MAX_DERIVES and rng.random() < DERIVE_CONTINUE:
+            target = rng.choice([area for area in internal if area != current] or [current])
+            add(ProcedureFlow.SENT, current, target, is_derive=True)
+            add(ProcedureFlow.RECEIVED, current, target, is_derive=True)
+            sender, current = current, target
+            derives += 1
+
+        if outcome == "finalized":
+            add(ProcedureFlow.FINALIZED, current, current, is_derive=derives > 0)
+
+        elif outcome in ("observed", "resent"):
+            add(ProcedureFlow.OBSERVED, current, current, comment="Falta documentación")
+            if outcome == "resent":
+                add(ProcedureFlow.SENT, sender, current, is_to_observed=True)
+
+        return flows
@@ -0,0 +1,258 @@
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from apps.tramite.models import Document, ProcedureFlow, UserArea
+
+from apps.tenant.management.commands.bench_inbox_compression import INBOX_URLS
+
+DEFAULT_MIX = "inbox=60,dashboard=20,register=10,transition=10"
+
+SCENARIOS = ("inbox", "dashboard", "register", "transition")
+
+def parse_mix(value):
+
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise CommandError(f"Escenario desconocido: {name} (válidos: {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+
+    if not any(mix.values()):
+        raise CommandError("La mezcla no tiene pesos positivos")
+
+    return mix
+
+def percentile(times, q):
+
+    if len(times) < 2:
+        return times[0] if times else 0
+
+    return statistics.quantiles(times, n=100, method="inclusive")[q - 1]
+
+class Command(BaseCommand):
+
+    help = (
+        "Reproduce contra un servidor local una mezcla de lecturas de bandeja, dashboard, "
+        "registros y recepciones; reporta throughput y p50/p95/p99"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--threads", type=int, default=16, help="Clientes concurrentes")
+        parser.add_argument("--requests", type=int, default=2000, help="Total de peticiones")
+        parser.add_argument("--duration", type=float, help="Segundos de prueba (ignora --requests)")
+        parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Pesos por escenario (por defecto {DEFAULT_MIX})")
+        parser.add_argument("--users", type=int, default=50, help="Usuarios/áreas distintos a simular")
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument("--prefix", default="synth", help="Prefijo de los usuarios de generate_synthetic_data")
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+
+        mix = parse_mix(options["mix"])
+        self.rng = random.Random(options["seed"])
+        self.base_url = options["base_url"].rstrip("/")
+        self.page_size = options["page_size"]
+
+        self.sessions = self.prepare_sessions(options)
+        self.pending = self.prepare_pending(mix)
+        self.documents = list(Document.objects.values_list("id", flat=True))
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+        scenarios = list(mix)
+        weights = list(mix.values())
+
+        self.stdout.write(
+            f"{len(self.sessions)} sesiones | {options['threads']} hilos | mezcla "
+            + ", ".join(f"{name}={weight:g}" for name, weight in mix.items())
+        )
+
+        results = defaultdict(list)
+        errors = defaultdict(int)
+        deadline = time.perf_counter() + options["duration"] if options["duration"] else None
+        remaining = [options["requests"]]
+
+        def next_task():
+            with self.lock:
+                if deadline is not None:
+                    if time.perf_counter() >= deadline:
+                        return None
+                elif remaining[0] <= 0:
+                    return None
+                else:
+                    remaining[0] -= 1
+                return self.rng.choices(scenarios, weights=weights)[0], self.rng.choice(self.sessions)
+
+        def worker():
+            http = requests.Session()
+            while (task := next_task()) is not None:
+                scenario, session = task
+                start = time.perf_counter()
+                try:
+                    ok = getattr(self, f"run_{scenario}")(http, session)
+                except requests.RequestException:
+                    ok = False
+                elapsed = time.perf_counter() - start
+                with self.lock:
+                    results[scenario].append(elapsed)
+                    if not ok:
+                        errors[scenario] += 1
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["threads"]) as pool:
+            for _ in range(options["threads"]):
+                pool.submit(worker)
+        elapsed = time.perf_counter() - start
+
+        self.report(results, errors, elapsed)
+
+    def prepare_sessions(self, options):
+        """
+        Un token por usuario (desde el ORM, sin pasar por /login/) y su área activa
+        """
+        user_areas = (
+            UserArea.objects
+            .select_related("user", "area")
+            .filter(user__is_active=True, user__username__startswith=options["prefix"], area__type="TI")
+            .order_by("?")[:options["users"]]
+        )
+
+        sessions = []
+        for user_area in user_areas:
+            token, _ = Token.objects.get_or_create(user=user_area.user)
+            sessions.append({
+                "headers": {
+                    "Authorization": f"Token {token.key}",
+                    "X-Area-Id": str(user_area.area_id),
+                },
+                "area": user_area.area,
+            })
+
+        if not sessions:
+            raise CommandError(
+                f"No hay usuarios '{options['prefix']}*' con áreas internas: ejecute generate_synthetic_data"
+            )
+
+        return sessions
+
+    def prepare_pending(self, mix):
+        """
+        Flujos SENT activos por área: cada recepción consume uno (no se repite)
+        """
+        if not mix.get("transition"):
+            return {}
+
+        areas = {session["area"].id for session in self.sessions}
+        pending = defaultdict(deque)
+
+        rows = (
+            ProcedureFlow.objects
+            .filter(
+                to_area_id__in=areas, is_active=True,
+                flow_type=ProcedureFlow.NORMAL, status=ProcedureFlow.SENT,
+            )
+            .values_list("to_area_id", "id")
+            .iterator()
+        )
+        for area_id, flow_id in rows:
+            pending[area_id].append(flow_id)
+
+        return pending
+
+    def get(self, http, session, url, **params):
+
+        response = http.get(f"{self.base_url}{url}", params=params, headers=session["headers"], timeout=60)
+        return response.status_code == 200
+
+    def run_inbox(self, http, session):
+
+        url = self.rng.choice(INBOX_URLS)
+        return self.get(http, session, url, page=1, page_size=self.page_size)
+
+    def run_dashboard(self, http, session):
+
+        return self.get(http, session, "/api/dashboard/flows/")
+
+    def run_register(self, http, session):
+
+        area = session["area"]
+        destinations = [
+            other["area"].id for other in self.sessions
+            if other["area"].agency_id == area.agency_id and other["area"].id != area.id
+        ]
+        if not destinations or not self.documents:
+            return False
+
+        payload = {
+            "agency": area.agency_id,
+            "from_area": area.id,
+            "destination_areas": [self.rng.choice(destinations)],
+            "document_type": self.rng.choice(self.documents),
+            "document_number": str(self.rng.randint(1, 9999)),
+            "subject": "Prueba de carga",
+            "folios": self.rng.randint(1, 20),
+            "sender_name": "Remitente de prueba",
+        }
+
+        response = http.post(
+            f"{self.base_url}/api/create-tramite/", json=payload, headers=session["headers"], timeout=60
+        )
+        return response.status_code in (200, 201)
+
+    def run_transition(self, http, session):
+
+        # Recepción: la transición más frecuente de la bandeja
+        with self.lock:
+            queue = self.pending.get(session["area"].id)
+            flow_id = queue.popleft() if queue else None
+
+        if flow_id is None:
+            # Sin pendientes en el área: cuenta como lectura de la bandeja de pendientes
+            return self.get(http, session, "/api/pending/", page=1, page_size=self.page_size)
+
+        response = http.post(
+            f"{self.base_url}/api/flows/{flow_id}/receive/", json={}, headers=session["headers"], timeout=60
+        )
+        return response.status_code == 200
+
+    def report(self, results, errors, elapsed):
+
+        total = sum(len(times) for times in results.values())
+        if not total:
+            raise CommandError("No se ejecutó ninguna petición")
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{'escenario':<11} {'peticiones':>10} {'errores':>8} {'req/s':>8} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+        ))
+
+        for scenario in SCENARIOS:
+            if scenario in results:
+                self.report_row(scenario, results[scenario], errors[scenario], elapsed)
+
+        self.report_row(
+            "total",
+            [t for times in results.values() for t in times],
+            sum(errors.values()),
+            elapsed,
+        )
+        self.stdout.write(f"Duración: {elapsed:.1f}s")
+
+    def report_row(self, label, times, errors, elapsed):
+
+        self.stdout.write(
+            f"{label:<11} {len(times):>10} {errors:>8} {len(times) / elapsed:>8.1f} "
+            f"{percentile(times, 50) * 1000:>8.1f} {percentile(times, 95) * 1000:>8.1f} "
+            f"{percentile(times, 99) * 1000:>8.1f}"
+        )
@@ -0,0 +1,70 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils.timezone import now
+
+from apps.tramite.core.attachments import process_files
+from apps.tramite.models import ProcedureFile
+
+class Command(BaseCommand):
+
+    help = (
+        "Genera miniatura, páginas y PDF optimizado de los adjuntos pendientes "
+        "(los que el pool en segundo plano no llegó a procesar y los existentes)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--batch-size", type=int, default=20)
+        parser.add_argument("--retry-failed", action="store_true", help="Incluye los que quedaron en FAILED")
+        parser.add_argument(
+            "--min-age", type=int, default=10,
+            help="Minutos de antigüedad mínima (evita competir con el pool de los workers web)"
+        )
+        parser.add_argument("--limit", type=int, default=None)
+
+    def handle(self, *args, **options):
+
+        statuses = [ProcedureFile.PENDING]
+        if options["retry_failed"]:
+            statuses.append(ProcedureFile.FAILED)
+
+        ids = list(
+            ProcedureFile.objects
+            .filter(
+                processing_status__in=statuses,
+                created_at__lt=now() - timedelta(minutes=options["min_age"])
+            )
+            .order_by("created_at")
+            .values_list("id", flat=True)[:options["limit"]]
+        )
+
+        if not ids:
+            self.stdout.write("No hay adjuntos pendientes.")
+            return
+
+        size = options["batch_size"]
+        batches = [ids[i:i + size] for i in range(0, len(ids), size)]
+        start = time.perf_counter()
+
+        def run(batch):
+            try:
+                process_files(batch)
+            finally:
+                close_old_connections()
+            return len(batch)
+
+        done = 0
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            for processed in pool.map(run, batches):
+                done += processed
+                self.stdout.write(f"  {done}/{len(ids)} adjuntos")
+
+        failed = ProcedureFile.objects.filter(id__in=ids, processing_status=ProcedureFile.FAILED).count()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Procesados {len(ids)} adjuntos en {time.perf_counter() - start:.1f}s ({failed} con error)"
+        ))
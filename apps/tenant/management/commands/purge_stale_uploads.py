@@ -0,0 +1,48 @@
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from apps.tramite.models import FileUpload
+
+class Command(BaseCommand):
+
+    help = "Elimina subidas por partes abandonadas (no asociadas a ningún trámite)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hours", type=int, default=settings.UPLOAD_STALE_HOURS)
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+
+        stale = FileUpload.objects.filter(
+            status__in=[FileUpload.UPLOADING, FileUpload.COMPLETE],
+            updated_at__lt=now() - timedelta(hours=options["hours"])
+        )
+
+        removed = 0
+        freed = 0
+
+        for upload in stale.iterator():
+            freed += upload.received
+            removed += 1
+
+            if options["dry_run"]:
+                continue
+
+            path = upload.file.path
+            upload.file.delete(save=False)
+            upload.delete()
+
+            # Carpeta propia de la subida (uploads/AAAA/MM/<id>/)
+            try:
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Se eliminarían' if options['dry_run'] else 'Eliminadas'} {removed} subidas "
+            f"({freed / 1024 / 1024:.1f} MB)"
+        ))
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.tramite.core.reports import refresh_area_daily_stats
+
+class Command(BaseCommand):
+
+    help = (
+        "Actualiza las tablas de reportes (AreaDailyStats) con los movimientos nuevos "
+        "desde la última ejecución y los días con trámites editados (programar cada noche). "
+        "Tras cambiar horarios o feriados, usar --full"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Reconstruye todas las fechas")
+
+    def handle(self, *args, **options):
+
+        start = time.perf_counter()
+        result = refresh_area_daily_stats(full=options["full"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Reportes actualizados: {result['days']} días, {result['rows']} filas "
+            f"(hasta el movimiento {result['last_flow_id']}) en {time.perf_counter() - start:.1f}s"
+        ))
@@ -0,0 +1,287 @@
+# core/analytics.py
+"""
+Análisis de tiempos de los movimientos (ProcedureFlow) con pandas / NumPy.
+
+Los flujos NORMAL se leen con una sola consulta ordenada por (trámite, secuencia)
+con cursor del lado del servidor, en bloques de ANALYTICS_CHUNK_SIZE filas, a un
+DataFrame columnar. Todo el cálculo es vectorizado (merge_asof, groupby, rank):
+no hay bucles de Python por trámite ni por flujo.
+
+Mismas definiciones que core/reports.py:
+- permanencia: desde el SENT que llega al área (sent_at si quedó fuera de horario)
+  hasta que el área deriva, finaliza, observa o rechaza, en horario laboral
+  (business_seconds), asignada al mes en que el trámite sale del área
+- derivación: las salidas SENT derivadas de una misma llegada; fan-out = destinos
+- reproceso: OBSERVED seguido del reenvío (SENT con is_to_observed), en el área que observó
+"""
+from datetime import date
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.db.models import FloatField
+from django.db.models.functions import Cast, Extract
+from django.utils import timezone
+
+from ..models import Area, AreaLeadTimeStats, ProcedureFlow, ReportCheckpoint
+from ..utils import load_work_calendar
+from .reports import day_start
+
+AREA_LEAD_TIME_STATS = "area_lead_time_stats"
+
+FLOW_COLUMNS = [
+    "id", "procedure_id", "sequence", "status", "from_area_id", "to_area_id",
+    "is_derive", "is_to_observed", "created_at", "sent_at",
+]
+
+# Fechas como segundos de la hora local (Extract convierte a TIME_ZONE): un float
+# por celda es varias veces más rápido de leer que un datetime con zona
+LOCAL_EPOCH = {
+    column: Cast(Extract(column, "epoch"), FloatField())
+    for column in ("created_at", "sent_at")
+}
+
+EXIT_STATUSES = [ProcedureFlow.FINALIZED, ProcedureFlow.REJECTED, ProcedureFlow.OBSERVED]
+
+SECONDS_PER_DAY = 86_400
+
+def load_flows(since=None):
+    """
+    DataFrame de los flujos NORMAL (de los trámites con movimientos desde since),
+    ordenado por trámite y secuencia; fechas en hora local sin zona
+    """
+    queryset = ProcedureFlow.all_objects.filter(flow_type=ProcedureFlow.NORMAL)
+
+    if since:
+        queryset = queryset.filter(
+            procedure_id__in=ProcedureFlow.all_objects.filter(created_at__gte=since).values("procedure_id")
+        )
+
+    rows = (
+        queryset
+        .order_by("procedure_id", "sequence", "id")
+        .values_list(*FLOW_COLUMNS[:-2], *LOCAL_EPOCH.values())
+        .iterator(chunk_size=settings.ANALYTICS_CHUNK_SIZE)
+    )
+
+    frames = []
+    while chunk := list(islice(rows, settings.ANALYTICS_CHUNK_SIZE)):
+        frames.append(pd.DataFrame.from_records(chunk, columns=FLOW_COLUMNS))
+
+    if not frames:
+        return pd.DataFrame(columns=FLOW_COLUMNS)
+
+    flows = pd.concat(frames, ignore_index=True)
+    flows["status"] = flows["status"].astype("category")
+
+    for column in LOCAL_EPOCH:
+        flows[column] = pd.to_datetime(flows[column], unit="s").dt.round("us")
+
+    return flows
+
+class BusinessClock:
+    """
+    Segundos de horario laboral acumulados desde el primer día del rango:
+    clock(fin) - clock(inicio) = business_seconds(inicio, fin) para arreglos completos
+    """
+
+    def __init__(self, first_day, last_day, calendar):
+
+        schedules, holidays = calendar
+        days = pd.date_range(first_day, last_day, freq="D")
+
+        opens = np.zeros(len(days))
+        closes = np.zeros(len(days))
+
+        for index, day in enumerate(days.date):
+            hours = schedules.get(day.weekday())
+            if hours and day.weekday() != 6 and day not in holidays:
+                opens[index] = hours[0].hour * 3600 + hours[0].minute * 60 + hours[0].second
+                closes[index] = hours[1].hour * 3600 + hours[1].minute * 60 + hours[1].second
+
+        self.origin = days[0].to_datetime64()
+        self.opens = opens
+        self.worked = np.maximum(closes - opens, 0)
+        # Segundos laborables antes de cada día
+        self.before = np.concatenate(([0], np.cumsum(self.worked)[:-1]))
+
+    def __call__(self, moments):
+
+        seconds = (moments.to_numpy(dtype="datetime64[ns]") - self.origin) / np.timedelta64(1, "s")
+        day = np.floor_divide(seconds, SECONDS_PER_DAY).astype(np.int64)
+        in_day = seconds - day * SECONDS_PER_DAY
+
+        return self.before[day] + np.clip(in_day - self.opens[day], 0, self.worked[day])
+
+    def between(self, start, end):
+
+        return np.maximum(self(end) - self(start), 0)
+
+def stays(flows, clock):
+    """
+    Una fila por permanencia terminada: área, llegada, salida, segundos y si fue derivación
+    """
+    sent = flows["status"] == ProcedureFlow.SENT
+
+    arrivals = flows.loc[sent, ["id", "procedure_id", "sequence", "to_area_id"]].rename(
+        columns={"id": "arrival_id", "to_area_id": "area_id"}
+    )
+    arrivals["arrived_at"] = flows.loc[sent, "sent_at"].fillna(flows.loc[sent, "created_at"])
+
+    leaving = flows["from_area_id"].notna() & (
+        (sent & ~flows["is_to_observed"]) | flows["status"].isin(EXIT_STATUSES)
+    )
+    exits = flows.loc[leaving, ["id", "procedure_id", "sequence", "from_area_id", "created_at"]].rename(
+        columns={"from_area_id": "area_id", "created_at": "left_at"}
+    )
+    exits["is_derive"] = (sent & flows["is_derive"])[leaving]
+
+    exits["area_id"] = exits["area_id"].astype(np.int64)
+    arrivals["area_id"] = arrivals["area_id"].astype(np.int64)
+
+    # Llegada: último envío al área con secuencia menor, en el mismo trámite
+    matched = pd.merge_asof(
+        exits.sort_values("sequence"),
+        arrivals.sort_values("sequence"),
+        on="sequence",
+        by=["procedure_id", "area_id"],
+        allow_exact_matches=False,
+        direction="backward",
+    ).dropna(subset=["arrival_id"])
+
+    # Fan-out: destinos de la derivación (todas las salidas de una misma llegada)
+    matched["fanout"] = matched.groupby("arrival_id")["id"].transform("size")
+
+    result = matched.sort_values(["arrival_id", "left_at"]).drop_duplicates("arrival_id")
+    result["seconds"] = clock.between(result["arrived_at"], result["left_at"])
+
+    return result[["area_id", "left_at", "seconds", "is_derive", "fanout"]]
+
+def rework_loops(flows, clock):
+    """
+    Una fila por observación reenviada: área que observó, reenvío y segundos hasta el reenvío
+    """
+    observed = flows.loc[flows["status"] == ProcedureFlow.OBSERVED, ["procedure_id", "sequence", "to_area_id", "created_at"]]
+    resent = flows.loc[
+        (flows["status"] == ProcedureFlow.SENT) & flows["is_to_observed"],
+        ["id", "procedure_id", "sequence", "created_at"]
+    ].rename(columns={"id": "resend_id", "created_at": "resent_at"})
+
+    matched = pd.merge_asof(
+        observed.sort_values("sequence"),
+        resent.sort_values("sequence"),
+        on="sequence",
+        by="procedure_id",
+        allow_exact_matches=False,
+        direction="forward",
+    ).dropna(subset=["resend_id"])
+
+    # Un reenvío cierra solo la última observación anterior
+    matched = matched.sort_values(["resend_id", "sequence"]).drop_duplicates("resend_id", keep="last")
+    matched["seconds"] = clock.between(matched["created_at"], matched["resent_at"])
+
+    return matched.rename(columns={"to_area_id": "area_id", "resent_at": "left_at"})[["area_id", "left_at", "seconds"]]
+
+def month_of(moments):
+
+    return moments.dt.to_period("M").dt.start_time
+
+def lead_time_stats(flows, calendar):
+    """
+    DataFrame por (área, mes) con las columnas de AreaLeadTimeStats
+    """
+    if flows.empty:
+        return pd.DataFrame()
+
+    moments = pd.concat([flows["created_at"], flows["sent_at"].dropna()])
+    clock = BusinessClock(moments.min().date(), moments.max().date(), calendar)
+
+    stay = stays(flows, clock)
+    stay["month"] = month_of(stay["left_at"])
+
+    grouped = stay.groupby(["area_id", "month"])["seconds"]
+    stats = pd.DataFrame({
+        "stays": grouped.size(),
+        "dwell_avg_seconds": grouped.mean(),
+        "dwell_p50_seconds": grouped.median(),
+        "dwell_p90_seconds": grouped.quantile(0.9),
+    })
+
+    derives = stay[stay["is_derive"]].groupby(["area_id", "month"])["fanout"]
+    stats["derives"] = derives.size()
+    stats["derive_fanout_avg"] = derives.mean()
+
+    rework = rework_loops(flows, clock)
+    rework["month"] = month_of(rework["left_at"])
+    loops = rework.groupby(["area_id", "month"])["seconds"]
+
+    stats = stats.join(
+        pd.DataFrame({"rework_loops": loops.size(), "rework_avg_seconds": loops.mean()}),
+        how="outer",
+    )
+
+    return stats.fillna(0).reset_index()
+
+def rank_bottlenecks(stats, agencies):
+
+    stats["agency_id"] = stats["area_id"].map(agencies)
+    ranked = stats[stats["stays"] > 0]
+
+    # Por agencia y mes: 1 = mayor p90 (las áreas sin agencia forman su propio grupo)
+    stats["bottleneck_rank"] = (
+        ranked
+        .groupby([ranked["agency_id"].fillna(-1), "month"])["dwell_p90_seconds"]
+        .rank(method="min", ascending=False)
+    )
+
+    return stats
+
+def refresh_area_lead_time_stats(since=None):
+    """
+    Recalcula AreaLeadTimeStats desde el mes de since (date) o completa
+    """
+    started = timezone.now()
+    since_month = date(since.year, since.month, 1) if since else None
+    checkpoint, _ = ReportCheckpoint.objects.get_or_create(name=AREA_LEAD_TIME_STATS)
+
+    flows = load_flows(day_start(since_month) if since_month else None)
+    stats = lead_time_stats(flows, load_work_calendar())
+
+    if not stats.empty:
+        stats = rank_bottlenecks(stats, dict(Area.objects.values_list("id", "agency_id")))
+        if since_month:
+            stats = stats[stats["month"] >= pd.Timestamp(since_month)]
+
+    rows = [
+        AreaLeadTimeStats(
+            agency_id=None if pd.isna(row.agency_id) else int(row.agency_id),
+            area_id=int(row.area_id),
+            month=row.month.date(),
+            stays=int(row.stays),
+            dwell_avg_seconds=round(row.dwell_avg_seconds),
+            dwell_p50_seconds=round(row.dwell_p50_seconds),
+            dwell_p90_seconds=round(row.dwell_p90_seconds),
+            bottleneck_rank=None if pd.isna(row.bottleneck_rank) else int(row.bottleneck_rank),
+            derives=int(row.derives),
+            derive_fanout_avg=round(float(row.derive_fanout_avg), 2),
+            rework_loops=int(row.rework_loops),
+            rework_avg_seconds=round(row.rework_avg_seconds),
+            refreshed_at=started,
+        )
+        for row in stats.itertuples(index=False)
+    ]
+
+    with transaction.atomic():
+        existing = AreaLeadTimeStats.objects.all()
+        if since_month:
+            existing = existing.filter(month__gte=since_month)
+        existing.delete()
+        AreaLeadTimeStats.objects.bulk_create(rows, batch_size=1000)
+
+    checkpoint.last_flow_id = int(flows["id"].max()) if len(flows) else checkpoint.last_flow_id
+    checkpoint.refreshed_at = started
+    checkpoint.save(update_fields=["last_flow_id", "refreshed_at"])
+
+    return {"flows": len(flows), "rows": len(rows)}
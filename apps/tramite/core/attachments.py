@@ -0,0 +1,305 @@
+# core/attachments.py
+"""
+Procesamiento de adjuntos fuera de la petición: miniatura de la primera página,
+número de páginas (folios del trámite) y una variante PDF recomprimida
+(escaneos con imágenes JPEG).
+
+Se encola al confirmar la transacción en un ThreadPoolExecutor por proceso
+(ATTACHMENT_WORKERS). Si el proceso muere con tareas pendientes, el comando
+process_attachments retoma los archivos que quedaron en PENDING.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.errors import PdfReadError
+from PyPDF2.generic import NameObject, NumberObject
+
+logger = logging.getLogger("apps.attachments")
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tif", ".tiff", ".webp"}
+
+_executor = None
+
+def get_executor():
+
+    global _executor
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.ATTACHMENT_WORKERS,
+            thread_name_prefix="attachments"
+        )
+
+    return _executor
+
+def schedule_processing(file_ids):
+    """
+    Procesa los ProcedureFile indicados cuando la transacción actual se confirme
+    """
+    file_ids = list(file_ids)
+    if not file_ids:
+        return
+
+    def submit():
+        if settings.ATTACHMENT_PROCESSING_ASYNC:
+            get_executor().submit(run_in_worker, file_ids)
+        else:
+            process_files(file_ids)
+
+    transaction.on_commit(submit)
+
+def run_in_worker(file_ids):
+
+    close_old_connections()
+    try:
+        process_files(file_ids)
+    except Exception:
+        logger.exception("Error procesando adjuntos %s", file_ids)
+    finally:
+        close_old_connections()
+
+def process_files(file_ids):
+
+    from apps.tramite.models import ProcedureFile
+
+    from apps.tramite.utils import refresh_procedure_folios
+
+    procedure_ids = set()
+
+    for procedure_file in ProcedureFile.objects.filter(id__in=file_ids):
+        process_file(procedure_file)
+        procedure_ids.add(procedure_file.procedure_id)
+
+    # 📑 Folios: una vez por trámite, no por archivo
+    for procedure_id in procedure_ids:
+        refresh_procedure_folios(procedure_id)
+
+def process_file(procedure_file):
+    """
+    Genera miniatura, páginas y variante optimizada; nunca lanza (queda FAILED)
+    """
+    from apps.tramite.models import ProcedureFile
+
+    ext = os.path.splitext(procedure_file.file.name)[1].lower()
+    result = {"thumbnail": None, "optimized": None, "page_count": None}
+
+    try:
+        path = procedure_file.file.path
+
+        if ext == ".pdf":
+            result.update(process_pdf(path))
+        elif ext in IMAGE_EXTENSIONS:
+            result.update(process_image(path))
+
+        status = ProcedureFile.DONE
+    except (OSError, PdfReadError, UnidentifiedImageError, ValueError, KeyError) as exc:
+        logger.warning("No se pudo procesar el adjunto %s: %s", procedure_file.id, exc)
+        status = ProcedureFile.FAILED
+    except Exception:
+        # Errores internos de PyPDF2 / Pillow con archivos inusuales (p. ej. imágenes
+        # con paleta): el archivo queda FAILED y el lote sigue
+        logger.exception("Error procesando el adjunto %s", procedure_file.id)
+        status = ProcedureFile.FAILED
+        result = {"thumbnail": None, "optimized": None, "page_count": None}
+
+    stem = os.path.splitext(os.path.basename(procedure_file.file.name))[0]
+
+    # Reproceso: se reemplazan las variantes anteriores
+    for field in (procedure_file.thumbnail, procedure_file.optimized):
+        if field:
+            field.delete(save=False)
+
+    if result["thumbnail"]:
+        procedure_file.thumbnail.save(f"{stem}.jpg", ContentFile(result["thumbnail"]), save=False)
+    if result["optimized"]:
+        # Las imágenes se recomprimen siempre a JPEG
+        optimized_ext = ext if ext == ".pdf" else ".jpg"
+        procedure_file.optimized.save(f"{stem}{optimized_ext}", ContentFile(result["optimized"]), save=False)
+
+    procedure_file.page_count = result["page_count"]
+    procedure_file.processing_status = status
+    procedure_file.processed_at = timezone.now()
+    procedure_file.save(update_fields=[
+        "thumbnail", "optimized", "page_count", "processing_status", "processed_at"
+    ])
+
+    return procedure_file
+
+# 🖼️ Miniaturas
+
+def make_thumbnail(image):
+
+    image = image.convert("RGB") if image.mode not in ("RGB", "L") else image
+    image.thumbnail((settings.ATTACHMENT_THUMBNAIL_SIZE, settings.ATTACHMENT_THUMBNAIL_SIZE))
+
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=80, optimize=True)
+    return buffer.getvalue()
+
+def process_image(path):
+
+    with Image.open(path) as image:
+        image.load()
+        thumbnail = make_thumbnail(image.copy())
+        optimized = recompress_image(image, os.path.getsize(path))
+
+    return {"thumbnail": thumbnail, "optimized": optimized, "page_count": 1}
+
+def recompress_image(image, original_size):
+    """
+    Fotos de celular: reducidas a ATTACHMENT_OPTIMIZE_MAX_SIDE en JPEG; solo si ahorra lo suficiente
+    """
+    if not settings.ATTACHMENT_OPTIMIZE or image.mode not in ("RGB", "L"):
+        return None
+
+    image = image.copy()
+    image.thumbnail((settings.ATTACHMENT_OPTIMIZE_MAX_SIDE, settings.ATTACHMENT_OPTIMIZE_MAX_SIDE))
+
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=settings.ATTACHMENT_OPTIMIZE_QUALITY, optimize=True)
+
+    return worth_keeping(buffer.getvalue(), original_size)
+
+def worth_keeping(data, original_size):
+
+    if len(data) <= original_size * (1 - settings.ATTACHMENT_OPTIMIZE_MIN_SAVING):
+        return data
+
+    return None
+
+# 📄 PDF
+
+def page_images(page):
+    """
+    XObjects de imagen de la página: (nombre, objeto)
+    """
+    resources = page.get("/Resources")
+    if not resources or "/XObject" not in resources:
+        return []
+
+    xobjects = resources["/XObject"].get_object()
+
+    return [
+        (name, xobjects[name].get_object())
+        for name in xobjects
+        if xobjects[name].get_object().get("/Subtype") == "/Image"
+    ]
+
+def first_page_thumbnail(reader):
+    """
+    La imagen más grande de la primera página (un escaneo es una imagen por página).
+    Sin renderizador de PDF, los PDF solo de texto no tienen miniatura.
+    """
+    if not reader.pages:
+        return None
+
+    page = reader.pages[0]
+    if not page_images(page):
+        return None
+
+    largest = max(page.images, key=lambda image_file: len(image_file.data), default=None)
+    if largest is None:
+        return None
+
+    with Image.open(BytesIO(largest.data)) as image:
+        return make_thumbnail(image)
+
+def count_pdf_pages(reader):
+    """
+    /Count de la raíz del árbol de páginas: solo se leen el trailer, la xref y el
+    catálogo, sin cargar las páginas. Si el árbol está dañado se recorre completo.
+    """
+    try:
+        count = int(reader.trailer["/Root"]["/Pages"]["/Count"])
+    except (KeyError, TypeError, ValueError):
+        count = 0
+
+    return count if count > 0 else len(reader.pages)
+
+def process_pdf(path):
+
+    # Con el archivo abierto PyPDF2 lee los objetos a demanda desde la xref
+    # (con la ruta cargaría el documento completo en memoria)
+    with open(path, "rb") as fh:
+        reader = PdfReader(fh)
+
+        if reader.is_encrypted:
+            # Cifrado: solo se cuentan las páginas, sin variantes
+            try:
+                return {"page_count": count_pdf_pages(reader)}
+            except PdfReadError:
+                return {"page_count": None}
+
+        return {
+            "page_count": count_pdf_pages(reader),
+            "thumbnail": first_page_thumbnail(reader),
+            "optimized": optimize_pdf(reader, os.path.getsize(path)),
+        }
+
+def optimize_pdf(reader, original_size):
+    """
+    Recomprime las imágenes JPEG (DCTDecode) a ATTACHMENT_OPTIMIZE_MAX_SIDE / calidad
+    configurada y comprime los content streams. Las dimensiones en la página no cambian:
+    la matriz de la página escala la imagen a su caja.
+    """
+    if not settings.ATTACHMENT_OPTIMIZE:
+        return None
+
+    changed = False
+    seen = set()
+
+    for page in reader.pages:
+        for _, image in page_images(page):
+            key = id(image)
+            if key in seen or image.get("/Filter") != "/DCTDecode":
+                continue
+            seen.add(key)
+            changed |= recompress_pdf_image(image)
+
+    if not changed:
+        return None
+
+    writer = PdfWriter()
+    for page in reader.pages:
+        page.compress_content_streams()
+        writer.add_page(page)
+
+    buffer = BytesIO()
+    writer.write(buffer)
+
+    return worth_keeping(buffer.getvalue(), original_size)
+
+def recompress_pdf_image(image):
+
+    data = image._data
+    with Image.open(BytesIO(data)) as decoded:
+        if decoded.mode not in ("RGB", "L"):
+            return False
+
+        decoded = decoded.copy()
+        decoded.thumbnail((settings.ATTACHMENT_OPTIMIZE_MAX_SIDE, settings.ATTACHMENT_OPTIMIZE_MAX_SIDE))
+
+        buffer = BytesIO()
+        decoded.save(buffer, format="JPEG", quality=settings.ATTACHMENT_OPTIMIZE_QUALITY, optimize=True)
+
+    recompressed = buffer.getvalue()
+    if len(recompressed) >= len(data):
+        return False
+
+    image._data = recompressed
+    image[NameObject("/Width")] = NumberObject(decoded.width)
+    image[NameObject("/Height")] = NumberObject(decoded.height)
+    image[NameObject("/ColorSpace")] = NameObject("/DeviceGray" if decoded.mode == "L" else "/DeviceRGB")
+    image[NameObject("/BitsPerComponent")] = NumberObject(8)
+    image.pop(NameObject("/DecodeParms"), None)
+    image.pop(NameObject("/Decode"), None)
+
+    return True
@@ -0,0 +1,117 @@
+# core/exports.py
+"""
+Exportación de listados a CSV / XLSX sin cargar el resultado en memoria.
+
+Las filas salen de .values_list().iterator(chunk_size=EXPORT_CHUNK_SIZE): en PostgreSQL
+es un cursor del lado del servidor, se traen EXPORT_CHUNK_SIZE filas por vez.
+- CSV:  StreamingHttpResponse, los primeros bytes salen con el primer bloque
+- XLSX: openpyxl en modo write-only a un archivo temporal (un .xlsx es un zip:
+        no se puede enviar antes de cerrarlo) y FileResponse lo envía por partes
+
+Los textos vienen de los ciudadanos (asunto, remitente, comentarios): los que Excel
+tomaría como fórmula se escapan con "'" y en el XLSX se escriben como texto.
+"""
+import csv
+import tempfile
+from datetime import datetime
+from io import StringIO
+
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Filas del CSV por cada bloque enviado
+CSV_BATCH_ROWS = 500
+
+# Inicios de celda que Excel / LibreOffice evalúan como fórmula
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+def yes_no(value):
+    return "Sí" if value else "No"
+
+def escape_formula(value):
+
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+def export_rows(queryset, columns):
+    """
+    columns: [(encabezado, ruta de .values_list(), formateador o None)]
+    """
+    paths = [path for _, path, _ in columns]
+    formatters = [formatter for _, _, formatter in columns]
+
+    for row in queryset.values_list(*paths).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        values = []
+        for value, formatter in zip(row, formatters):
+            if value is not None and formatter is not None:
+                value = formatter(value)
+            elif isinstance(value, datetime):
+                # Hora local y sin tzinfo (openpyxl no admite fechas con zona)
+                value = timezone.localtime(value).replace(tzinfo=None, microsecond=0)
+            values.append(escape_formula(value))
+        yield values
+
+def stream_csv(rows, headers):
+
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+
+    # BOM: Excel abre el CSV como UTF-8 (tildes y ñ)
+    buffer.write("\ufeff")
+    writer.writerow(headers)
+
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % CSV_BATCH_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+def write_xlsx(rows, headers, title):
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title[:31])
+    sheet.append(headers)
+
+    def cell(value):
+        # Texto explícito: openpyxl guarda como fórmula cualquier texto que empiece con "="
+        if isinstance(value, str):
+            value = WriteOnlyCell(sheet, value=value)
+            value.data_type = "s"
+        return value
+
+    for row in rows:
+        sheet.append([cell(value) for value in row])
+
+    fh = tempfile.TemporaryFile()
+    workbook.save(fh)
+    fh.seek(0)
+
+    return fh
+
+def export_response(file_format, queryset, columns, filename):
+
+    headers = [header for header, _, _ in columns]
+    rows = export_rows(queryset, columns)
+
+    if file_format == "xlsx":
+        return FileResponse(
+            write_xlsx(rows, headers, title=filename),
+            as_attachment=True,
+            filename=f"{filename}.xlsx",
+            content_type=XLSX_CONTENT_TYPE,
+        )
+
+    response = StreamingHttpResponse(stream_csv(rows, headers), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = content_disposition_header(True, f"{filename}.csv")
+
+    return response
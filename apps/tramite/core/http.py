@@ -0,0 +1,45 @@
+# core/http.py
+import hashlib
+
+def make_etag(content: bytes) -> str:
+    """
+    ETag fuerte a partir del contenido ya serializado
+    """
+    return '"%s"' % hashlib.sha1(content).hexdigest()
+
+def etag_matches(request, etag: str) -> bool:
+    """
+    Compara If-None-Match con el ETag actual (comparación débil, RFC 9110)
+    """
+    header = request.META.get("HTTP_IF_NONE_MATCH")
+    if not header or not etag:
+        return False
+
+    if header.strip() == "*":
+        return True
+
+    current = etag.removeprefix("W/")
+    candidates = (value.strip().removeprefix("W/") for value in header.split(","))
+
+    return current in candidates
+
+def negotiate_encoding(request):
+    """
+    br > gzip > identity según Accept-Encoding
+    """
+    accepted = {}
+    for part in request.META.get("HTTP_ACCEPT_ENCODING", "").split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    for encoding in ("br", "gzip"):
+        if accepted.get(encoding, 0) > 0:
+            return encoding
+
+    return None
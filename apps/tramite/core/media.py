@@ -0,0 +1,149 @@
+# core/media.py
+"""
+Descarga protegida de adjuntos.
+
+La vista valida permisos y delega la transferencia según PROTECTED_MEDIA_SERVER:
+- "nginx":  X-Accel-Redirect a PROTECTED_MEDIA_INTERNAL_URL (nginx atiende Range)
+      location /protected-media/ { internal; alias /ruta/al/proyecto/media/; }
+      location /media/procedures/ { return 404; }
+- "apache": X-Sendfile con la ruta absoluta (mod_xsendfile)
+- "":       FileResponse desde Django, con soporte de Range (desarrollo)
+"""
+import mimetypes
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core import signing
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+SIGNING_SALT = "apps.tramite.procedure-file"
+
+CHUNK_SIZE = 64 * 1024
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+def sign_file_access(file_id, user_id):
+    """
+    Firma para enlaces de descarga (<a href>, visor PDF) que no pueden enviar el token
+    """
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign_object({"f": file_id, "u": user_id})
+
+def unsign_file_access(value):
+    """
+    (file_id, user_id) o None si la firma es inválida o expiró
+    """
+    try:
+        data = signing.TimestampSigner(salt=SIGNING_SALT).unsign_object(
+            value, max_age=settings.PROTECTED_MEDIA_URL_MAX_AGE
+        )
+    except signing.BadSignature:
+        return None
+
+    return data.get("f"), data.get("u")
+
+def parse_range(header, size):
+    """
+    Un solo rango 'bytes=inicio-fin' / 'bytes=inicio-' / 'bytes=-sufijo' -> (inicio, fin) inclusivo.
+    None si la cabecera no se entiende o pide varios rangos (se responde el archivo completo)
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    start, _, end = spec.strip().partition("-")
+    try:
+        if not start:
+            length = int(end)
+            if length <= 0 or size == 0:
+                raise RangeNotSatisfiable
+            return max(size - length, 0), size - 1
+
+        start = int(start)
+        end = int(end) if end else size - 1
+    except ValueError:
+        return None
+
+    if start >= size:
+        raise RangeNotSatisfiable
+    if start > end:
+        return None
+
+    return start, min(end, size - 1)
+
+def iter_range(path, start, end):
+
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = fh.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+def serve_protected_file(request, field_file, filename=None):
+    """
+    Respuesta de descarga para un FieldFile ya autorizado
+    """
+    filename = filename or os.path.basename(field_file.name)
+    content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    disposition = content_disposition_header(False, filename)
+    server = settings.PROTECTED_MEDIA_SERVER
+
+    if server == "nginx":
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = (
+            settings.PROTECTED_MEDIA_INTERNAL_URL.rstrip("/") + "/" + quote(field_file.name)
+        )
+
+    elif server == "apache":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = field_file.path
+
+    else:
+        response = django_file_response(request, field_file.path, content_type)
+
+    response["Content-Disposition"] = disposition
+    # Adjuntos de un expediente: nunca en caches compartidas
+    response["Cache-Control"] = "private, no-store"
+
+    return response
+
+def django_file_response(request, path, content_type):
+
+    stat = os.stat(path)
+    size = stat.st_size
+    last_modified = http_date(stat.st_mtime)
+
+    byte_range = None
+    header = request.META.get("HTTP_RANGE")
+
+    # If-Range: si el archivo cambió se envía completo
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if header and if_range and parse_http_date_safe(if_range) != int(stat.st_mtime):
+        header = None
+
+    if header:
+        try:
+            byte_range = parse_range(header, size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+    if byte_range is None:
+        response = FileResponse(open(path, "rb"), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(iter_range(path, start, end), status=206, content_type=content_type)
+        response["Content-Length"] = str(end - start + 1)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    response["Accept-Ranges"] = "bytes"
+    response["Last-Modified"] = last_modified
+
+    return response
@@ -0,0 +1,186 @@
+# core/metrics.py
+"""
+Métricas Prometheus del trámite.
+
+Con varios workers (gunicorn) se usa el modo multiproceso de prometheus_client:
+- exportar PROMETHEUS_MULTIPROC_DIR (directorio vacío al iniciar) antes de arrancar
+- en gunicorn.conf.py:
+  from apps.tramite.core.metrics import gunicorn_child_exit as child_exit
+Sin la variable, cada proceso expone solo sus propios contadores.
+"""
+import hmac
+import os
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils import timezone
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+# Transiciones del flujo que se cuentan
+TRANSITIONS = ("receive", "derive", "finalize", "reject", "observe", "resend", "annul")
+
+REQUEST_LATENCY = Histogram(
+    "tramite_http_request_duration_seconds",
+    "Duración de la petición por vista",
+    ["view", "method", "status"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+REQUEST_QUERIES = Histogram(
+    "tramite_http_request_queries",
+    "Consultas SQL por petición",
+    ["view"],
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 1000),
+)
+
+FLOW_TRANSITIONS = Counter(
+    "tramite_flow_transitions",
+    "Transiciones de flujo confirmadas",
+    ["transition"],
+)
+
+# Series en 0 desde el arranque (rate() necesita la serie antes del primer incremento)
+for name in TRANSITIONS:
+    FLOW_TRANSITIONS.labels(name)
+
+PDF_RENDER = Histogram(
+    "tramite_pdf_render_duration_seconds",
+    "Tiempo de generación de PDF (WeasyPrint)",
+    ["report"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+)
+
+EMAIL_SEND = Histogram(
+    "tramite_email_send_duration_seconds",
+    "Tiempo de envío de correos por resultado",
+    ["outcome"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+)
+
+def observe_request(view, method, status, duration, queries):
+
+    view = view or "unmatched"
+    REQUEST_LATENCY.labels(view, method, str(status)).observe(duration)
+    REQUEST_QUERIES.labels(view).observe(queries)
+
+def record_transition(transition):
+    """
+    Cuenta la transición solo si la transacción se confirma
+    """
+    transaction.on_commit(lambda: FLOW_TRANSITIONS.labels(transition).inc())
+
+@contextmanager
+def time_pdf(report):
+
+    with PDF_RENDER.labels(report).time():
+        yield
+
+@contextmanager
+def time_email():
+
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "sent"
+    finally:
+        EMAIL_SEND.labels(outcome).observe(time.perf_counter() - start)
+
+class PendingScheduleCollector:
+    """
+    Trámites en espera de horario laboral: se consulta al momento del scrape
+    (no hay estado que sincronizar entre procesos)
+    """
+
+    def collect(self):
+
+        from apps.tramite.models import ProcedureFlow
+
+        rows = (
+            ProcedureFlow.objects
+            .filter(status=ProcedureFlow.PENDING_SCHEDULE, is_active=True)
+            .values("to_area__name")
+            .annotate(total=Count("id"), oldest=Min("created_at"))
+        )
+
+        backlog = GaugeMetricFamily(
+            "tramite_pending_schedule_flows",
+            "Flujos en PENDING_SCHEDULE por área de destino",
+            labels=["area"],
+        )
+        oldest = GaugeMetricFamily(
+            "tramite_pending_schedule_oldest_seconds",
+            "Antigüedad del flujo en PENDING_SCHEDULE más antiguo",
+        )
+
+        now = timezone.now()
+        oldest_at = None
+
+        for row in rows:
+            backlog.add_metric([row["to_area__name"] or ""], row["total"])
+            if row["oldest"] and (oldest_at is None or row["oldest"] < oldest_at):
+                oldest_at = row["oldest"]
+
+        oldest.add_metric([], (now - oldest_at).total_seconds() if oldest_at else 0)
+
+        yield backlog
+        yield oldest
+
+class ProcessCollector:
+    """
+    Métricas del registro global de este proceso (modo de un solo proceso)
+    """
+
+    def collect(self):
+        return REGISTRY.collect()
+
+def get_registry():
+    """
+    Registro por scrape: métricas de todos los workers (o del proceso) + el backlog
+    """
+    registry = CollectorRegistry()
+
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry.register(ProcessCollector())
+
+    registry.register(PendingScheduleCollector())
+    return registry
+
+def metrics_view(request):
+    """
+    GET /metrics — con METRICS_TOKEN exige 'Authorization: Bearer <token>';
+    sin token solo acepta METRICS_ALLOWED_IPS (vacía por defecto: todo se rechaza)
+    """
+    if settings.METRICS_TOKEN:
+        # Comparación en tiempo constante (en bytes: admite cabeceras no ASCII)
+        authorization = request.headers.get("Authorization", "").encode()
+        if not hmac.compare_digest(authorization, f"Bearer {settings.METRICS_TOKEN}".encode()):
+            return HttpResponseForbidden()
+    elif request.META.get("REMOTE_ADDR") not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+
+    return HttpResponse(
+        generate_latest(get_registry()),
+        content_type=CONTENT_TYPE_LATEST,
+    )
+
+def gunicorn_child_exit(server, worker):
+    """
+    Hook child_exit de gunicorn: libera los archivos del worker terminado
+    """
+    multiprocess.mark_process_dead(worker.pid)
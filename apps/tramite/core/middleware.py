@@ -0,0 +1,401 @@
+# core/middleware.py
+import hashlib
+import logging
+import time
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import brotli
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_started
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from .http import negotiate_encoding
+from .metrics import observe_request
+from .routers import use_replica
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+logger = logging.getLogger("apps.request")
+
+# Mediciones de la petición en curso. Es un ContextVar: sync_to_async copia el contexto,
+# así que en ASGI lo ven también las consultas de las vistas síncronas, que se ejecutan
+# en otro hilo (con otras conexiones) que el del middleware
+current_metrics = ContextVar("request_metrics", default=None)
+
+def record_query(execute, sql, params, many, context):
+
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+def install_query_recorder(**kwargs):
+    """
+    record_query queda fijo en las conexiones del hilo que atiende la petición:
+    request_started se envía en ese hilo (en ASGI, dentro de sync_to_async)
+    """
+    for connection in connections.all():
+        if record_query not in connection.execute_wrappers:
+            connection.execute_wrappers.append(record_query)
+
+request_started.connect(install_query_recorder, dispatch_uid="install_query_recorder")
+
+class RequestMetrics:
+    """
+    Mediciones de una petición: consultas SQL (todas las bases), tiempos y tamaño.
+    record_query las suma mientras la petición es current_metrics.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.statements = Counter()
+        self.view_name = None
+        self.query_budget = settings.QUERY_BUDGET
+
+    def __call__(self, execute, sql, params, many, context):
+
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+            self.statements[sql] += 1
+
+    @contextmanager
+    def capture(self):
+
+        install_query_recorder()
+        token = current_metrics.set(self)
+        try:
+            yield self
+        finally:
+            current_metrics.reset(token)
+
+    def most_repeated(self):
+        """
+        (sql, veces) de la consulta más repetida: un N+1 aparece como la misma SQL muchas veces
+        """
+        if not self.statements:
+            return None, 0
+        return self.statements.most_common(1)[0]
+
+class RequestMetricsMiddleware:
+    """
+    Registra por petición: consultas SQL, tiempo en base de datos, tiempo de renderizado
+    (serialización de la respuesta DRF), tiempo total y tamaño.
+    Los expone en la cabecera Server-Timing y en una línea de log (logger "apps.request");
+    avisa cuando la vista supera su presupuesto de consultas (QUERY_BUDGET / query_budget).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+
+        if self.async_mode:
+            return self.__acall__(request)
+
+        metrics = request._metrics = RequestMetrics()
+        with metrics.capture():
+            response = self.get_response(request)
+
+        self.finish(request, response, metrics)
+        return response
+
+    async def __acall__(self, request):
+
+        metrics = request._metrics = RequestMetrics()
+        with metrics.capture():
+            response = await self.get_response(request)
+
+        self.finish(request, response, metrics)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+
+        metrics = request._metrics
+        view_class = getattr(view_func, "view_class", None)
+
+        if view_class is not None:
+            metrics.view_name = view_class.__name__
+            metrics.query_budget = getattr(view_class, "query_budget", settings.QUERY_BUDGET)
+        else:
+            metrics.view_name = getattr(view_func, "__name__", None)
+
+        return None
+
+    def process_template_response(self, request, response):
+
+        # Es el último en ejecutarse antes de response.render(): mide el renderizado DRF
+        metrics = request._metrics
+        start = time.perf_counter()
+
+        def rendered(response):
+            metrics.render_time = time.perf_counter() - start
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, response, metrics):
+
+        total = time.perf_counter() - metrics.start
+        size = None if response.streaming else len(response.content)
+
+        db_ms = metrics.db_time * 1000
+        render_ms = metrics.render_time * 1000
+        total_ms = total * 1000
+
+        if settings.REQUEST_METRICS_SERVER_TIMING:
+            response.headers["Server-Timing"] = (
+                f'db;dur={db_ms:.1f};desc="{metrics.queries} queries", '
+                f"render;dur={render_ms:.1f}, "
+                f"total;dur={total_ms:.1f}"
+            )
+
+        sql, repeated = metrics.most_repeated()
+        fields = {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "view": metrics.view_name or "-",
+            "queries": metrics.queries,
+            "repeated": repeated,
+            "db_ms": round(db_ms, 1),
+            "render_ms": round(render_ms, 1),
+            "total_ms": round(total_ms, 1),
+            "bytes": size if size is not None else "-",
+        }
+        line = " ".join(f"{key}={value}" for key, value in fields.items())
+
+        logger.info(line, extra={"request_metrics": fields})
+
+        observe_request(metrics.view_name, request.method, response.status_code, total, metrics.queries)
+
+        # ⚠️ Posible N+1: se registra la consulta más repetida para ubicarla
+        if metrics.query_budget is not None and metrics.queries > metrics.query_budget:
+            logger.warning(
+                "query budget exceeded (%s > %s) %s sql=%r",
+                metrics.queries, metrics.query_budget, line, sql[:300],
+                extra={"request_metrics": fields},
+            )
+
+class ReplicaRoutingMiddleware:
+    """
+    Dirige a la réplica las vistas de solo lectura listadas en DATABASE_REPLICA_VIEWS.
+    Tras una escritura, el usuario queda fijado a la principal unos segundos
+    (read-your-writes) para no leer datos aún no replicados.
+
+    El token se autentica dentro de la vista (DRF), así que aquí el usuario se conoce
+    por el token -> usuario guardado en cache. Un token aún no visto (p. ej. recién
+    emitido por el login) se atiende desde la principal y queda registrado.
+    Requiere una cache compartida entre workers (ver CACHES en settings).
+    """
+
+    # Segundos que se recuerda a qué usuario pertenece un token
+    TOKEN_USER_TIMEOUT = 24 * 60 * 60
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+
+        token = use_replica.set(False)
+
+        try:
+            response = self.get_response(request)
+        finally:
+            use_replica.reset(token)
+
+        token_key = getattr(request, "replica_token_key", None)
+        is_write = request.method not in SAFE_METHODS and response.status_code < 400
+        if not token_key and not is_write:
+            return response
+
+        # Usuario autenticado por la vista (DRF lo asigna también al HttpRequest)
+        user = getattr(request, "user", None)
+        user_id = user.pk if user is not None and user.is_authenticated else None
+
+        if token_key and user_id:
+            cache.set(token_key, user_id, self.TOKEN_USER_TIMEOUT)
+
+        if is_write:
+            cache.set(
+                self.user_pin_key(user_id) if user_id else self.anonymous_pin_key(request),
+                True,
+                settings.DATABASE_REPLICA_STICKY_SECONDS
+            )
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+
+        if settings.DATABASE_REPLICA_ALIAS not in settings.DATABASES:
+            return None
+
+        if request.method not in SAFE_METHODS:
+            return None
+
+        view_class = getattr(view_func, "view_class", None)
+        if view_class is None:
+            return None
+
+        view_path = f"{view_class.__module__}.{view_class.__name__}"
+        if view_path not in settings.DATABASE_REPLICA_VIEWS:
+            return None
+
+        authorization = request.META.get("HTTP_AUTHORIZATION")
+        if authorization:
+            token_key = f"db-pin-token:{self.digest(authorization)}"
+            user_id = cache.get(token_key)
+            # 🔑 Token aún no visto: principal, y se registra su usuario al responder
+            if user_id is None:
+                request.replica_token_key = token_key
+                return None
+            pin_key = self.user_pin_key(user_id)
+        else:
+            pin_key = self.anonymous_pin_key(request)
+
+        # 📌 Escritura reciente: seguir leyendo de la principal
+        if cache.get(pin_key):
+            return None
+
+        use_replica.set(True)
+        return None
+
+    def user_pin_key(self, user_id):
+        return f"db-pin:user:{user_id}"
+
+    def anonymous_pin_key(self, request):
+        return f"db-pin:ip:{self.digest(request.META.get('REMOTE_ADDR', ''))}"
+
+    def digest(self, value):
+        return hashlib.sha256(value.encode()).hexdigest()[:32]
+
+# Tipos que vale la pena comprimir (PDF, imágenes, xlsx y zip ya vienen comprimidos)
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+class StreamCompressor:
+    """
+    Compresor incremental con la misma interfaz para br y gzip
+    """
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+
+        if encoding == "br":
+            self.compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+        else:
+            self.compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        if self.encoding == "br":
+            return self.compressor.process(data)
+        return self.compressor.compress(data)
+
+    def flush(self, data):
+        """
+        Comprime y vacía el bloque: el cliente lo recibe sin esperar al siguiente
+        (igual que compress_sequence de Django)
+        """
+        if self.encoding == "br":
+            return self.compressor.process(data) + self.compressor.flush()
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == "br":
+            return self.compressor.finish()
+        return self.compressor.flush()
+
+def compress_sequence(chunks, encoding):
+
+    compressor = StreamCompressor(encoding)
+    for chunk in chunks:
+        data = compressor.flush(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+async def acompress_sequence(chunks, encoding):
+
+    compressor = StreamCompressor(encoding)
+    async for chunk in chunks:
+        data = compressor.flush(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Comprime con br o gzip según Accept-Encoding.
+    Omite respuestas pequeñas (COMPRESSION_MIN_SIZE), ya comprimidas o de tipos binarios;
+    las respuestas en streaming se comprimen por bloques sin cargarlas en memoria.
+    """
+
+    def process_response(self, request, response):
+
+        if response.has_header("Content-Encoding"):
+            return response
+
+        if response.status_code != 200:
+            return response
+
+        content_type = response.get("Content-Type", "").split(";")[0].strip().lower()
+        if not (content_type.startswith("text/") or content_type in COMPRESSIBLE_TYPES):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        encoding = negotiate_encoding(request)
+        if not encoding:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_sequence(response.streaming_content, encoding)
+            else:
+                response.streaming_content = compress_sequence(response.streaming_content, encoding)
+            del response.headers["Content-Length"]
+
+        else:
+            if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+                return response
+
+            compressor = StreamCompressor(encoding)
+            compressed = compressor.compress(response.content) + compressor.finish()
+
+            if len(compressed) >= len(response.content):
+                return response
+
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        # El cuerpo cambió: el ETag pasa a ser débil (igual que GZipMiddleware)
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+
+        response.headers["Content-Encoding"] = encoding
+
+        return response
@@ -0,0 +1,115 @@
+# core/partitions.py
+"""
+Particiones de tramite_procedureflow (creadas en la migración 0014):
+
+    tramite_procedureflow                    LIST (archived)
+    ├── tramite_procedureflow_active         false, RANGE (created_at)
+    │   ├── tramite_procedureflow_active_y2026
+    │   └── tramite_procedureflow_active_default
+    └── tramite_procedureflow_archive        true, RANGE (created_at)
+        ├── tramite_procedureflow_archive_y2026
+        └── tramite_procedureflow_archive_default
+
+Los límites de año son en UTC. Las filas de un año sin partición caen en la
+partición por defecto; ensure_year_partitions las mueve al crear la del año.
+"""
+from contextlib import contextmanager
+from datetime import timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.db.models import Exists, Min, OuterRef, Q
+from django.utils import timezone
+
+from ..models import Procedure, ProcedureFlow
+
+FLOW_TABLE = "tramite_procedureflow"
+
+SEGMENTS = ("active", "archive")
+
+def partition_name(segment, year):
+
+    return f"{FLOW_TABLE}_{segment}_y{year}"
+
+@contextmanager
+def moving_flows():
+    """
+    Mover flujos entre particiones (DELETE + INSERT) no cambia su texto: el trigger
+    de búsqueda (migración 0010) no recalcula el trámite dentro de este bloque
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SET LOCAL tramite.moving_flows = 'on'")
+        yield cursor
+
+def ensure_year_partitions(years):
+    """
+    Crea las particiones anuales que falten en ambos segmentos; devuelve las creadas
+    """
+    created = []
+
+    for segment in SEGMENTS:
+        parent = f"{FLOW_TABLE}_{segment}"
+
+        for year in years:
+            name = partition_name(segment, year)
+            start, end = f"{year}-01-01 00:00:00+00", f"{year + 1}-01-01 00:00:00+00"
+
+            with moving_flows() as cursor:
+                cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [name])
+                if cursor.fetchone()[0]:
+                    continue
+
+                # Índices, PK, FKs y triggers se heredan de la tabla padre al adjuntarla
+                cursor.execute(f"CREATE TABLE {name} (LIKE {parent} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+                cursor.execute(
+                    f"WITH moved AS ("
+                    f"  DELETE FROM {parent}_default WHERE created_at >= %s AND created_at < %s RETURNING *"
+                    f") INSERT INTO {name} SELECT * FROM moved",
+                    [start, end]
+                )
+                cursor.execute(f"ALTER TABLE {parent} ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')")
+
+            created.append(name)
+
+    return created
+
+def closed_procedures(cutoff):
+    """
+    Trámites cerrados (finalizados o anulados, sin flujos NORMAL activos pendientes)
+    con flujos sin archivar y sin movimientos desde cutoff
+    """
+    flows = ProcedureFlow.objects.filter(procedure=OuterRef("pk"))
+
+    return (
+        Procedure.objects
+        .filter(Exists(flows))
+        .filter(
+            Q(is_annulled=True)
+            | Exists(flows.filter(flow_type=ProcedureFlow.NORMAL, status=ProcedureFlow.FINALIZED))
+        )
+        .exclude(Exists(
+            flows
+            .filter(flow_type=ProcedureFlow.NORMAL, is_active=True)
+            .exclude(status__in=[ProcedureFlow.FINALIZED, ProcedureFlow.ANNULLED])
+        ))
+        .exclude(Exists(ProcedureFlow.all_objects.filter(procedure=OuterRef("pk"), created_at__gte=cutoff)))
+    )
+
+def archive_procedures(cutoff, batch_size=500, limit=None):
+    """
+    Mueve los flujos de los trámites cerrados antes de cutoff a las particiones de
+    archivo, por lotes de batch_size trámites (una transacción por lote)
+    """
+    ids = list(closed_procedures(cutoff).order_by("id").values_list("id", flat=True)[:limit])
+
+    # Particiones de los años a mover y del próximo año (filas nuevas)
+    oldest = ProcedureFlow.objects.filter(procedure_id__in=ids).aggregate(oldest=Min("created_at"))["oldest"]
+    current = timezone.now().year
+    first = oldest.astimezone(dt_timezone.utc).year if oldest else current
+    ensure_year_partitions(range(min(first, current), current + 2))
+
+    flows = 0
+    for start in range(0, len(ids), batch_size):
+        with moving_flows():
+            flows += ProcedureFlow.objects.filter(procedure_id__in=ids[start:start + batch_size]).update(archived=True)
+
+    return {"procedures": len(ids), "flows": flows}
@@ -0,0 +1,127 @@
+# core/refcache.py
+import gzip
+import time
+
+import brotli
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from rest_framework import status
+
+from .http import make_etag, etag_matches
+from .renderers import ORJSONRenderer
+
+# Respuestas ya serializadas, en memoria del proceso: key -> (versiones, creado, etag, contenido)
+_blobs = {}
+
+# Límite de entradas: los query params los controla el cliente
+MAX_BLOBS = 5000
+
+def version_key(name):
+
+    return f"refdata-version:{name}"
+
+def get_versions(names):
+    """
+    Sello de versión de cada tabla de referencia (se guarda en la cache compartida)
+    """
+    keys = [version_key(name) for name in names]
+    found = cache.get_many(keys)
+
+    for key in keys:
+        if key not in found:
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+
+    return tuple(found[key] for key in keys)
+
+def bump_version(name):
+    """
+    Se llama al escribir en una tabla de referencia: invalida las respuestas de todos los workers
+    """
+    cache.set(version_key(name), time.time_ns(), None)
+
+def get_blob(key, names, build):
+    """
+    Devuelve (etag, contenido) sin tocar la base mientras las versiones no cambien.
+    REFERENCE_DATA_MAX_AGE acota el desfase si la cache no es compartida entre workers.
+    """
+    versions = get_versions(names)
+    entry = _blobs.get(key)
+
+    if (
+        entry
+        and entry[0] == versions
+        and time.monotonic() - entry[1] < settings.REFERENCE_DATA_MAX_AGE
+    ):
+        return entry[2], entry[3]
+
+    content = build()
+    etag = make_etag(content)
+
+    if len(_blobs) >= MAX_BLOBS:
+        _blobs.clear()
+
+    _blobs[key] = (versions, time.monotonic(), etag, content)
+
+    return etag, content
+
+# Variantes comprimidas de un blob: (etag, encoding) -> contenido
+_variants = {}
+
+def get_compressed(etag, content, encoding):
+    """
+    Comprime una sola vez por versión (calidad máxima: no se repite por petición)
+    """
+    key = (etag, encoding)
+
+    if key not in _variants:
+        if len(_variants) >= 16:
+            _variants.clear()
+
+        if encoding == "br":
+            _variants[key] = brotli.compress(content, quality=11)
+        else:
+            _variants[key] = gzip.compress(content, compresslevel=9, mtime=0)
+
+    return _variants[key]
+
+class ReferenceDataCacheMixin:
+    """
+    Cachea el list() de vistas con datos casi estáticos.
+    - reference_data: tablas (app_label.model) de las que depende la respuesta
+    - reference_params: query params que cambian el resultado
+    """
+
+    reference_data = ()
+    reference_params = ()
+    reference_cache_control = "public, max-age=0, must-revalidate"
+
+    def list(self, request, *args, **kwargs):
+
+        params = ":".join(
+            request.query_params.get(name, "") for name in self.reference_params
+        )
+        key = f"{self.__class__.__name__}:{params}"
+
+        etag, content = get_blob(
+            key,
+            self.reference_data,
+            lambda: self.render_reference_list(request, *args, **kwargs)
+        )
+
+        if etag_matches(request, etag):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(content, content_type="application/json")
+
+        response["ETag"] = etag
+        response["Cache-Control"] = self.reference_cache_control
+
+        return response
+
+    def render_reference_list(self, request, *args, **kwargs):
+
+        response = super().list(request, *args, **kwargs)
+        return ORJSONRenderer().render(response.data)
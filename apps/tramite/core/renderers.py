@@ -0,0 +1,114 @@
+# core/renderers.py
+import datetime
+import decimal
+import uuid
+
+import orjson
+
+from django.conf import settings
+from django.db.models.query import QuerySet
+from django.utils import timezone
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+# Fechas siempre por default(): orjson no convierte a la zona horaria local
+OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+def default(obj):
+    """
+    Tipos que orjson no serializa por sí mismo, con el formato del JSONEncoder de DRF;
+    salvo que los datetime aware se pasan a la hora local, como en los serializers
+    """
+    if isinstance(obj, Promise):
+        return force_str(obj)
+
+    if isinstance(obj, datetime.datetime):
+        # ⏰ Aware -> America/Lima (TIME_ZONE)
+        if timezone.is_aware(obj):
+            obj = timezone.localtime(obj)
+        representation = obj.isoformat()
+        if representation.endswith("+00:00"):
+            representation = representation[:-6] + "Z"
+        return representation
+
+    if isinstance(obj, datetime.date):
+        return obj.isoformat()
+
+    if isinstance(obj, datetime.time):
+        return obj.isoformat()
+
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+
+    if isinstance(obj, QuerySet):
+        return tuple(obj)
+
+    if isinstance(obj, bytes):
+        return obj.decode()
+
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+
+    if hasattr(obj, "__iter__"):
+        return tuple(obj)
+
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def dumps(data):
+    """
+    JSON compacto, igual al de JSONRenderer de DRF (también escapa U+2028/U+2029,
+    que rompen JSON incrustado en <script>)
+    """
+    content = orjson.dumps(data, default=default, option=OPTIONS)
+    return content.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    Reemplazo de JSONRenderer con orjson (UTF-8 directo, sin pasar por str)
+    """
+
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+
+        if data is None:
+            return b""
+
+        # Con ?indent= en el Accept (navegador / depuración) formatea el de DRF,
+        # con la sangría pedida: orjson solo sangra a 2 espacios
+        if accepted_media_type and "indent=" in accepted_media_type:
+            return JSONRenderer().render(data, accepted_media_type, renderer_context)
+
+        return dumps(data)
+
+class ORJSONParser(BaseParser):
+    """
+    Reemplazo de JSONParser con orjson
+    """
+
+    media_type = "application/json"
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+
+        try:
+            content = stream.read() if stream is not None else b""
+            if encoding.lower().replace("-", "") != "utf8":
+                content = content.decode(encoding).encode()
+            return orjson.loads(content)
+        except (ValueError, UnicodeError) as exc:
+            raise ParseError(f"JSON parse error - {exc}")
@@ -0,0 +1,233 @@
+# core/reports.py
+"""
+Tablas de reportes a partir del registro de movimientos (ProcedureFlow).
+
+refresh_area_daily_stats recalcula solo los días (fecha local) con movimientos nuevos
+desde el checkpoint (último id de ProcedureFlow procesado), más los que se marcaron con
+mark_stale_days al editar en el lugar un trámite ya procesado. Cada día se recalcula
+completo dentro de una transacción, así que repetir una ejecución no duplica nada.
+Los cambios del calendario laboral (horarios, feriados) requieren --full.
+
+Eventos (solo flujos NORMAL, trámites distintos por área y día):
+- created:   trámites registrados, en su área de origen (o destino si no tiene)
+- received:  RECEIVED, en el área que recepciona
+- derived:   SENT derivados (is_derive, sin reenvíos de observados), en el área que deriva
+- finalized / rejected / observed: en el área que ejecuta la acción
+- dwell:     desde que el trámite llega al área (SENT, sent_at si quedó fuera de horario)
+             hasta que el área deriva, finaliza, observa o rechaza; en horario laboral
+             y asignado al día en que sale del área
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.contrib.postgres.fields import ArrayField
+from django.db.models import Count, DateField, F, Func, Max, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from ..models import AreaDailyStats, Area, Procedure, ProcedureFlow, ReportCheckpoint
+from ..utils import business_seconds, load_work_calendar
+
+AREA_DAILY_STATS = "area_daily_stats"
+
+COUNTERS = ["created", "received", "derived", "finalized", "rejected", "observed"]
+
+def day_start(day):
+
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+def contiguous_ranges(days):
+    """
+    [d1, d2, d3, d7] -> [(d1, d3), (d7, d7)]
+    """
+    ranges = []
+
+    for day in sorted(days):
+        if ranges and ranges[-1][1] + timedelta(days=1) == day:
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+
+    return [tuple(r) for r in ranges]
+
+def count_events(first, last):
+    """
+    {(area_id, fecha): {contador: n}} de los días first..last
+    """
+    window = {"created_at__gte": day_start(first), "created_at__lt": day_start(last + timedelta(days=1))}
+    counts = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+
+    created = (
+        Procedure.objects
+        .filter(**window)
+        .annotate(day=TruncDate("created_at"), area=Coalesce("from_area_id", "to_area_id"))
+        .values("area", "day")
+        .annotate(n=Count("id"))
+    )
+    for row in created:
+        counts[(row["area"], row["day"])]["created"] = row["n"]
+
+    flows = ProcedureFlow.all_objects.filter(flow_type=ProcedureFlow.NORMAL, **window).annotate(day=TruncDate("created_at"))
+
+    def distinct_procedures(status):
+        return Count("procedure_id", distinct=True, filter=Q(status=status))
+
+    # Recepción, finalización, rechazo y observación: to_area es el área que actúa
+    actions = (
+        flows
+        .filter(status__in=[ProcedureFlow.RECEIVED, ProcedureFlow.FINALIZED, ProcedureFlow.REJECTED, ProcedureFlow.OBSERVED])
+        .values("to_area_id", "day")
+        .annotate(
+            received=distinct_procedures(ProcedureFlow.RECEIVED),
+            finalized=distinct_procedures(ProcedureFlow.FINALIZED),
+            rejected=distinct_procedures(ProcedureFlow.REJECTED),
+            observed=distinct_procedures(ProcedureFlow.OBSERVED),
+        )
+    )
+    for row in actions:
+        key = (row["to_area_id"], row["day"])
+        for counter in ("received", "finalized", "rejected", "observed"):
+            counts[key][counter] = row[counter]
+
+    # Derivación: un envío con varios destinos cuenta una vez
+    derived = (
+        flows
+        .filter(status=ProcedureFlow.SENT, is_derive=True, is_to_observed=False)
+        .values("from_area_id", "day")
+        .annotate(n=Count("procedure_id", distinct=True))
+    )
+    for row in derived:
+        counts[(row["from_area_id"], row["day"])]["derived"] = row["n"]
+
+    return counts
+
+def dwell_times(first, last, calendar):
+    """
+    {(area_id, fecha): [segundos, ...]} de las permanencias que terminaron en first..last
+    """
+    # Llegada: último envío al área antes de la acción
+    arrival = ProcedureFlow.all_objects.filter(
+        procedure=OuterRef("procedure"),
+        flow_type=ProcedureFlow.NORMAL,
+        status=ProcedureFlow.SENT,
+        to_area=OuterRef("from_area"),
+        sequence__lt=OuterRef("sequence"),
+    ).order_by("-sequence")
+
+    exits = (
+        ProcedureFlow.all_objects
+        .filter(
+            flow_type=ProcedureFlow.NORMAL,
+            from_area__isnull=False,
+            created_at__gte=day_start(first),
+            created_at__lt=day_start(last + timedelta(days=1)),
+        )
+        .filter(
+            Q(status=ProcedureFlow.SENT, is_to_observed=False)
+            | Q(status__in=[ProcedureFlow.FINALIZED, ProcedureFlow.REJECTED, ProcedureFlow.OBSERVED])
+        )
+        .annotate(
+            day=TruncDate("created_at"),
+            arrival_flow=Subquery(arrival.values("id")[:1]),
+            arrived_at=Subquery(arrival.annotate(at=Coalesce("sent_at", "created_at")).values("at")[:1]),
+        )
+        .filter(arrival_flow__isnull=False)
+        # Derivación a varios destinos: una sola salida por llegada
+        .order_by("arrival_flow", "created_at")
+        .distinct("arrival_flow")
+        .values_list("arrival_flow", "from_area_id", "day", "arrived_at", "created_at")
+    )
+
+    dwell = defaultdict(list)
+    for _, area_id, day, arrived_at, left_at in exits:
+        dwell[(area_id, day)].append(business_seconds(arrived_at, left_at, calendar))
+
+    return dwell
+
+def rebuild_days(first, last, calendar, agencies):
+
+    counts = count_events(first, last)
+    dwell = dwell_times(first, last, calendar)
+    refreshed_at = timezone.now()
+
+    rows = []
+    for area_id, day in counts.keys() | dwell.keys():
+        seconds = dwell.get((area_id, day), [])
+        rows.append(AreaDailyStats(
+            agency_id=agencies.get(area_id),
+            area_id=area_id,
+            date=day,
+            dwell_count=len(seconds),
+            dwell_seconds=sum(seconds),
+            refreshed_at=refreshed_at,
+            **counts.get((area_id, day), {}),
+        ))
+
+    with transaction.atomic():
+        AreaDailyStats.objects.filter(date__gte=first, date__lte=last).delete()
+        AreaDailyStats.objects.bulk_create(rows, batch_size=1000)
+
+    return len(rows)
+
+def mark_stale_days(days):
+    """
+    Encola días para el próximo refresh: el checkpoint (por id) no ve las ediciones
+    de filas ya procesadas. Llamar dentro de la transacción de la edición
+    """
+    ReportCheckpoint.objects.filter(name=AREA_DAILY_STATS).update(
+        stale_days=Func(
+            F("stale_days"),
+            Value(sorted(set(days)), output_field=ArrayField(DateField())),
+            function="array_cat",
+        )
+    )
+
+def refresh_area_daily_stats(full=False):
+    """
+    Recalcula los días con movimientos nuevos o marcados; full=True reconstruye toda la tabla
+    """
+    # Los días marcados se toman y vacían al inicio: una edición posterior vuelve a marcarlos
+    with transaction.atomic():
+        checkpoint, _ = ReportCheckpoint.objects.select_for_update().get_or_create(name=AREA_DAILY_STATS)
+        stale = set(checkpoint.stale_days)
+        if stale:
+            checkpoint.stale_days = []
+            checkpoint.save(update_fields=["stale_days"])
+
+    started = timezone.now()
+    last_id = 0 if full else checkpoint.last_flow_id
+
+    pending = ProcedureFlow.all_objects.filter(id__gt=last_id)
+    days = stale | set(
+        pending.annotate(day=TruncDate("created_at")).order_by().values_list("day", flat=True).distinct()
+    )
+
+    if full:
+        AreaDailyStats.objects.all().delete()
+        days |= set(
+            Procedure.objects.annotate(day=TruncDate("created_at")).order_by().values_list("day", flat=True).distinct()
+        )
+
+    calendar = load_work_calendar()
+    agencies = dict(Area.objects.values_list("id", "agency_id"))
+
+    rows = 0
+    try:
+        for first, last in contiguous_ranges(days):
+            rows += rebuild_days(first, last, calendar, agencies)
+    except Exception:
+        mark_stale_days(stale)
+        raise
+
+    # Lo reciente queda pendiente: una transacción con un id menor puede confirmarse después
+    settled = pending.filter(
+        created_at__lt=started - timedelta(minutes=settings.REPORTS_SETTLE_MINUTES)
+    ).aggregate(last=Max("id"))["last"]
+
+    checkpoint.last_flow_id = settled or last_id
+    checkpoint.refreshed_at = started
+    checkpoint.save(update_fields=["last_flow_id", "refreshed_at"])
+
+    return {"days": len(days), "rows": rows, "last_flow_id": checkpoint.last_flow_id}
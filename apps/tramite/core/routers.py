@@ -0,0 +1,25 @@
+# core/routers.py
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Lo activa ReplicaRoutingMiddleware solo para vistas de lectura configuradas
+use_replica = ContextVar("use_replica", default=False)
+
+class ReplicaRouter:
+    """
+    Envía las lecturas a la réplica cuando la petición actual lo permite.
+    Las escrituras siempre van a la base principal.
+    """
+
+    def db_for_read(self, model, **hints):
+        if use_replica.get():
+            return settings.DATABASE_REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # La réplica es una copia física de la principal
+        return True
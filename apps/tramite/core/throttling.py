@@ -0,0 +1,86 @@
+# core/throttling.py
+import math
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+def parse_rate(rate):
+    """
+    "20/min" -> (20, 60)
+    """
+    num, period = rate.split("/")
+    return int(num), PERIODS[period[0]]
+
+class TokenBucket:
+    """
+    Token bucket en la cache compartida: ráfagas de hasta `capacity` peticiones
+    y recarga continua de capacity / period tokens por segundo.
+    """
+
+    def __init__(self, rate):
+        self.capacity, self.period = parse_rate(rate)
+        self.refill_rate = self.capacity / self.period
+
+    def consume(self, key):
+        """
+        Devuelve None si hay token disponible, o los segundos de espera si no
+        """
+        store = caches[settings.THROTTLE_CACHE_ALIAS]
+        now = time.time()
+
+        tokens, stamp = store.get(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - stamp) * self.refill_rate)
+
+        if tokens < 1:
+            return (1 - tokens) / self.refill_rate
+
+        # Sin actividad durante un periodo el bucket vuelve a estar lleno
+        store.set(key, (tokens - 1, now), math.ceil(self.period))
+        return None
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Límite por IP para endpoints públicos: presupuesto propio del endpoint
+    (`throttle_scope` de la vista) más un presupuesto global "public".
+    """
+
+    GLOBAL_SCOPE = "public"
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def allow_request(self, request, view):
+        scope = getattr(view, "throttle_scope", None)
+        self.wait_seconds = self.check(request, scope)
+        return self.wait_seconds is None
+
+    def check(self, request, scope):
+        rates = api_settings.DEFAULT_THROTTLE_RATES
+        ident = self.get_ident(request)
+
+        # Primero el global: una petición rechazada por él no gasta el presupuesto del endpoint
+        for name in (self.GLOBAL_SCOPE, scope):
+            rate = rates.get(name) if name else None
+            if not rate:
+                continue
+
+            wait = TokenBucket(rate).consume(f"throttle:{name}:{ident}")
+            if wait is not None:
+                return wait
+
+        return None
+
+    def wait(self):
+        return self.wait_seconds
+
+async def acheck_throttle(request, scope):
+    """
+    Variante para vistas asíncronas (no DRF): segundos de espera o None
+    """
+    return await sync_to_async(TokenBucketThrottle().check)(request, scope)
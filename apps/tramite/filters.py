@@ -0,0 +1,59 @@
+from django_filters import rest_framework as filters
+
+from .models import Area, AreaDailyStats, AreaLeadTimeStats, Procedure, ProcedureFlow
+
+# Cada filtro tiene un índice que lo respalda (ver Meta.indexes de Procedure y ProcedureFlow);
+# InboxFilterTests verifica que ninguno provoque un Seq Scan
+
+class ProcedureFlowFilter(filters.FilterSet):
+    """
+    Filtros de las bandejas: ?date_after=&date_before=&document_type=&origin_type=&sender_dni=&is_to_finalize=
+    """
+
+    # Fecha del movimiento (fin de día incluido, zona America/Lima)
+    date = filters.DateFromToRangeFilter(field_name="created_at")
+    document_type = filters.NumberFilter(field_name="procedure__document_type")
+    origin_type = filters.ChoiceFilter(field_name="procedure__from_area__type", choices=Area.TYPE_CHOICES)
+    sender_dni = filters.CharFilter(field_name="procedure__sender_dni")
+    is_to_finalize = filters.BooleanFilter()
+
+    class Meta:
+        model = ProcedureFlow
+        fields = ["date", "document_type", "origin_type", "sender_dni", "is_to_finalize"]
+
+class ProcedureFilter(filters.FilterSet):
+    """
+    Filtros de las listas de trámites (is_to_finalize es del flujo: no aplica aquí)
+    """
+
+    # Fecha de registro del trámite
+    date = filters.DateFromToRangeFilter(field_name="created_at")
+    document_type = filters.NumberFilter(field_name="document_type")
+    origin_type = filters.ChoiceFilter(field_name="from_area__type", choices=Area.TYPE_CHOICES)
+    sender_dni = filters.CharFilter(field_name="sender_dni")
+
+    class Meta:
+        model = Procedure
+        fields = ["date", "document_type", "origin_type", "sender_dni"]
+
+class AreaDailyStatsFilter(filters.FilterSet):
+    """
+    Filtros del reporte: ?date_after=&date_before=&agency=&area=
+    """
+
+    date = filters.DateFromToRangeFilter(field_name="date")
+
+    class Meta:
+        model = AreaDailyStats
+        fields = ["date", "agency", "area"]
+
+class AreaLeadTimeStatsFilter(filters.FilterSet):
+    """
+    ?month_after=&month_before= (AAAA-MM-DD, primer día del mes)&agency=&area=
+    """
+
+    month = filters.DateFromToRangeFilter(field_name="month")
+
+    class Meta:
+        model = AreaLeadTimeStats
+        fields = ["month", "agency", "area"]
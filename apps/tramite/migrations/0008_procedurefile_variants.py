@@ -0,0 +1,45 @@
+# Generated by Django 5.2.9 on 2026-10-19 14:39
+
+import apps.tramite.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tramite', '0007_fileupload'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='procedurefile',
+            name='optimized',
+            field=models.FileField(blank=True, max_length=255, null=True, upload_to=apps.tramite.models.procedure_file_variant_path),
+        ),
+        migrations.AddField(
+            model_name='procedurefile',
+            name='page_count',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='procedurefile',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='procedurefile',
+            name='processing_status',
+            field=models.CharField(choices=[('PENDING', 'Pendiente'), ('DONE', 'Procesado'), ('FAILED', 'Error')], default='PENDING', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='procedurefile',
+            name='thumbnail',
+            field=models.FileField(blank=True, max_length=255, null=True, upload_to=apps.tramite.models.procedure_file_variant_path),
+        ),
+        migrations.AddIndex(
+            model_name='procedurefile',
+            index=models.Index(fields=['processing_status', 'created_at'], name='tramite_pro_process_bbe699_idx'),
+        ),
+    ]
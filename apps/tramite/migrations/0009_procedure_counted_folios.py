@@ -0,0 +1,39 @@
+# Generated by Django 5.2.9 on 2026-10-19 14:43
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+
+
+def backfill_counted_folios(apps, schema_editor):
+
+    # Solo el conteo: los folios ya registrados a mano no se tocan
+    Procedure = apps.get_model('tramite', 'Procedure')
+    ProcedureFile = apps.get_model('tramite', 'ProcedureFile')
+
+    totals = (
+        ProcedureFile.objects
+        .filter(procedure=OuterRef('pk'), page_count__isnull=False)
+        .values('procedure')
+        .annotate(total=Sum('page_count'))
+        .values('total')
+    )
+
+    Procedure.objects.filter(files__page_count__isnull=False).distinct().update(
+        counted_folios=Subquery(totals)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tramite', '0008_procedurefile_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='procedure',
+            name='counted_folios',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_counted_folios, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,118 @@
+# Generated by Django 5.2.9 on 2026-10-19 14:47
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Documento de búsqueda del trámite (pesos: A identificadores, B remitente,
+# C asunto, D textos de los flujos). Configuración 'spanish': el stemmer
+# snowball también quita las tildes (Pérez -> perez).
+SEARCH_SQL = """
+CREATE FUNCTION tramite_procedure_search_vector(p tramite_procedure) RETURNS tsvector
+LANGUAGE sql STABLE AS $$
+    SELECT
+        setweight(to_tsvector('spanish', concat_ws(' ', p.code, p.tracking_code, p.document_number)), 'A') ||
+        setweight(to_tsvector('spanish', concat_ws(' ', p.sender_name, p.sender_dni, p.sender_representante)), 'B') ||
+        setweight(to_tsvector('spanish', coalesce(p.subject, '')), 'C') ||
+        setweight(to_tsvector('spanish', coalesce((
+            SELECT string_agg(concat_ws(' ', f.subject_derivar, f.comment), ' ')
+            FROM tramite_procedureflow f
+            WHERE f.procedure_id = p.id
+        ), '')), 'D')
+$$;
+
+CREATE FUNCTION tramite_procedure_search_trigger() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.search_vector := tramite_procedure_search_vector(NEW);
+    RETURN NEW;
+END
+$$;
+
+CREATE TRIGGER tramite_procedure_search
+BEFORE INSERT OR UPDATE OF code, tracking_code, document_number, sender_name, sender_dni, sender_representante, subject
+ON tramite_procedure
+FOR EACH ROW EXECUTE FUNCTION tramite_procedure_search_trigger();
+
+-- Solo los flujos con texto (derivaciones, observaciones, rechazos) tocan el trámite
+CREATE FUNCTION tramite_procedureflow_search_trigger() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT'
+        AND coalesce(NEW.subject_derivar, '') = '' AND coalesce(NEW.comment, '') = '' THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'UPDATE'
+        AND NEW.procedure_id = OLD.procedure_id
+        AND NEW.subject_derivar IS NOT DISTINCT FROM OLD.subject_derivar
+        AND NEW.comment IS NOT DISTINCT FROM OLD.comment THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE tramite_procedure p SET search_vector = tramite_procedure_search_vector(p)
+        WHERE p.id = OLD.procedure_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND (TG_OP = 'INSERT' OR NEW.procedure_id <> OLD.procedure_id) THEN
+        UPDATE tramite_procedure p SET search_vector = tramite_procedure_search_vector(p)
+        WHERE p.id = NEW.procedure_id;
+    END IF;
+
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER tramite_procedureflow_search
+AFTER INSERT OR UPDATE OF subject_derivar, comment, procedure_id OR DELETE
+ON tramite_procedureflow
+FOR EACH ROW EXECUTE FUNCTION tramite_procedureflow_search_trigger();
+
+UPDATE tramite_procedure p SET search_vector = tramite_procedure_search_vector(p);
+"""
+
+REVERSE_SEARCH_SQL = """
+DROP TRIGGER IF EXISTS tramite_procedureflow_search ON tramite_procedureflow;
+DROP TRIGGER IF EXISTS tramite_procedure_search ON tramite_procedure;
+DROP FUNCTION IF EXISTS tramite_procedureflow_search_trigger();
+DROP FUNCTION IF EXISTS tramite_procedure_search_trigger();
+DROP FUNCTION IF EXISTS tramite_procedure_search_vector(tramite_procedure);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tramite', '0009_procedure_counted_folios'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='procedure',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        # Triggers y carga inicial antes de los índices: se construyen una sola vez
+        migrations.RunSQL(SEARCH_SQL, REVERSE_SEARCH_SQL),
+        migrations.AddIndex(
+            model_name='procedure',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='procedure_search_vector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='procedure',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['sender_name'], name='procedure_sender_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='procedure',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['sender_dni'], name='procedure_sender_dni_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='procedure',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['code'], name='procedure_code_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.9 on 2026-10-19 14:50
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY: las bandejas siguen recibiendo escrituras mientras se construyen
+    atomic = False
+
+    dependencies = [
+        ('tramite', '0010_procedure_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='procedure',
+            index=models.Index(fields=['sender_dni'], name='procedure_sender_dni_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='procedure',
+            index=models.Index(fields=['created_at'], name='procedure_created_at_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='procedureflow',
+            index=models.Index(fields=['to_area', 'status', 'created_at'], name='flow_inbox_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='procedureflow',
+            index=models.Index(fields=['from_area', 'status', 'created_at'], name='flow_sent_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='procedureflow',
+            index=models.Index(fields=['status', 'created_at'], name='flow_status_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='procedureflow',
+            index=models.Index(condition=models.Q(('is_to_finalize', True)), fields=['to_area', 'created_at'], name='flow_to_finalize_idx'),
+        ),
+        # Reemplazado por flow_inbox_idx (mismo prefijo + created_at)
+        RemoveIndexConcurrently(
+            model_name='procedureflow',
+            name='tramite_pro_to_area_28a756_idx',
+        ),
+    ]
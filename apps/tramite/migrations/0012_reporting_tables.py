@@ -0,0 +1,45 @@
+# Generated by Django 5.2.9 on 2026-10-19 14:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tramite', '0011_inbox_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_flow_id', models.PositiveBigIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AreaDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('created', models.PositiveIntegerField(default=0)),
+                ('received', models.PositiveIntegerField(default=0)),
+                ('derived', models.PositiveIntegerField(default=0)),
+                ('finalized', models.PositiveIntegerField(default=0)),
+                ('rejected', models.PositiveIntegerField(default=0)),
+                ('observed', models.PositiveIntegerField(default=0)),
+                ('dwell_count', models.PositiveIntegerField(default=0)),
+                ('dwell_seconds', models.PositiveBigIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField()),
+                ('agency', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='tramite.agency')),
+                ('area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='tramite.area')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='area_daily_stats_date_idx'), models.Index(fields=['agency', 'date'], name='area_daily_stats_agency_idx')],
+                'constraints': [models.UniqueConstraint(fields=('area', 'date'), name='area_daily_stats_unique')],
+            },
+        ),
+    ]
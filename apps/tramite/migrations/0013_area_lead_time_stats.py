@@ -0,0 +1,37 @@
+# Generated by Django 5.2.9 on 2026-10-19 15:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tramite', '0012_reporting_tables'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AreaLeadTimeStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('stays', models.PositiveIntegerField(default=0)),
+                ('dwell_avg_seconds', models.PositiveBigIntegerField(default=0)),
+                ('dwell_p50_seconds', models.PositiveBigIntegerField(default=0)),
+                ('dwell_p90_seconds', models.PositiveBigIntegerField(default=0)),
+                ('bottleneck_rank', models.PositiveIntegerField(blank=True, null=True)),
+                ('derives', models.PositiveIntegerField(default=0)),
+                ('derive_fanout_avg', models.FloatField(default=0)),
+                ('rework_loops', models.PositiveIntegerField(default=0)),
+                ('rework_avg_seconds', models.PositiveBigIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField()),
+                ('agency', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='lead_time_stats', to='tramite.agency')),
+                ('area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lead_time_stats', to='tramite.area')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['agency', 'month'], name='area_lead_time_agency_idx')],
+                'constraints': [models.UniqueConstraint(fields=('area', 'month'), name='area_lead_time_stats_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,160 @@
+# Generated by Django 5.2.9 on 2026-10-19 16:02
+
+import re
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# tramite_procedureflow pasa a ser una tabla particionada (ver core/partitions.py):
+# LIST (archived) -> RANGE (created_at) por año. La PK debe incluir las columnas de
+# partición: (id, archived, created_at); Django sigue usando solo id.
+TABLE = "tramite_procedureflow"
+OLD = "tramite_procedureflow_old"
+
+# Igual que en 0010, salvo que mover flujos entre particiones (archive_procedures)
+# no recalcula el documento de búsqueda: el texto no cambia
+SEARCH_TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION tramite_procedureflow_search_trigger() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF current_setting('tramite.moving_flows', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'INSERT'
+        AND coalesce(NEW.subject_derivar, '') = '' AND coalesce(NEW.comment, '') = '' THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'UPDATE'
+        AND NEW.procedure_id = OLD.procedure_id
+        AND NEW.subject_derivar IS NOT DISTINCT FROM OLD.subject_derivar
+        AND NEW.comment IS NOT DISTINCT FROM OLD.comment THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE tramite_procedure p SET search_vector = tramite_procedure_search_vector(p)
+        WHERE p.id = OLD.procedure_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND (TG_OP = 'INSERT' OR NEW.procedure_id <> OLD.procedure_id) THEN
+        UPDATE tramite_procedure p SET search_vector = tramite_procedure_search_vector(p)
+        WHERE p.id = NEW.procedure_id;
+    END IF;
+
+    RETURN NULL;
+END
+$$;
+"""
+
+
+def table_definitions(cursor, table):
+    """
+    Índices (salvo la PK), FKs y triggers de la tabla, para recrearlos con el mismo nombre
+    """
+    cursor.execute(
+        "SELECT indexdef FROM pg_indexes "
+        "WHERE schemaname = current_schema() AND tablename = %s AND indexname <> %s",
+        [table, f"{TABLE}_pkey"]
+    )
+    indexes = [row[0] for row in cursor.fetchall()]
+
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype = 'f'",
+        [table]
+    )
+    foreign_keys = cursor.fetchall()
+
+    cursor.execute(
+        "SELECT pg_get_triggerdef(oid) FROM pg_trigger WHERE tgrelid = %s::regclass AND NOT tgisinternal",
+        [table]
+    )
+    triggers = [row[0] for row in cursor.fetchall()]
+
+    return indexes, foreign_keys, triggers
+
+
+def create_partitions(cursor):
+
+    cursor.execute(f"SELECT extract(year FROM min(created_at) AT TIME ZONE 'UTC')::int FROM {OLD}")
+    current = timezone.now().year
+    first = min(cursor.fetchone()[0] or current, current)
+
+    for segment, archived in (("active", "false"), ("archive", "true")):
+        parent = f"{TABLE}_{segment}"
+        cursor.execute(
+            f"CREATE TABLE {parent} PARTITION OF {TABLE} FOR VALUES IN ({archived}) PARTITION BY RANGE (created_at)"
+        )
+        for year in range(first, current + 2):
+            cursor.execute(
+                f"CREATE TABLE {parent}_y{year} PARTITION OF {parent} "
+                f"FOR VALUES FROM ('{year}-01-01 00:00:00+00') TO ('{year + 1}-01-01 00:00:00+00')"
+            )
+        cursor.execute(f"CREATE TABLE {parent}_default PARTITION OF {parent} DEFAULT")
+
+
+def rebuild_table(schema_editor, partitioned):
+    """
+    Copia la tabla a una nueva (particionada o no) con las mismas columnas, índices,
+    FKs y triggers; los índices se construyen después de copiar las filas
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {OLD}")
+        indexes, foreign_keys, triggers = table_definitions(cursor, OLD)
+
+        cursor.execute(
+            f"CREATE TABLE {TABLE} (LIKE {OLD} INCLUDING DEFAULTS INCLUDING CONSTRAINTS "
+            f"INCLUDING IDENTITY INCLUDING STORAGE)"
+            + (" PARTITION BY LIST (archived)" if partitioned else "")
+        )
+        if partitioned:
+            create_partitions(cursor)
+
+        cursor.execute(f"INSERT INTO {TABLE} OVERRIDING SYSTEM VALUE SELECT * FROM {OLD}")
+        cursor.execute(f"DROP TABLE {OLD}")
+
+        primary_key = "id, archived, created_at" if partitioned else "id"
+        cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY ({primary_key})")
+
+        for sql in indexes + triggers:
+            cursor.execute(re.sub(rf"\b{OLD}\b", TABLE, sql))
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}")
+
+        # Secuencia del id: mismo nombre y continúa donde iba
+        cursor.execute(f"SELECT pg_get_serial_sequence('{TABLE}', 'id')")
+        sequence = cursor.fetchone()[0]
+        if sequence != f"public.{TABLE}_id_seq":
+            cursor.execute(f"ALTER SEQUENCE {sequence} RENAME TO {TABLE}_id_seq")
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), coalesce(max(id), 0) + 1, false) FROM {TABLE}"
+        )
+        cursor.execute(f"ANALYZE {TABLE}")
+
+
+def partition(apps, schema_editor):
+    rebuild_table(schema_editor, partitioned=True)
+
+
+def unpartition(apps, schema_editor):
+    rebuild_table(schema_editor, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tramite', '0013_area_lead_time_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='procedureflow',
+            name='archived',
+            field=models.BooleanField(default=False),
+        ),
+        # Al revertir se conserva la versión con la comprobación (sin efecto sin particiones)
+        migrations.RunSQL(SEARCH_TRIGGER_SQL, migrations.RunSQL.noop),
+        migrations.RunPython(partition, unpartition),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tramite', '0014_partition_procedureflow'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='fileupload',
+            old_name='sha256',
+            new_name='tree_sha256',
+        ),
+    ]
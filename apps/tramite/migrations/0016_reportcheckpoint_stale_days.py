@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-19 19:05
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tramite', '0015_rename_fileupload_sha256'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportcheckpoint',
+            name='stale_days',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.DateField(), blank=True, default=list, size=None),
+        ),
+    ]
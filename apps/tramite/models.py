@@ -1,6 +1,12 @@
 from django.db import models
 from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.core.exceptions import SuspiciousFileOperation
 from django.utils import timezone
+from django.utils.text import get_valid_filename
+import os
 import uuid
 
 User = settings.AUTH_USER_MODEL
@@ -147,6 +153,8 @@ class Procedure(models.Model):
     )
     document_number = models.CharField(max_length=50, blank=True, null=True)
     folios = models.PositiveIntegerField(default=0)
+    # Suma de páginas de los adjuntos (core/attachments.py); folios la sigue mientras nadie la corrija
+    counted_folios = models.PositiveIntegerField(null=True, blank=True)
 
     # Remitente
     sender_dni = models.CharField(max_length=15, blank=True, null=True)
@@ -196,6 +204,10 @@ class Procedure(models.Model):
         db_index=True
     )
 
+    # 🔎 Mantenido por triggers en la base de datos (migración 0010): datos del trámite
+    # y subject_derivar / comment de sus flujos
+    search_vector = SearchVectorField(null=True, editable=False)
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -203,6 +215,16 @@ class Procedure(models.Model):
                 name='unique_code_per_agency'
             )
         ]
+        indexes = [
+            GinIndex(fields=["search_vector"], name="procedure_search_vector_idx"),
+            # pg_trgm: nombres mal escritos y fragmentos de DNI / código
+            GinIndex(fields=["sender_name"], opclasses=["gin_trgm_ops"], name="procedure_sender_name_trgm"),
+            GinIndex(fields=["sender_dni"], opclasses=["gin_trgm_ops"], name="procedure_sender_dni_trgm"),
+            GinIndex(fields=["code"], opclasses=["gin_trgm_ops"], name="procedure_code_trgm"),
+            # Filtros de las listas (filters.py)
+            models.Index(fields=["sender_dni"], name="procedure_sender_dni_idx"),
+            models.Index(fields=["created_at"], name="procedure_created_at_idx"),
+        ]
 
     def __str__(self):
         return self.code
@@ -221,8 +243,27 @@ def procedure_file_path(instance, filename):
         f"{uuid.uuid4()}.{ext}"
     )
 
+def procedure_file_variant_path(instance, filename):
+
+    # Junto al original, también bajo procedures/ (solo por la descarga protegida)
+    return (
+        f"{os.path.dirname(instance.file.name)}/"
+        f"variants/"
+        f"{instance.id}-{filename}"
+    )
+
 class ProcedureFile(models.Model):
 
+    PENDING = "PENDING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+    PROCESSING_CHOICES = [
+        (PENDING, "Pendiente"),
+        (DONE, "Procesado"),
+        (FAILED, "Error"),
+    ]
+
     procedure = models.ForeignKey(
         Procedure,
         on_delete=models.CASCADE,
@@ -237,8 +278,94 @@ class ProcedureFile(models.Model):
     file = models.FileField(upload_to=procedure_file_path)
     description = models.CharField(max_length=255, null=True, blank=True)
 
+    # Generados en segundo plano (core/attachments.py)
+    thumbnail = models.FileField(upload_to=procedure_file_variant_path, max_length=255, null=True, blank=True)
+    optimized = models.FileField(upload_to=procedure_file_variant_path, max_length=255, null=True, blank=True)
+    page_count = models.PositiveIntegerField(null=True, blank=True)
+    processing_status = models.CharField(max_length=10, choices=PROCESSING_CHOICES, default=PENDING)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["processing_status", "created_at"]),
+        ]
+
+def upload_file_path(instance, filename):
+
+    # Conserva el nombre original (es el que se muestra y se descarga)
+    try:
+        filename = get_valid_filename(os.path.basename(filename))
+    except SuspiciousFileOperation:
+        filename = "archivo"
+
+    name, ext = os.path.splitext(filename)
+    today = timezone.now()
+
+    return (
+        f"procedures/"
+        f"uploads/"
+        f"{today:%Y/%m}/"
+        f"{instance.id}/"
+        f"{name[:100]}{ext.lower()[:10]}"
+    )
+
+class FileUpload(models.Model):
+    """
+    Subida por partes: el archivo se escribe directamente en su ubicación final
+    y luego se asocia a un trámite (ProcedureFile) por su id
+    """
+
+    UPLOADING = "UPLOADING"
+    COMPLETE = "COMPLETE"
+    ATTACHED = "ATTACHED"
+
+    STATUS_CHOICES = [
+        (UPLOADING, "Subiendo"),
+        (COMPLETE, "Completo"),
+        (ATTACHED, "Asociado"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="file_uploads"
+    )
+
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True)
+    file = models.FileField(upload_to=upload_file_path, max_length=255)
+
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+
+    # SHA-256 de cada parte, en orden; tree_sha256 = SHA-256 de la concatenación de esos
+    # digests (no es el SHA-256 del archivo)
+    chunk_digests = models.JSONField(default=list, blank=True)
+    tree_sha256 = models.CharField(max_length=64, blank=True)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=UPLOADING)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "updated_at"]),
+        ]
+
+class ActiveFlowManager(models.Manager):
+    """
+    Flujos sin archivar: con archived=False PostgreSQL solo recorre las particiones
+    activas (bandejas, acciones). Historial completo: ProcedureFlow.all_objects
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(archived=False)
+
 class ProcedureFlow(models.Model):
 
     NORMAL = "NR"
@@ -330,12 +457,27 @@ class ProcedureFlow(models.Model):
         null=True, blank=True
     )
 
+    # Trámite cerrado movido a las particiones de archivo (archive_procedures).
+    # La tabla está particionada por archived y luego por año de created_at (migración 0014)
+    archived = models.BooleanField(default=False)
+
+    objects = ActiveFlowManager()
+    all_objects = models.Manager()
+
     class Meta:
 
         ordering = ["sequence"]
         indexes = [
             models.Index(fields=["procedure", "sequence"]),
-            models.Index(fields=["to_area", "status"]),
+            # Bandejas: área + estado, ordenadas (y filtradas por rango) por created_at
+            models.Index(fields=["to_area", "status", "created_at"], name="flow_inbox_idx"),
+            models.Index(fields=["from_area", "status", "created_at"], name="flow_sent_idx"),
+            models.Index(fields=["status", "created_at"], name="flow_status_created_idx"),
+            models.Index(
+                fields=["to_area", "created_at"],
+                condition=models.Q(is_to_finalize=True),
+                name="flow_to_finalize_idx"
+            ),
         ]
 
 class WorkSchedule(models.Model):
@@ -359,3 +501,110 @@ class Holiday(models.Model):
     description = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
 
+# 📊 REPORTES (core/reports.py, comando refresh_reports)
+
+class AreaDailyStats(models.Model):
+    """
+    Resumen por área y día (fecha local) calculado desde ProcedureFlow;
+    los reportes consultan solo esta tabla
+    """
+
+    agency = models.ForeignKey(
+        Agency,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="daily_stats"
+    )
+
+    area = models.ForeignKey(
+        Area,
+        on_delete=models.CASCADE,
+        related_name="daily_stats"
+    )
+
+    date = models.DateField()
+
+    # Trámites (distintos) por evento del día
+    created = models.PositiveIntegerField(default=0)
+    received = models.PositiveIntegerField(default=0)
+    derived = models.PositiveIntegerField(default=0)
+    finalized = models.PositiveIntegerField(default=0)
+    rejected = models.PositiveIntegerField(default=0)
+    observed = models.PositiveIntegerField(default=0)
+
+    # Permanencia en horario laboral de los trámites que salieron del área ese día
+    dwell_count = models.PositiveIntegerField(default=0)
+    dwell_seconds = models.PositiveBigIntegerField(default=0)
+
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["area", "date"], name="area_daily_stats_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["date"], name="area_daily_stats_date_idx"),
+            models.Index(fields=["agency", "date"], name="area_daily_stats_agency_idx"),
+        ]
+
+class AreaLeadTimeStats(models.Model):
+    """
+    Tiempos de permanencia por área y mes (core/analytics.py, comando analyze_flows)
+    """
+
+    agency = models.ForeignKey(
+        Agency,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="lead_time_stats"
+    )
+
+    area = models.ForeignKey(
+        Area,
+        on_delete=models.CASCADE,
+        related_name="lead_time_stats"
+    )
+
+    # Primer día del mes en que el trámite salió del área
+    month = models.DateField()
+
+    # Permanencias terminadas, en segundos de horario laboral
+    stays = models.PositiveIntegerField(default=0)
+    dwell_avg_seconds = models.PositiveBigIntegerField(default=0)
+    dwell_p50_seconds = models.PositiveBigIntegerField(default=0)
+    dwell_p90_seconds = models.PositiveBigIntegerField(default=0)
+
+    # 1 = mayor p90 de su agencia en el mes
+    bottleneck_rank = models.PositiveIntegerField(null=True, blank=True)
+
+    # Derivaciones y destinos promedio por derivación
+    derives = models.PositiveIntegerField(default=0)
+    derive_fanout_avg = models.FloatField(default=0)
+
+    # Observaciones del área que volvieron reenviadas (OBSERVED -> reenvío)
+    rework_loops = models.PositiveIntegerField(default=0)
+    rework_avg_seconds = models.PositiveBigIntegerField(default=0)
+
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["area", "month"], name="area_lead_time_stats_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["agency", "month"], name="area_lead_time_agency_idx"),
+        ]
+
+class ReportCheckpoint(models.Model):
+    """
+    Último ProcedureFlow procesado por cada tabla de reportes
+    """
+
+    name = models.CharField(max_length=50, unique=True)
+    last_flow_id = models.PositiveBigIntegerField(default=0)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+
+    # Días ya procesados con ediciones en el lugar, a recalcular en la próxima ejecución
+    stale_days = ArrayField(models.DateField(), default=list, blank=True)
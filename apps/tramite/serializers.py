@@ -1,7 +1,8 @@
 from rest_framework import serializers
-from django.utils.timezone import now
+from django.utils.timezone import localdate, now
 from django.conf import settings
 from django.db import transaction
+from django.urls import reverse
 from apps.user.models import User
 
 from .models import ( 
@@ -9,14 +10,22 @@ from .models import (
     Company, Area, UserArea, Document, Agency, Procedure, WorkSchedule, Holiday,
     ProcedureFlow, Department, Province, District,
     ProcedureFile,
-    ProcedureSequence
+    ProcedureSequence,
+    FileUpload,
+    AreaLeadTimeStats,
+    upload_file_path
 
 )
 
-from .utils import generate_procedure_code, get_next_sequence, get_virtual_areas, check_schedule, ScheduleResult, generate_unique_tracking_code
+from .core.exports import yes_no
+from .core.media import sign_file_access
+from .core.reports import mark_stale_days
+from .utils import UPLOADS_UNAVAILABLE, attach_uploads, complete_uploads, generate_procedure_code, get_next_sequence, get_virtual_areas, check_schedule, ScheduleResult, generate_unique_tracking_code, get_flow_global_status_display, get_flow_status_display
     
 
 import os
+from types import SimpleNamespace
+from urllib.parse import urlencode
 
 class DepartmentSerializer(serializers.ModelSerializer):
     class Meta:
@@ -166,9 +175,87 @@ class HolidaySerializer(serializers.ModelSerializer):
         model = Holiday
         fields = '__all__'
 
+# REPORTES
+
+class AreaLeadTimeStatsSerializer(serializers.ModelSerializer):
+
+    area_name = serializers.CharField(source="area.name", read_only=True)
+
+    class Meta:
+
+        model = AreaLeadTimeStats
+        exclude = ["refreshed_at"]
+
 # PROCEDURE
 
-class ProcedureCreateSerializer(serializers.Serializer):
+# 📤 SUBIDAS POR PARTES
+
+class FileUploadSerializer(serializers.ModelSerializer):
+
+    chunk_size = serializers.SerializerMethodField()
+
+    class Meta:
+        model = FileUpload
+        fields = ("id", "filename", "size", "received", "chunk_size", "status", "tree_sha256", "created_at")
+
+    def get_chunk_size(self, obj):
+        return settings.UPLOAD_CHUNK_SIZE
+
+class FileUploadCreateSerializer(serializers.Serializer):
+
+    filename = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1)
+    content_type = serializers.CharField(max_length=100, required=False, allow_blank=True)
+
+    def validate_size(self, value):
+
+        if value > settings.UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"El archivo supera el máximo permitido ({settings.UPLOAD_MAX_SIZE} bytes)"
+            )
+
+        return value
+
+    def create(self, validated_data):
+
+        upload = FileUpload(created_by=self.context["request"].user, **validated_data)
+        # Ubicación final desde el inicio: las partes se escriben ahí directamente
+        upload.file.name = upload_file_path(upload, upload.filename)
+        upload.save()
+
+        return upload
+
+class UploadIdsMixin(serializers.Serializer):
+    """
+    upload_ids: subidas completas del usuario que se asocian como archivos del trámite
+    """
+
+    upload_ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        required=False,
+        allow_empty=True,
+        write_only=True
+    )
+
+    def validate_upload_ids(self, value):
+
+        if not value:
+            return []
+
+        user = self.context["request"].user
+        if not user.is_authenticated:
+            raise serializers.ValidationError("Las subidas por partes requieren autenticación")
+
+        # attach_uploads repite la comprobación con las filas bloqueadas
+        ids = set(value)
+        uploads = list(complete_uploads(ids, user))
+
+        if len(uploads) != len(ids):
+            raise serializers.ValidationError(UPLOADS_UNAVAILABLE)
+
+        return uploads
+
+class ProcedureCreateSerializer(UploadIdsMixin, serializers.Serializer):
 
     department = serializers.PrimaryKeyRelatedField(
         queryset=Department.objects.all(),
@@ -192,7 +279,8 @@ class ProcedureCreateSerializer(serializers.Serializer):
     )
     document_number = serializers.CharField()
     subject = serializers.CharField()
-    folios = serializers.IntegerField()
+    # 0: se toma de las páginas de los adjuntos PDF al procesarlos
+    folios = serializers.IntegerField(required=False, min_value=0, default=0)
 
     # Remitente
     sender_dni = serializers.CharField(required=False, allow_blank=True)
@@ -254,6 +342,7 @@ class ProcedureCreateSerializer(serializers.Serializer):
         request = self.context["request"]
         is_virtual = validated_data.get("is_virtual", False)
         files = request.FILES.getlist("files")
+        uploads = validated_data.pop("upload_ids", [])
         agency = validated_data["agency"]
 
         # 🔴 VALIDACIÓN DE HORARIO (NUEVO)
@@ -346,9 +435,12 @@ class ProcedureCreateSerializer(serializers.Serializer):
 
             created.append(procedure)
 
+        # 📎 Subidas por partes: el mismo archivo en cada trámite creado
+        attach_uploads(created, uploads, user)
+
         return created
 
-class ProcedureUpdateSerializer(serializers.ModelSerializer):
+class ProcedureUpdateSerializer(UploadIdsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Procedure
@@ -365,13 +457,14 @@ class ProcedureUpdateSerializer(serializers.ModelSerializer):
             "from_area",
             "to_area",
             "is_virtual",
+            "upload_ids",
         ]
 
     def validate(self, data):
 
         procedure: Procedure = self.context["procedure"]
 
-        flows_qs = ProcedureFlow.objects.filter(procedure=procedure)
+        flows_qs = ProcedureFlow.all_objects.filter(procedure=procedure)
 
         # ❌ No editable si tiene más de 1 flujo
         if flows_qs.count() > 1:
@@ -389,9 +482,20 @@ class ProcedureUpdateSerializer(serializers.ModelSerializer):
         - Si existe 1 flow, sincroniza subject y to_area
         """
 
+        uploads = validated_data.pop("upload_ids", [])
+
+        areas = (instance.from_area_id, instance.to_area_id)
+
         # 1️⃣ Actualizar Procedure
         procedure = super().update(instance, validated_data)
 
+        # 📊 Las áreas cuentan en los reportes ya calculados de ese día
+        if (procedure.from_area_id, procedure.to_area_id) != areas:
+            mark_stale_days([localdate(procedure.created_at)])
+
+        # 📎 Subidas por partes
+        attach_uploads([procedure], uploads, self.context["request"].user)
+
         # 2️⃣ Obtener el único flujo (si existe)
         flow = (
             ProcedureFlow.objects
@@ -420,17 +524,45 @@ class ProcedureFileSerializer(serializers.ModelSerializer):
 
     file_name = serializers.SerializerMethodField()
     file_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
+    optimized_url = serializers.SerializerMethodField()
 
     class Meta:
         model = ProcedureFile
-        fields = ("id", "file_name", "file_url", "created_at")
+        fields = (
+            "id", "file_name", "file_url", "thumbnail_url", "optimized_url",
+            "page_count", "processing_status", "created_at",
+        )
 
     def get_file_name(self, obj):
         return obj.file.name.split("/")[-1]
 
     def get_file_url(self, obj):
+        return self.download_url(obj)
+
+    def get_thumbnail_url(self, obj):
+        return self.download_url(obj, "thumbnail") if obj.thumbnail else None
+
+    def get_optimized_url(self, obj):
+        return self.download_url(obj, "optimized") if obj.optimized else None
+
+    def download_url(self, obj, variant=None):
+        """
+        Descarga protegida; la firma permite abrir el enlace sin cabecera Authorization
+        """
         request = self.context.get("request")
-        return request.build_absolute_uri(obj.file.url)
+        url = reverse("procedure-file-download", args=[obj.id])
+
+        params = {}
+        if variant:
+            params["variant"] = variant
+        if request is not None and request.user.is_authenticated:
+            params["signature"] = sign_file_access(obj.id, request.user.id)
+
+        if params:
+            url += "?" + urlencode(params)
+
+        return request.build_absolute_uri(url) if request is not None else url
 
 class ProcedureCopySerializer(serializers.ModelSerializer):
 
@@ -456,20 +588,29 @@ class ProcedureListSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Procedure
-        fields = '__all__'
+        exclude = ("search_vector",)
 
     def get_copies(self, obj):
-        copies = (
-            ProcedureFlow.objects
-            .filter(
-                procedure=obj,
-                flow_type=ProcedureFlow.COPY
+
+        # ⚡ Precargadas por la vista (copies_prefetch): sin consulta por fila
+        copies = getattr(obj, "copy_flows", None)
+
+        if copies is None:
+            copies = (
+                ProcedureFlow.all_objects
+                .filter(
+                    procedure=obj,
+                    flow_type=ProcedureFlow.COPY
+                )
+                .select_related("to_area__agency")
+                .order_by("sequence")
             )
-            .select_related("to_area")
-            .order_by("sequence")
-        )
         return ProcedureCopySerializer(copies, many=True).data
 
+class ProcedureSearchSerializer(ProcedureListSerializer):
+
+    rank = serializers.FloatField(read_only=True)
+
 class ProcedureAnnulSerializer(serializers.Serializer):
 
     comment = serializers.CharField(required=False, allow_blank=True)
@@ -478,7 +619,7 @@ class ProcedureAnnulSerializer(serializers.Serializer):
 
         procedure: Procedure = self.context["procedure"]
 
-        flows = ProcedureFlow.objects.filter(procedure=procedure)
+        flows = ProcedureFlow.all_objects.filter(procedure=procedure)
 
         if flows.count() > 1:
             raise serializers.ValidationError(
@@ -591,7 +732,7 @@ class ReceiveFlowSerializer(serializers.Serializer):
         return new_flow
 
 # DERVIVAR
-class DeriveFlowSerializer(serializers.Serializer):
+class DeriveFlowSerializer(UploadIdsMixin, serializers.Serializer):
     
     origin_options = serializers.JSONField(required=False)
 
@@ -679,6 +820,8 @@ class DeriveFlowSerializer(serializers.Serializer):
                 uploaded_by=user
             )
 
+        attach_uploads([procedure], self.validated_data.get("upload_ids", []), user)
+
         # 📎 Crear flows COPY (SENT)
         for area in copy_areas:
             created.append(
@@ -844,7 +987,7 @@ class ObservedFlowSerializer(serializers.Serializer):
         return new_flow
 
 #  REENVIAR
-class ResendObservedFlowSerializer(serializers.Serializer):
+class ResendObservedFlowSerializer(UploadIdsMixin, serializers.Serializer):
 
     # Flujo
     destination_area = serializers.PrimaryKeyRelatedField(
@@ -912,6 +1055,8 @@ class ResendObservedFlowSerializer(serializers.Serializer):
                     uploaded_by=user
                 )
 
+            attach_uploads([procedure], self.validated_data.get("upload_ids", []), user)
+
         #  Crear nuevo flow SENT
         active_area_id = int(request.headers.get("X-Area-Id"))
         active_area = Area.objects.get(id=active_area_id)
@@ -938,3 +1083,145 @@ class ResendObservedFlowSerializer(serializers.Serializer):
         )
 
         return new_flow
+
+# SEGUIMIENTO PÚBLICO
+
+class PublicTrackingProcedureSerializer(serializers.ModelSerializer):
+
+    document_type = serializers.CharField(source="document_type.name", read_only=True)
+
+    class Meta:
+        model = Procedure
+        fields = (
+            "code",
+            "tracking_code",
+            "document_type",
+            "document_number",
+            "subject",
+            "sender_name",
+            "is_annulled",
+            "created_at",
+        )
+
+class PublicTrackingFlowSerializer(serializers.ModelSerializer):
+
+    from_area = serializers.CharField(source="from_area.name", default=None, read_only=True)
+    to_area = serializers.CharField(source="to_area.name", read_only=True)
+    status_display = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ProcedureFlow
+        fields = (
+            "id",
+            "sequence",
+            "flow_type",
+            "status",
+            "status_display",
+            "from_area",
+            "to_area",
+            "comment",
+            "created_at",
+            "sent_at",
+        )
+
+    def get_status_display(self, obj):
+        return get_flow_global_status_display(obj)["label"]
+
+# RESUMEN DE BANDEJAS (filas con .values(), sin instanciar modelos)
+
+# Nombre en la respuesta -> ruta ORM
+FLOW_SUMMARY_FIELDS = {
+    "id": "id",
+    "procedure_id": "procedure_id",
+    "code": "procedure__code",
+    "subject": "procedure__subject",
+    "sender_name": "procedure__sender_name",
+    "document_type": "procedure__document_type__name",
+    "document_number": "procedure__document_number",
+    "from_area": "from_area__name",
+    "to_area": "to_area__name",
+    "sent_by": "sent_by__name",
+    "status": "status",
+    "flow_type": "flow_type",
+    "is_to_finalize": "is_to_finalize",
+    "created_at": "created_at",
+}
+
+PROCEDURE_SUMMARY_FIELDS = {
+    "id": "id",
+    "code": "code",
+    "subject": "subject",
+    "sender_name": "sender_name",
+    "document_type": "document_type__name",
+    "document_number": "document_number",
+    "from_area": "from_area__name",
+    "to_area": "to_area__name",
+    "is_virtual": "is_virtual",
+    "is_annulled": "is_annulled",
+    "created_at": "created_at",
+}
+
+# 📤 Exportación CSV / XLSX (core/exports.py): (encabezado, ruta de .values_list(), formateador)
+
+FLOW_STATUS_LABELS = {
+    code: get_flow_status_display(SimpleNamespace(status=code, is_to_finalize=False))["label"]
+    for code, _ in ProcedureFlow.STATUS_CHOICES
+}
+
+AREA_TYPE_LABELS = dict(Area.TYPE_CHOICES)
+
+PROCEDURE_EXPORT_COLUMNS = [
+    ("Código", "code", None),
+    ("Código de seguimiento", "tracking_code", None),
+    ("Tipo de documento", "document_type__name", None),
+    ("N° de documento", "document_number", None),
+    ("Folios", "folios", None),
+    ("DNI / RUC", "sender_dni", None),
+    ("Remitente", "sender_name", None),
+    ("Tipo de trámite", "from_area__type", AREA_TYPE_LABELS.get),
+    ("Área de origen", "from_area__name", None),
+    ("Área de destino", "to_area__name", None),
+    ("Asunto", "subject", None),
+    ("Virtual", "is_virtual", yes_no),
+    ("Anulado", "is_annulled", yes_no),
+    ("Registrado", "created_at", None),
+]
+
+FLOW_EXPORT_COLUMNS = [
+    ("Código", "procedure__code", None),
+    ("Secuencia", "sequence", None),
+    ("Copia", "flow_type", lambda value: yes_no(value == ProcedureFlow.COPY)),
+    ("Estado", "status", FLOW_STATUS_LABELS.get),
+    ("Por finalizar", "is_to_finalize", yes_no),
+    ("Área de origen", "from_area__name", None),
+    ("Área de destino", "to_area__name", None),
+    ("Enviado por", "sent_by__name", None),
+    ("Tipo de documento", "procedure__document_type__name", None),
+    ("DNI / RUC", "procedure__sender_dni", None),
+    ("Remitente", "procedure__sender_name", None),
+    ("Asunto", "subject", None),
+    ("Asunto de derivación", "subject_derivar", None),
+    ("Comentario", "comment", None),
+    ("Fecha", "created_at", None),
+]
+
+class SummaryRowSerializer:
+    """
+    Convierte filas de .values() al formato de la API (fechas en la zona horaria local)
+    """
+
+    datetime_field = serializers.DateTimeField()
+
+    def __init__(self, field_map, fields):
+        self.columns = [(name, field_map[name]) for name in fields]
+
+    def to_representation(self, row):
+
+        data = {}
+        for name, path in self.columns:
+            value = row[path]
+            if hasattr(value, "tzinfo"):
+                value = self.datetime_field.to_representation(value)
+            data[name] = value
+
+        return data
@@ -0,0 +1,62 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Procedure, ProcedureFlow, ProcedureFile, Department, Province, District, Document, Agency, Area
+from .utils import invalidate_tracking_cache, refresh_procedure_folios
+from .core.refcache import bump_version
+from .core.attachments import schedule_processing
+
+# 🌐 Seguimiento público: limpiar la cache cuando cambia la línea de tiempo
+
+@receiver(post_save, sender=ProcedureFlow)
+@receiver(post_delete, sender=ProcedureFlow)
+def invalidate_flow_tracking(sender, instance, **kwargs):
+
+    try:
+        tracking_code = instance.procedure.tracking_code
+    except Procedure.DoesNotExist:
+        # Borrado en cascada: lo limpia la señal del propio trámite
+        return
+
+    if tracking_code:
+        transaction.on_commit(lambda: invalidate_tracking_cache(tracking_code))
+
+@receiver(post_save, sender=Procedure)
+@receiver(post_delete, sender=Procedure)
+def invalidate_procedure_tracking(sender, instance, **kwargs):
+
+    tracking_code = instance.tracking_code
+
+    if tracking_code:
+        transaction.on_commit(lambda: invalidate_tracking_cache(tracking_code))
+
+# 📚 Datos de referencia: nueva versión en cada escritura
+
+REFERENCE_MODELS = (Department, Province, District, Document, Agency, Area)
+
+def bump_reference_version(sender, **kwargs):
+
+    label = sender._meta.label_lower
+    transaction.on_commit(lambda: bump_version(label))
+
+for model in REFERENCE_MODELS:
+    post_save.connect(bump_reference_version, sender=model, dispatch_uid=f"refdata-save-{model.__name__}")
+    post_delete.connect(bump_reference_version, sender=model, dispatch_uid=f"refdata-delete-{model.__name__}")
+
+# 📎 Adjuntos nuevos: miniatura / páginas / PDF optimizado fuera de la petición
+# (bulk_create no emite señales: attach_uploads los encola directamente)
+
+@receiver(post_save, sender=ProcedureFile)
+def process_new_attachment(sender, instance, created, **kwargs):
+
+    if created:
+        schedule_processing([instance.id])
+
+# 📑 Adjunto eliminado: recalcular los folios del trámite
+
+@receiver(post_delete, sender=ProcedureFile)
+def refresh_folios_after_delete(sender, instance, **kwargs):
+
+    procedure_id = instance.procedure_id
+    transaction.on_commit(lambda: refresh_procedure_folios(procedure_id))
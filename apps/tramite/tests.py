@@ -1,3 +1,1886 @@
-from django.test import TestCase
+import csv
+import gzip
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import time as time_module
+import uuid
+import zlib
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import brotli
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import Q, Sum
+from django.http import Http404, HttpResponse
+from django.template.loader import render_to_string
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from openpyxl import load_workbook
+import pandas as pd
+from PIL import Image
+from PyPDF2 import PdfReader
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from apps.user.models import User
+from tramite.urls import public_media
+
+from .core import refcache
+from .core.attachments import count_pdf_pages
+from .core.partitions import archive_procedures, closed_procedures
+from .core.middleware import CompressionMiddleware, ReplicaRoutingMiddleware
+from .core.renderers import ORJSONRenderer
+from .core.routers import ReplicaRouter, use_replica
+from .core.throttling import TokenBucket
+from .core.analytics import BusinessClock, refresh_area_lead_time_stats
+from .core.reports import refresh_area_daily_stats
+from .models import (
+    Agency, Area, AreaDailyStats, AreaLeadTimeStats, Company, Department, District, Document, FileUpload, Holiday, Procedure,
+    ProcedureFile, ProcedureFlow, Province, UserArea, WorkSchedule,
+)
+from .serializers import ProcedureUpdateSerializer
+from .utils import ScheduleResult, attach_uploads, business_seconds, load_work_calendar, tracking_cache_key
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+# Filas por bandeja: más que el tamaño de página por defecto (5)
+ROWS = 12
+
+PAGE_SIZES = (5, 100)
+
+def seed_tramite_fixture():
+    """
+    Agencias, áreas, usuario con UserArea y trámites en cada bandeja del área de mesa de partes,
+    con flujos de varios pasos, copias y archivos
+    """
+    agency = Agency.objects.create(name="Andahuaylas")
+    Agency.objects.create(name="Chincheros")
+
+    mesa = Area.objects.create(name="Mesa de partes", code="001", type="TE", agency=agency)
+    virtual = Area.objects.create(name="Trámite virtual", code="002", type="TV", agency=agency)
+    gerencia = Area.objects.create(name="Gerencia", code="003", type="TI", agency=agency)
+    logistica = Area.objects.create(name="Logística", code="004", type="TI", agency=agency)
+
+    Company.objects.create(name="Municipalidad", ruc="20100000001")
+    oficio = Document.objects.create(code="01", name="Oficio")
+    Document.objects.create(code="02", name="Solicitud")
+
+    # Ubigeo: códigos de 2 / 4 / 6 dígitos
+    for d in range(1, 4):
+        department = Department.objects.create(id=f"{d:02d}", description=f"Departamento {d}")
+        for p in range(1, 3):
+            province = Province.objects.create(id=f"{department.id}{p:02d}", description=f"Provincia {d}-{p}", department=department)
+            for i in range(1, 3):
+                District.objects.create(id=f"{province.id}{i:02d}", description=f"Distrito {d}-{p}-{i}", province=province)
+
+    for day in range(6):
+        WorkSchedule.objects.create(day=day, start_time=time(8), end_time=time(17))
+    Holiday.objects.create(date="2025-12-25", description="Navidad")
+
+    user = User.objects.create_user(
+        email="mesa@example.com", username="mesa", password="secret",
+        name="Mesa", agency=agency, is_staff=True, is_admin=True,
+    )
+    for area in (mesa, gerencia, logistica):
+        UserArea.objects.create(user=user, area=area)
+
+    counter = iter(range(1, 10_000))
+
+    def procedure(from_area, to_area, steps, virtual_procedure=False):
+        """
+        steps: (flow_type, status, from_area, to_area, is_active) en orden de secuencia
+        """
+        number = next(counter)
+        proc = Procedure.objects.create(
+            code=f"{number:06d}-2025",
+            agency=agency,
+            document_type=oficio,
+            document_number=str(number),
+            folios=3,
+            sender_name=f"Remitente {number}",
+            from_area=from_area,
+            to_area=to_area,
+            subject=f"Asunto {number}",
+            created_by=user,
+            is_virtual=virtual_procedure,
+            tracking_code=f"T{number:05d}" if virtual_procedure else None,
+        )
+
+        flows = [
+            ProcedureFlow(
+                procedure=proc, sequence=sequence, flow_type=flow_type, status=status,
+                from_area=origin, to_area=target, is_active=active,
+                subject=proc.subject, sent_by=user,
+            )
+            for sequence, (flow_type, status, origin, target, active) in enumerate(steps, start=1)
+        ]
+        # Copias a otras dos áreas
+        flows += [
+            ProcedureFlow(
+                procedure=proc, sequence=1, flow_type=ProcedureFlow.COPY, status=ProcedureFlow.SENT,
+                from_area=from_area, to_area=area, subject=proc.subject, sent_by=user,
+            )
+            for area in (gerencia, logistica) if area != to_area
+        ]
+        ProcedureFlow.objects.bulk_create(flows)
+
+        ProcedureFile.objects.bulk_create([
+            ProcedureFile(procedure=proc, uploaded_by=user, file=f"procedures/agency_{agency.id}/{proc.code}/{n}.pdf")
+            for n in range(2)
+        ])
+
+        return proc
+
+    NR, CP = ProcedureFlow.NORMAL, ProcedureFlow.COPY
+    SENT, RECEIVED = ProcedureFlow.SENT, ProcedureFlow.RECEIVED
+
+    for _ in range(ROWS):
+        # Pendientes / recepcionados / finalizados en mesa de partes
+        procedure(gerencia, mesa, [(NR, SENT, gerencia, mesa, True)])
+        procedure(gerencia, mesa, [(NR, SENT, gerencia, mesa, False), (NR, RECEIVED, gerencia, mesa, True)])
+        procedure(gerencia, mesa, [
+            (NR, SENT, gerencia, mesa, False),
+            (NR, RECEIVED, gerencia, mesa, False),
+            (NR, ProcedureFlow.FINALIZED, mesa, mesa, True),
+        ])
+        # Enviados desde mesa de partes
+        procedure(mesa, gerencia, [(NR, SENT, mesa, gerencia, True)])
+        # Rechazados / observados por gerencia
+        procedure(mesa, gerencia, [
+            (NR, SENT, mesa, gerencia, False),
+            (NR, ProcedureFlow.REJECTED, gerencia, gerencia, True),
+        ])
+        procedure(mesa, gerencia, [
+            (NR, SENT, mesa, gerencia, False),
+            (NR, RECEIVED, mesa, gerencia, False),
+            (NR, ProcedureFlow.OBSERVED, gerencia, gerencia, True),
+        ])
+        # Copias recibidas en mesa de partes
+        procedure(gerencia, logistica, [(NR, SENT, gerencia, logistica, True), (CP, SENT, gerencia, mesa, True)])
+        # Virtuales
+        procedure(virtual, mesa, [(NR, SENT, virtual, mesa, True)], virtual_procedure=True)
+
+    return {
+        "agency": agency,
+        "user": user,
+        "mesa": mesa,
+        "virtual": virtual,
+        "gerencia": gerencia,
+        "logistica": logistica,
+        "document": oficio,
+    }
+
+class TramiteAPITestMixin:
+    """
+    seed_tramite_fixture, token del usuario de mesa de partes y un APIClient autenticado
+    en esa área. Con OUTSIDER_AREA se crea además "otro", usuario de esa sola área
+    """
+
+    OUTSIDER_AREA = None
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.data = seed_tramite_fixture()
+        cls.token = Token.objects.create(user=cls.data["user"])
+
+        if cls.OUTSIDER_AREA:
+            cls.outsider = User.objects.create_user(
+                email="otro@example.com", username="otro", password="secret",
+                name="Otro", agency=cls.data["agency"],
+            )
+            UserArea.objects.create(user=cls.outsider, area=cls.data[cls.OUTSIDER_AREA])
+            cls.outsider_token = Token.objects.create(user=cls.outsider)
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.authenticate(self.token)
+
+    def authenticate(self, token, area="mesa"):
+        """
+        Credenciales del cliente; area=None no envía X-Area-Id
+        """
+        headers = {"HTTP_AUTHORIZATION": f"Token {token.key}"}
+        if area:
+            headers["HTTP_X_AREA_ID"] = str(self.data[area].id)
+        self.client.credentials(**headers)
+
+class QueryCountTestMixin:
+    """
+    Cuenta las consultas SQL de una petición; los listados deben costar lo mismo
+    con 5 y con 100 filas por página (sin N+1)
+    """
+
+    def setUp(self):
+        super().setUp()
+        # Sin rate limiting ni respuestas cacheadas entre pruebas
+        cache.clear()
+        caches["throttle"].clear()
+        refcache._blobs.clear()
+
+    def request(self, method, url, data=None, **extra):
+
+        # Siempre en frío: sin blobs de referencia de la petición anterior
+        refcache._blobs.clear()
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data, **extra)
+
+        return response, len(ctx.captured_queries)
+
+    def assertMaxQueries(self, limit, method, url, data=None, status=200, **extra):
+
+        response, count = self.request(method, url, data, **extra)
+
+        self.assertEqual(response.status_code, status, response.content[:500])
+        self.assertLessEqual(count, limit, f"{method.upper()} {url}: {count} consultas (máximo {limit})")
+
+        return response
+
+    def assertListQueries(self, limit, url, params=None, min_rows=None):
+
+        counts = {}
+        for page_size in PAGE_SIZES:
+            response, counts[page_size] = self.request("get", url, {**(params or {}), "page_size": page_size})
+            self.assertEqual(response.status_code, 200, response.content[:500])
+
+            if min_rows and page_size > min_rows:
+                self.assertGreater(len(response.data["results"]), PAGE_SIZES[0], url)
+
+        self.assertEqual(
+            counts[PAGE_SIZES[0]], counts[PAGE_SIZES[-1]],
+            f"{url}: las consultas dependen del tamaño de página {counts}"
+        )
+        self.assertLessEqual(counts[PAGE_SIZES[-1]], limit, f"{url}: {counts} (máximo {limit})")
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class TramiteQueryCountTests(QueryCountTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_tramite_fixture()
+        cls.token = Token.objects.create(user=cls.data["user"])
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {self.token.key}",
+            HTTP_X_AREA_ID=str(self.data["mesa"].id),
+        )
+
+    def use_area(self, area):
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {self.token.key}",
+            HTTP_X_AREA_ID=str(area.id),
+        )
+
+    def flow(self, **filters):
+        return ProcedureFlow.objects.filter(is_active=True, **filters).first()
+
+    # 📥 Bandejas
+
+    def test_inboxes(self):
+
+        inboxes = {
+            "/api/pending/": 5,
+            "/api/reception/": 5,
+            "/api/sent/": 5,
+            "/api/copies/": 5,
+            "/api/finalize/": 5,
+            "/api/reject/": 5,
+            "/api/observed/": 5,
+        }
+        for url, limit in inboxes.items():
+            with self.subTest(url=url):
+                self.assertListQueries(limit, url, min_rows=ROWS)
+
+    def test_inbox_summary(self):
+
+        for url in ("/api/pending/", "/api/sent/", "/api/copies/"):
+            with self.subTest(url=url):
+                self.assertListQueries(3, url, {"view": "summary"}, min_rows=ROWS)
+                self.assertListQueries(3, url, {"fields": "code,subject,created_at"}, min_rows=ROWS)
+
+    def test_procedure_lists(self):
+
+        self.assertListQueries(6, "/api/list-tramite/", min_rows=ROWS)
+        self.assertListQueries(6, "/api/list-virtual-procedure/", min_rows=ROWS)
+        self.assertListQueries(4, "/api/list-tramite/", {"view": "summary"}, min_rows=ROWS)
+
+    def test_flow_search(self):
+
+        procedure = Procedure.objects.filter(from_area=self.data["mesa"]).first()
+        self.assertListQueries(4, "/api/flows/", {"code": procedure.code})
+
+        virtual = Procedure.objects.filter(is_virtual=True).first()
+        self.client.credentials()
+        self.assertMaxQueries(1, "get", "/api/flows/", {"tracking_code": virtual.tracking_code})
+
+    def test_dashboard(self):
+
+        self.assertMaxQueries(13, "get", "/api/dashboard/flows/")
+
+    # 📚 Datos de referencia
+
+    def test_reference_data(self):
+
+        province = Province.objects.first()
+        endpoints = {
+            "/api/departments/": 1,
+            f"/api/provinces/?department={province.department_id}": 1,
+            f"/api/districts/?province={province.id}": 1,
+            "/api/ubigeo/": 3,
+            "/api/company/": 1,
+            "/api/areas/": 2,
+            "/api/documents/": 1,
+            "/api/agencies/": 1,
+            "/api/holiday/": 2,
+            "/api/work/": 2,
+            "/api/areas/user/": 2,
+        }
+        for url, limit in endpoints.items():
+            with self.subTest(url=url):
+                self.assertListQueries(limit, url)
+
+    def test_check_schedule(self):
+
+        # 200 o 400 según el día en que corra la prueba
+        self.client.credentials()
+        response, count = self.request("get", "/api/check-schedule/")
+
+        self.assertIn(response.status_code, (200, 400))
+        self.assertLessEqual(count, 2)
+
+    # 📝 Registro y edición
+
+    @mock.patch("apps.tramite.serializers.check_schedule", return_value=ScheduleResult.IN_SCHEDULE)
+    def test_create_procedure(self, _):
+
+        data = self.data
+        payload = {
+            "document_type": data["document"].id,
+            "document_number": "123",
+            "subject": "Solicitud de prueba",
+            "folios": 2,
+            "sender_name": "Juan Pérez",
+            "from_area": data["mesa"].id,
+            "agency": data["agency"].id,
+            "destination_areas": [data["gerencia"].id],
+            "copy_areas": [data["logistica"].id],
+            "files": [
+                SimpleUploadedFile("a.pdf", b"%PDF-1.4 a", content_type="application/pdf"),
+                SimpleUploadedFile("b.pdf", b"%PDF-1.4 b", content_type="application/pdf"),
+            ],
+        }
+        self.assertMaxQueries(21, "post", "/api/create-tramite/", payload, status=201, format="multipart")
+
+    @mock.patch("apps.tramite.serializers.check_schedule", return_value=ScheduleResult.IN_SCHEDULE)
+    def test_create_virtual_procedure(self, _):
+
+        self.client.credentials()
+        payload = {
+            "document_type": self.data["document"].id,
+            "document_number": "9",
+            "subject": "Trámite virtual",
+            "folios": 1,
+            "sender_name": "Ana Quispe",
+            "sender_email": "ana@example.com",
+            "agency": self.data["agency"].id,
+            "is_virtual": True,
+        }
+        self.assertMaxQueries(18, "post", "/api/virtual-procedure/", payload, status=201, format="multipart")
+
+    def test_update_procedure(self):
+
+        flow = self.flow(status=ProcedureFlow.SENT, to_area=self.data["mesa"], flow_type=ProcedureFlow.NORMAL)
+        procedure = flow.procedure
+        ProcedureFlow.objects.filter(procedure=procedure, flow_type=ProcedureFlow.COPY).delete()
+
+        self.assertMaxQueries(
+            13, "put", f"/api/update-procedure/{procedure.id}/",
+            {
+                "subject": "Nuevo asunto",
+                "sender_name": procedure.sender_name,
+                "document_type": self.data["document"].id,
+                "to_area": self.data["mesa"].id,
+            },
+            format="multipart",
+        )
+
+    def test_annul_procedure(self):
+
+        flow = self.flow(status=ProcedureFlow.SENT, to_area=self.data["mesa"], flow_type=ProcedureFlow.NORMAL)
+        ProcedureFlow.objects.filter(procedure=flow.procedure, flow_type=ProcedureFlow.COPY).delete()
+
+        self.assertMaxQueries(9, "post", f"/api/annulled-procedure/{flow.procedure_id}/", {"comment": "x"})
+
+    def test_update_copies(self):
+
+        procedure = Procedure.objects.filter(from_area=self.data["mesa"]).first()
+        self.assertMaxQueries(
+            12, "put", f"/api/copies-procedure/{procedure.id}/",
+            {"copy_areas": [self.data["gerencia"].id, self.data["logistica"].id]},
+        )
+
+    # 🔁 Movimientos
+
+    def test_receive(self):
+
+        flow = self.flow(status=ProcedureFlow.SENT, to_area=self.data["mesa"], flow_type=ProcedureFlow.NORMAL)
+        self.assertMaxQueries(8, "post", f"/api/flows/{flow.id}/receive/")
+
+    def test_derive(self):
+
+        flow = self.flow(status=ProcedureFlow.RECEIVED, to_area=self.data["mesa"], flow_type=ProcedureFlow.NORMAL)
+        self.assertMaxQueries(
+            10, "post", f"/api/flows/{flow.id}/derive/",
+            {"destination_areas": [self.data["gerencia"].id], "copy_areas": [self.data["logistica"].id]},
+        )
+
+    def test_finalize(self):
+
+        flow = self.flow(status=ProcedureFlow.RECEIVED, to_area=self.data["mesa"], flow_type=ProcedureFlow.NORMAL)
+        self.assertMaxQueries(7, "post", f"/api/flows/{flow.id}/finalize/")
+
+    def test_reject(self):
+
+        flow = self.flow(status=ProcedureFlow.SENT, to_area=self.data["mesa"], flow_type=ProcedureFlow.NORMAL)
+        self.assertMaxQueries(7, "post", f"/api/flows/{flow.id}/reject/", {"comment": "Incompleto"})
+
+    def test_observe(self):
+
+        flow = self.flow(status=ProcedureFlow.RECEIVED, to_area=self.data["mesa"], flow_type=ProcedureFlow.NORMAL)
+        self.assertMaxQueries(7, "post", f"/api/flows/{flow.id}/observed/", {"comment": "Falta firma"})
+
+    def test_resend_observed(self):
+
+        flow = self.flow(status=ProcedureFlow.OBSERVED, flow_type=ProcedureFlow.NORMAL)
+        self.assertMaxQueries(
+            11, "post", f"/api/flows/{flow.id}/resend-observed/",
+            {"destination_area": self.data["gerencia"].id, "folios": 4},
+            format="multipart",
+        )
+
+    # 🖨️ PDF
+
+    def test_pdfs(self):
+
+        procedure = Procedure.objects.filter(flows__status=ProcedureFlow.FINALIZED).first()
+        endpoints = {
+            f"/api/history-procedure/{procedure.id}/pdf/": 4,
+            f"/api/history-procedure-simplificado/{procedure.id}/pdf/": 6,
+            f"/api/ticket-procedure/{procedure.id}/pdf/": 3,
+        }
+        for url, limit in endpoints.items():
+            with self.subTest(url=url):
+                self.assertMaxQueries(limit, "get", url)
+
+class RequestMetricsTests(TramiteAPITestMixin, TestCase):
+    """
+    RequestMetricsMiddleware cuenta las consultas de la vista en WSGI y en ASGI
+    (las vistas síncronas se ejecutan en otro hilo, con otras conexiones)
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        caches["throttle"].clear()
+        self.headers = {"Authorization": f"Token {self.token.key}", "X-Area-Id": str(self.data["mesa"].id)}
+
+    def server_timing_queries(self, response):
+
+        self.assertEqual(response.status_code, 200)
+        return int(re.search(r'desc="(\d+) queries"', response["Server-Timing"]).group(1))
+
+    def test_sync_and_async_count_the_same_queries(self):
+
+        with CaptureQueriesContext(connection) as ctx:
+            sync = self.server_timing_queries(self.client.get("/api/pending/", headers=self.headers))
+        self.assertEqual(sync, len(ctx.captured_queries))
+
+        response = async_to_sync(AsyncClient().get)("/api/pending/", headers=self.headers)
+        self.assertEqual(self.server_timing_queries(response), sync)
+
+        # Cadena de middlewares asíncrona: el middleware corre en el hilo del event loop
+        with self.settings(MIDDLEWARE=["apps.tramite.core.middleware.RequestMetricsMiddleware"]):
+            response = async_to_sync(AsyncClient().get)("/api/pending/", headers=self.headers)
+        self.assertEqual(self.server_timing_queries(response), sync)
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    """
+    CompressionMiddleware: qué se comprime y con qué cabeceras
+    """
+
+    BODY = b'{"results": [%s]}' % b",".join(b'{"id": %d, "subject": "Solicitud"}' % n for n in range(200))
+
+    def respond(self, content, content_type="application/json", accept="gzip, br", **headers):
+
+        def get_response(request):
+            response = HttpResponse(content, content_type=content_type)
+            for name, value in headers.items():
+                response[name] = value
+            return response
+
+        request = RequestFactory().get("/", headers={"Accept-Encoding": accept})
+        return CompressionMiddleware(get_response)(request)
+
+    def test_compressed_response(self):
+
+        for encoding, decompress in (("br", brotli.decompress), ("gzip", gzip.decompress)):
+            with self.subTest(encoding=encoding):
+                response = self.respond(self.BODY, accept=encoding, ETag='"abc"')
+                self.assertEqual(response["Content-Encoding"], encoding)
+                self.assertEqual(decompress(response.content), self.BODY)
+                self.assertEqual(response["Content-Length"], str(len(response.content)))
+                self.assertIn("Accept-Encoding", response["Vary"])
+                self.assertEqual(response["ETag"], 'W/"abc"')
+
+    def test_small_body_unchanged(self):
+
+        body = self.BODY[:settings.COMPRESSION_MIN_SIZE - 1]
+        response = self.respond(body)
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response.content, body)
+
+    def test_binary_types_skipped(self):
+
+        for content_type in ("application/pdf", "image/png", "image/jpeg"):
+            with self.subTest(content_type=content_type):
+                response = self.respond(self.BODY, content_type=content_type)
+                self.assertFalse(response.has_header("Content-Encoding"))
+                self.assertFalse(response.has_header("Vary"))
+                self.assertEqual(response.content, self.BODY)
+
+    def test_already_encoded_left_alone(self):
+
+        response = self.respond(self.BODY, **{"Content-Encoding": "br"})
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(response.content, self.BODY)
+
+    def test_zero_quality_honoured(self):
+
+        self.assertEqual(self.respond(self.BODY, accept="br;q=0, gzip")["Content-Encoding"], "gzip")
+
+        response = self.respond(self.BODY, accept="br;q=0, gzip;q=0")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response.content, self.BODY)
+        # La respuesta depende igual de Accept-Encoding
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+class RendererTests(SimpleTestCase):
+    """
+    ORJSONRenderer produce los mismos bytes que JSONRenderer de DRF
+    """
+
+    DATA = {
+        "texto": 'Perú "año" </script> \u2028 \u2029',
+        "decimal": Decimal("10.25"),
+        "float": 0.1,
+        "fecha": datetime(2026, 3, 4).date(),
+        "hora": time(10, 30, 0, 123456),
+        "creado": timezone.localtime(timezone.make_aware(datetime(2026, 3, 4, 8, 15, 1, 987654))),
+        "uuid": uuid.UUID(int=1),
+        "lista": [1, None, True, {"anidado": []}],
+    }
+
+    def test_parity_with_drf(self):
+
+        for accepted in (None, "application/json", "application/json; indent=4"):
+            with self.subTest(accepted=accepted):
+                self.assertEqual(
+                    ORJSONRenderer().render(self.DATA, accepted),
+                    JSONRenderer().render(self.DATA, accepted),
+                )
+
+        self.assertIn(b"\\u2028 \\u2029", ORJSONRenderer().render(self.DATA))
+
+class ReferenceDataCacheTests(TramiteAPITestMixin, TestCase):
+    """
+    ReferenceDataCacheMixin: ETag/304 y nueva versión al escribir en la tabla
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        caches["throttle"].clear()
+        refcache._blobs.clear()
+
+    def get(self, url, etag=None):
+        headers = {"If-None-Match": etag} if etag else {}
+        return self.client.get(url, headers=headers)
+
+    def test_not_modified(self):
+
+        for url, table in (("/api/areas/", "tramite_area"), ("/api/agencies/", "tramite_agency")):
+            with self.subTest(url=url):
+                etag = self.get(url)["ETag"]
+
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.get(url, etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response["ETag"], etag)
+                self.assertFalse([q["sql"] for q in queries if table in q["sql"]])
+
+    def test_writes_bump_version(self):
+
+        areas = self.get("/api/areas/")
+        agencies = self.get("/api/agencies/")
+
+        area = self.data["gerencia"]
+        with self.captureOnCommitCallbacks(execute=True):
+            area.name = "Gerencia renombrada"
+            area.save()
+
+        response = self.get("/api/areas/", areas["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], areas["ETag"])
+        self.assertIn("Gerencia renombrada", [row["name"] for row in response.json()])
+        # Agency no cambió
+        self.assertEqual(self.get("/api/agencies/", agencies["ETag"]).status_code, 304)
+
+        # agency_name de las áreas depende de Agency
+        areas = response
+        agency = self.data["agency"]
+        with self.captureOnCommitCallbacks(execute=True):
+            agency.name = "Agencia renombrada"
+            agency.save()
+
+        for url, before in (("/api/areas/", areas), ("/api/agencies/", agencies)):
+            with self.subTest(url=url):
+                response = self.get(url, before["ETag"])
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response["ETag"], before["ETag"])
+                self.assertIn(b"Agencia renombrada", response.content)
+    # 🗺️ Ubigeo en un solo documento
+
+    def vary(self, response):
+        return [value.strip() for value in response["Vary"].split(",")]
+
+    def ubigeo(self, encoding=None, etag=None):
+        headers = {"Accept-Encoding": encoding or ""}
+        if etag:
+            headers["If-None-Match"] = etag
+        return self.client.get("/api/ubigeo/", headers=headers)
+
+    def test_ubigeo_bundle_contents(self):
+
+        District.objects.filter(id="010102").update(active=False)
+
+        response = self.ubigeo()
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+        bundle = response.json()
+        self.assertEqual(bundle["format"], ["id", "description", "children"])
+        self.assertEqual([d[0] for d in bundle["departments"]], ["01", "02", "03"])
+
+        department = bundle["departments"][0]
+        self.assertEqual(department[1], "Departamento 1")
+        self.assertEqual([p[:2] for p in department[2]], [["0101", "Provincia 1-1"], ["0102", "Provincia 1-2"]])
+        # Distritos sin hijos y solo los activos
+        self.assertEqual(department[2][0][2], [["010101", "Distrito 1-1-1"]])
+        self.assertEqual(department[2][1][2], [["010201", "Distrito 1-2-1"], ["010202", "Distrito 1-2-2"]])
+
+    def test_ubigeo_encodings(self):
+
+        identity = self.ubigeo()
+        etags = {None: identity["ETag"]}
+
+        for encoding, decompress in (("br", brotli.decompress), ("gzip", gzip.decompress)):
+            with self.subTest(encoding=encoding):
+                response = self.ubigeo(f"{encoding}, identity")
+                self.assertEqual(response["Content-Encoding"], encoding)
+                self.assertIn("Accept-Encoding", self.vary(response))
+                self.assertTrue(response["ETag"].endswith(f'-{encoding}"'))
+                self.assertEqual(decompress(response.content), identity.content)
+                etags[encoding] = response["ETag"]
+
+        # Un ETag por representación
+        self.assertEqual(len(set(etags.values())), 3)
+
+        # br con q=0: gzip
+        self.assertEqual(self.ubigeo("br;q=0, gzip")["Content-Encoding"], "gzip")
+
+        for encoding, etag in etags.items():
+            with self.subTest(encoding=encoding):
+                response = self.ubigeo(encoding, etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response["ETag"], etag)
+                self.assertIn("Accept-Encoding", self.vary(response))
+
+        # El ETag de otra representación no vale
+        self.assertEqual(self.ubigeo("gzip", etags["br"]).status_code, 200)
+
+class TrackingCacheTests(TramiteAPITestMixin, TestCase):
+    """
+    Seguimiento público (/api/flows/?tracking_code=): cache con ETag, invalidada por las señales
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.procedure = Procedure.objects.filter(is_virtual=True).first()
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        caches["throttle"].clear()
+        self.client.credentials()
+
+    def track(self, tracking_code=None, **headers):
+        return self.client.get(
+            "/api/flows/", {"tracking_code": tracking_code or self.procedure.tracking_code}, headers=headers
+        )
+
+    def test_not_modified_without_queries(self):
+
+        response = self.track()
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertNumQueries(0):
+            response = self.track(**{"If-None-Match": response["ETag"]})
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(response.content)
+
+    def test_flow_changes_invalidate(self):
+
+        first = self.track()
+        count = first.json()["count"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProcedureFlow.objects.create(
+                procedure=self.procedure, sequence=99, status=ProcedureFlow.SENT,
+                from_area=self.data["mesa"], to_area=self.data["gerencia"], sent_by=self.data["user"],
+            )
+
+        second = self.track(**{"If-None-Match": first["ETag"]})
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()["count"], count + 1)
+        self.assertNotEqual(second["ETag"], first["ETag"])
+
+        flow = ProcedureFlow.objects.get(procedure=self.procedure, sequence=99)
+        with self.captureOnCommitCallbacks(execute=True):
+            flow.status = ProcedureFlow.RECEIVED
+            flow.save(update_fields=["status"])
+
+        third = self.track(**{"If-None-Match": second["ETag"]})
+        self.assertEqual(third.status_code, 200)
+        self.assertIn(ProcedureFlow.RECEIVED, [row["status"] for row in third.json()["results"]])
+
+    def test_unknown_codes_not_cached(self):
+
+        response = self.track("NOEXISTE")
+        self.assertEqual(response.json()["count"], 0)
+        self.assertIsNone(cache.get(tracking_cache_key("NOEXISTE", "")))
+
+@override_settings(DATABASE_REPLICA_ALIAS="default")
+class ReplicaRoutingTests(TestCase):
+    """
+    ReplicaRouter y ReplicaRoutingMiddleware: lecturas a la réplica solo en vistas
+    configuradas y read-your-writes por usuario (la réplica es aquí la propia "default")
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_tramite_fixture()
+
+    def setUp(self):
+        cache.clear()
+        caches["throttle"].clear()
+
+    def test_router(self):
+
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Procedure))
+        self.assertEqual(router.db_for_write(Procedure), "default")
+
+        token = use_replica.set(True)
+        try:
+            self.assertEqual(router.db_for_read(Procedure), "default")
+            self.assertEqual(router.db_for_write(Procedure), "default")
+        finally:
+            use_replica.reset(token)
+
+    def reads_replica(self, client, url):
+        """
+        Hace la petición y dice si alguna lectura se dirigió a la réplica
+        """
+        routed = []
+        db_for_read = ReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            alias = db_for_read(router, model, **hints)
+            routed.append(alias)
+            return alias
+
+        with mock.patch.object(ReplicaRouter, "db_for_read", record):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return any(routed)
+
+    def test_login_then_token_reads_its_writes(self):
+
+        response = self.client.post("/user/login/", {"username": "mesa", "password": "secret"})
+        self.assertEqual(response.status_code, 200)
+
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f"Token {Token.objects.get(user=self.data['user']).key}",
+            HTTP_X_AREA_ID=str(self.data["mesa"].id),
+        )
+
+        # Token recién emitido: la principal; después ya puede ir a la réplica
+        self.assertFalse(self.reads_replica(client, "/api/pending/"))
+        self.assertTrue(self.reads_replica(client, "/api/pending/"))
+
+        # Vistas no configuradas nunca van a la réplica
+        self.assertFalse(self.reads_replica(client, "/user/me/"))
+
+        # Una escritura fija al usuario (no al token) a la principal
+        request = RequestFactory().post("/api/procedure/")
+        request.user = self.data["user"]
+        ReplicaRoutingMiddleware(lambda request: HttpResponse(status=201))(request)
+        self.assertFalse(self.reads_replica(client, "/api/pending/"))
+
+THROTTLE_TEST_RATES = {**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {"public": "3/min", "schedule": "2/min"}}
+
+class ThrottleTests(TestCase):
+    """
+    TokenBucketThrottle: recarga continua, 429 con Retry-After y la IP de REMOTE_ADDR
+    """
+
+    def setUp(self):
+        caches["throttle"].clear()
+
+    def test_bucket_refill(self):
+
+        bucket = TokenBucket("2/min")
+
+        with mock.patch("apps.tramite.core.throttling.time") as clock:
+            clock.time.return_value = 1000.0
+            self.assertIsNone(bucket.consume("k"))
+            self.assertIsNone(bucket.consume("k"))
+            self.assertAlmostEqual(bucket.consume("k"), 30)
+
+            # Un token cada 30 s
+            clock.time.return_value = 1015.0
+            self.assertAlmostEqual(bucket.consume("k"), 15)
+            clock.time.return_value = 1030.0
+            self.assertIsNone(bucket.consume("k"))
+            self.assertAlmostEqual(bucket.consume("k"), 30)
+
+    @override_settings(REST_FRAMEWORK=THROTTLE_TEST_RATES)
+    def test_429_with_retry_after(self):
+
+        for _ in range(2):
+            self.assertNotEqual(self.client.get("/api/check-schedule/").status_code, 429)
+
+        # Otra X-Forwarded-For no da un bucket nuevo (NUM_PROXIES=0)
+        response = self.client.get("/api/check-schedule/", headers={"X-Forwarded-For": "203.0.113.9"})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "30")
+
+    @override_settings(REST_FRAMEWORK=THROTTLE_TEST_RATES)
+    def test_global_rejection_keeps_endpoint_budget(self):
+
+        caches["throttle"].set("throttle:public:127.0.0.1", (0, time_module.time()), 60)
+
+        self.assertEqual(self.client.get("/api/check-schedule/").status_code, 429)
+        self.assertIsNone(caches["throttle"].get("throttle:schedule:127.0.0.1"))
+
+class MetricsViewTests(TestCase):
+    """
+    /metrics: cerrado por defecto, también desde 127.0.0.1 (proxy en el mismo host)
+    """
+
+    def test_closed_without_token(self):
+
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+
+        with self.settings(METRICS_ALLOWED_IPS=["127.0.0.1"]):
+            self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+    @override_settings(METRICS_TOKEN="secreto", METRICS_ALLOWED_IPS=["127.0.0.1"])
+    def test_token(self):
+
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.assertEqual(self.client.get("/metrics", headers={"Authorization": "Bearer secreto"}).status_code, 200)
+        self.assertEqual(self.client.get("/metrics", headers={"Authorization": "Bearer secret"}).status_code, 403)
+        self.assertEqual(self.client.get("/metrics", headers={"Authorization": "Bearer señal"}).status_code, 403)
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, PROTECTED_MEDIA_SERVER="")
+class ProcedureFileDownloadTests(TramiteAPITestMixin, TestCase):
+    """
+    Los adjuntos solo se descargan por /api/files/<id>/download/ y con acceso al trámite
+    """
+
+    CONTENT = b"%PDF-1.4\n" + bytes(range(256)) * 40
+    OUTSIDER_AREA = "virtual"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+
+        # Registrado por mesa de partes: aparece en /api/list-tramite/
+        cls.procedure_file = ProcedureFile.objects.filter(procedure__from_area=cls.data["mesa"]).first()
+
+    def setUp(self):
+        super().setUp()
+        # Sin credenciales: cada prueba se autentica si lo necesita
+        self.client.credentials()
+
+        path = os.path.join(MEDIA_ROOT, self.procedure_file.file.name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as fh:
+            fh.write(self.CONTENT)
+
+        self.url = f"/api/files/{self.procedure_file.id}/download/"
+
+    def download(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_requires_access_to_procedure(self):
+
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+        self.authenticate(self.outsider_token, area=None)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+        self.authenticate(self.token, area=None)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.download(response), self.CONTENT)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+
+    def test_signed_file_url(self):
+
+        self.authenticate(self.token)
+        results = self.client.get("/api/list-tramite/", {"page_size": 100}).data["results"]
+        file_url = next(
+            file["file_url"]
+            for row in results for file in row["files"]
+            if file["id"] == self.procedure_file.id
+        )
+        self.assertIn(self.url, file_url)
+
+        # Sin cabecera Authorization: basta la firma
+        self.client.credentials()
+        response = self.client.get(file_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.download(response), self.CONTENT)
+
+        self.assertEqual(self.client.get(file_url + "x").status_code, 403)
+
+        other = ProcedureFile.objects.exclude(id=self.procedure_file.id).first()
+        signature = file_url.split("signature=")[1]
+        self.assertEqual(
+            self.client.get(f"/api/files/{other.id}/download/", {"signature": signature}).status_code, 403
+        )
+
+    def test_range_requests(self):
+
+        self.authenticate(self.token)
+        size = len(self.CONTENT)
+
+        cases = {
+            "bytes=0-99": (0, 99),
+            "bytes=100-": (100, size - 1),
+            "bytes=-50": (size - 50, size - 1),
+            "bytes=10-999999": (10, size - 1),
+        }
+        for header, (start, end) in cases.items():
+            with self.subTest(range=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response["Content-Range"], f"bytes {start}-{end}/{size}")
+                self.assertEqual(self.download(response), self.CONTENT[start:end + 1])
+
+        response = self.client.get(self.url, HTTP_RANGE=f"bytes={size}-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{size}")
+
+        # Varios rangos o If-Range desactualizado: archivo completo
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE="bytes=0-1,5-6").status_code, 200)
+        self.assertEqual(
+            self.client.get(self.url, HTTP_RANGE="bytes=0-1", HTTP_IF_RANGE="Wed, 21 Oct 2015 07:28:00 GMT").status_code,
+            200
+        )
+
+    def test_offload_to_web_server(self):
+
+        self.authenticate(self.token)
+
+        with self.settings(PROTECTED_MEDIA_SERVER="nginx"):
+            response = self.client.get(self.url)
+            self.assertEqual(response["X-Accel-Redirect"], f"/protected-media/{self.procedure_file.file.name}")
+            self.assertEqual(response.content, b"")
+
+        with self.settings(PROTECTED_MEDIA_SERVER="apache"):
+            response = self.client.get(self.url)
+            self.assertEqual(response["X-Sendfile"], self.procedure_file.file.path)
+
+    def test_media_url_does_not_expose_attachments(self):
+
+        self.assertEqual(self.client.get(f"/media/{self.procedure_file.file.name}").status_code, 404)
+
+    def media_status(self, url):
+        """
+        Código de /media/ en DEBUG (public_media), sirviendo desde MEDIA_ROOT de las pruebas
+        """
+        for pattern in public_media:
+            match = pattern.resolve(url.lstrip("/"))
+            if match:
+                try:
+                    return match.func(RequestFactory().get(url), match.kwargs["path"], document_root=MEDIA_ROOT).status_code
+                except Http404:
+                    return 404
+        return 404
+
+    def test_debug_media_serves_only_public_files(self):
+
+        with open(os.path.join(MEDIA_ROOT, "logo.png"), "wb") as fh:
+            fh.write(b"logo")
+
+        name = self.procedure_file.file.name
+        self.assertEqual(self.media_status("/media/logo.png"), 200)
+
+        for url in (
+            f"/media/{name}", f"/media//{name}", f"/media/x/../{name}",
+            f"/media/logos/../{name}", "/media/logos/..", f"/media/./{name}",
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.media_status(url), 404)
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, PROTECTED_MEDIA_SERVER="", UPLOAD_CHUNK_SIZE=1024)
+class FileUploadTests(TramiteAPITestMixin, TestCase):
+    """
+    Subida por partes: init -> partes en orden -> complete -> upload_ids en el trámite
+    """
+
+    CONTENT = bytes(range(256)) * 10
+    OUTSIDER_AREA = "virtual"
+
+    def put_chunk(self, upload_id, offset, chunk, **extra):
+        return self.client.put(
+            f"/api/uploads/{upload_id}/chunk/", chunk,
+            content_type="application/octet-stream", HTTP_UPLOAD_OFFSET=str(offset), **extra
+        )
+
+    def upload(self, content=None, filename="Expediente escaneado.pdf"):
+
+        content = content or self.CONTENT
+        response = self.client.post("/api/uploads/", {"filename": filename, "size": len(content)}, format="json")
+        self.assertEqual(response.status_code, 201, response.content)
+
+        upload_id = response.data["id"]
+        chunk_size = response.data["chunk_size"]
+
+        for offset in range(0, len(content), chunk_size):
+            response = self.put_chunk(upload_id, offset, content[offset:offset + chunk_size])
+            self.assertEqual(response.status_code, 200, response.content)
+
+        response = self.client.post(f"/api/uploads/{upload_id}/complete/", format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+
+        return upload_id
+
+    def test_chunks_must_be_sequential(self):
+
+        size = len(self.CONTENT)
+        upload_id = self.client.post(
+            "/api/uploads/", {"filename": "a.pdf", "size": size}, format="json"
+        ).data["id"]
+
+        self.assertEqual(self.put_chunk(upload_id, 0, self.CONTENT[:1000]).status_code, 200)
+
+        # Offset repetido o saltado: 409 con lo recibido para reanudar
+        response = self.put_chunk(upload_id, 0, self.CONTENT[:1000])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["received"], 1000)
+
+        # Digest incorrecto: la parte se descarta
+        response = self.put_chunk(upload_id, 1000, self.CONTENT[1000:2000], HTTP_X_CHUNK_SHA256="0" * 64)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(f"/api/uploads/{upload_id}/").data["received"], 1000)
+
+        # Parte mayor al máximo / incompleta al completar
+        self.assertEqual(self.put_chunk(upload_id, 1000, self.CONTENT[1000:2100]).status_code, 413)
+        self.assertEqual(self.client.post(f"/api/uploads/{upload_id}/complete/").status_code, 400)
+
+        self.assertEqual(self.put_chunk(upload_id, 1000, self.CONTENT[1000:2000]).status_code, 200)
+        self.assertEqual(self.put_chunk(upload_id, 2000, self.CONTENT[2000:]).status_code, 200)
+
+        response = self.client.post(f"/api/uploads/{upload_id}/complete/")
+        self.assertEqual(response.status_code, 200)
+
+        digests = [hashlib.sha256(self.CONTENT[n:n + 1000]).hexdigest() for n in (0, 1000, 2000)]
+        self.assertEqual(response.data["tree_sha256"], hashlib.sha256("".join(digests).encode()).hexdigest())
+
+        upload = FileUpload.objects.get(id=upload_id)
+        with upload.file.open("rb") as fh:
+            self.assertEqual(fh.read(), self.CONTENT)
+
+    @mock.patch("apps.tramite.serializers.check_schedule", return_value=ScheduleResult.IN_SCHEDULE)
+    def test_create_procedure_with_uploads(self, _):
+
+        upload_id = self.upload()
+        payload = {
+            "document_type": self.data["document"].id,
+            "document_number": "123",
+            "subject": "Expediente grande",
+            "folios": 200,
+            "sender_name": "Juan Pérez",
+            "from_area": self.data["mesa"].id,
+            "agency": self.data["agency"].id,
+            "destination_areas": [self.data["gerencia"].id, self.data["logistica"].id],
+            "upload_ids": [upload_id],
+        }
+
+        response = self.client.post("/api/create-tramite/", payload, format="json")
+        self.assertEqual(response.status_code, 201, response.content)
+
+        files = ProcedureFile.objects.filter(procedure__subject="Expediente grande")
+        self.assertEqual(files.count(), 2)
+        self.assertEqual({file.file.name for file in files}, {FileUpload.objects.get(id=upload_id).file.name})
+
+        response = self.client.get(f"/api/files/{files[0].id}/download/")
+        self.assertEqual(b"".join(response.streaming_content), self.CONTENT)
+        self.assertIn("Expediente_escaneado.pdf", response["Content-Disposition"])
+
+        # Ya asociada: no se puede reutilizar
+        response = self.client.post("/api/create-tramite/", payload, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_attach_rechecks_status_under_lock(self):
+
+        upload = FileUpload.objects.get(id=self.upload())
+        procedure = Procedure.objects.filter(from_area=self.data["mesa"]).first()
+
+        # Dos peticiones validaron la misma subida: solo la primera la asocia
+        self.assertEqual(len(attach_uploads([procedure], [upload], self.data["user"])), 1)
+        with self.assertRaises(ValidationError):
+            attach_uploads([procedure], [upload], self.data["user"])
+
+        self.assertEqual(ProcedureFile.objects.filter(file=upload.file.name).count(), 1)
+        self.assertEqual(FileUpload.objects.get(id=upload.id).status, FileUpload.ATTACHED)
+
+    def test_uploads_belong_to_their_user(self):
+
+        upload_id = self.upload()
+        self.authenticate(self.outsider_token, area=None)
+
+        self.assertEqual(self.client.get(f"/api/uploads/{upload_id}/").status_code, 404)
+        self.assertEqual(self.put_chunk(upload_id, 0, b"x").status_code, 404)
+
+def scanned_pdf(pages=2, size=(2400, 1800)):
+    """
+    PDF como el de un escáner: una imagen JPEG de alta calidad por página
+    """
+    images = [
+        Image.effect_noise(size, 60 + n * 10).convert("RGB")
+        for n in range(pages)
+    ]
+    buffer = BytesIO()
+    images[0].save(buffer, format="PDF", save_all=True, append_images=images[1:], quality=95, resolution=200)
+    return buffer.getvalue()
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, PROTECTED_MEDIA_SERVER="", ATTACHMENT_PROCESSING_ASYNC=False)
+class AttachmentProcessingTests(TramiteAPITestMixin, TestCase):
+    """
+    Miniatura, páginas y PDF optimizado al confirmar la transacción
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.procedure = Procedure.objects.filter(from_area=cls.data["mesa"]).first()
+
+    def attach(self, name, content):
+
+        with self.captureOnCommitCallbacks(execute=True):
+            procedure_file = ProcedureFile.objects.create(
+                procedure=self.procedure,
+                uploaded_by=self.data["user"],
+                file=SimpleUploadedFile(name, content),
+            )
+
+        procedure_file.refresh_from_db()
+        return procedure_file
+
+    def test_scanned_pdf(self):
+
+        content = scanned_pdf()
+        procedure_file = self.attach("escaneo.pdf", content)
+
+        self.assertEqual(procedure_file.processing_status, ProcedureFile.DONE)
+        self.assertEqual(procedure_file.page_count, 2)
+
+        with Image.open(procedure_file.thumbnail.path) as thumbnail:
+            self.assertEqual(thumbnail.format, "JPEG")
+            self.assertLessEqual(max(thumbnail.size), 320)
+
+        self.assertTrue(procedure_file.optimized)
+        self.assertLess(procedure_file.optimized.size, len(content) * 0.8)
+        self.assertEqual(len(PdfReader(procedure_file.optimized.path).pages), 2)
+
+        # Las variantes también pasan por la descarga protegida
+        row = next(
+            file
+            for row in self.client.get("/api/list-tramite/", {"page_size": 100}).data["results"]
+            for file in row["files"] if file["id"] == procedure_file.id
+        )
+        self.assertEqual(row["page_count"], 2)
+
+        self.client.credentials()
+        response = self.client.get(row["thumbnail_url"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+
+        response = self.client.get(row["optimized_url"])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(procedure_file.file.name.split("/")[-1], response["Content-Disposition"])
+
+    def test_photo(self):
+
+        buffer = BytesIO()
+        Image.effect_noise((3000, 4000), 50).convert("RGB").save(buffer, format="JPEG", quality=95)
+        procedure_file = self.attach("foto.jpg", buffer.getvalue())
+
+        self.assertEqual(procedure_file.processing_status, ProcedureFile.DONE)
+        self.assertEqual(procedure_file.page_count, 1)
+        self.assertTrue(procedure_file.thumbnail)
+
+        with Image.open(procedure_file.optimized.path) as optimized:
+            self.assertLessEqual(max(optimized.size), 2000)
+
+    def test_png_optimized_as_jpeg(self):
+
+        buffer = BytesIO()
+        Image.effect_noise((1200, 900), 50).convert("RGB").save(buffer, format="PNG")
+        procedure_file = self.attach("plano.png", buffer.getvalue())
+
+        self.assertTrue(procedure_file.optimized.name.endswith(".jpg"))
+        with Image.open(procedure_file.optimized.path) as optimized:
+            self.assertEqual(optimized.format, "JPEG")
+
+        response = self.client.get(f"/api/files/{procedure_file.id}/download/", {"variant": "optimized"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        stem = os.path.splitext(procedure_file.file.name.split("/")[-1])[0]
+        self.assertIn(f'filename="{stem}.jpg"', response["Content-Disposition"])
+
+    def test_unreadable_file(self):
+
+        with self.assertLogs("apps.attachments", "WARNING"):
+            procedure_file = self.attach("roto.pdf", b"esto no es un PDF")
+
+        self.assertEqual(procedure_file.processing_status, ProcedureFile.FAILED)
+        self.assertFalse(procedure_file.thumbnail)
+        self.assertIsNone(procedure_file.page_count)
+
+    def test_library_error_does_not_stop_the_batch(self):
+
+        # PyPDF2 3.0.1 lanza AttributeError al leer imágenes con paleta
+        buffer = BytesIO()
+        Image.effect_noise((200, 150), 50).convert("P").save(buffer, format="PDF")
+
+        with self.assertLogs("apps.attachments", "ERROR"):
+            with self.captureOnCommitCallbacks(execute=True):
+                palette, scanned = [
+                    ProcedureFile.objects.create(
+                        procedure=self.procedure, uploaded_by=self.data["user"],
+                        file=SimpleUploadedFile(name, content),
+                    )
+                    for name, content in (("paleta.pdf", buffer.getvalue()), ("escaneo.pdf", scanned_pdf()))
+                ]
+
+        palette.refresh_from_db()
+        scanned.refresh_from_db()
+        self.assertEqual(palette.processing_status, ProcedureFile.FAILED)
+        self.assertIsNone(palette.page_count)
+        self.assertEqual(scanned.processing_status, ProcedureFile.DONE)
+
+    def test_folios_from_attachments(self):
+
+        Procedure.objects.filter(id=self.procedure.id).update(folios=0)
+        ProcedureFile.objects.filter(procedure=self.procedure).delete()
+
+        first = self.attach("escaneo.pdf", scanned_pdf(pages=3, size=(200, 150)))
+        self.procedure.refresh_from_db()
+        self.assertEqual((self.procedure.counted_folios, self.procedure.folios), (3, 3))
+
+        # Sin corrección manual, folios sigue al conteo
+        self.attach("anexo.pdf", scanned_pdf(pages=2, size=(200, 150)))
+        self.procedure.refresh_from_db()
+        self.assertEqual((self.procedure.counted_folios, self.procedure.folios), (5, 5))
+
+        # Corregido por el usuario (p. ej. al reenviar un observado): se respeta
+        Procedure.objects.filter(id=self.procedure.id).update(folios=8)
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+
+        self.procedure.refresh_from_db()
+        self.assertEqual((self.procedure.counted_folios, self.procedure.folios), (2, 8))
+
+    def test_page_count_reads_only_page_tree_root(self):
+
+        with open(self.attach("escaneo.pdf", scanned_pdf(pages=4, size=(200, 150))).file.path, "rb") as fh:
+            reader = PdfReader(fh)
+            self.assertEqual(count_pdf_pages(reader), 4)
+            self.assertIsNone(reader.flattened_pages)
+
+class ProcedureSearchTests(TramiteAPITestMixin, TestCase):
+    """
+    /api/search-procedure/: search_vector mantenido por triggers, pg_trgm y visibilidad por áreas
+    """
+
+    OUTSIDER_AREA = "virtual"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+
+        cls.procedure = Procedure.objects.create(
+            code="000999-2025",
+            agency=cls.data["agency"],
+            document_type=cls.data["document"],
+            document_number="45-2025-GRA",
+            sender_dni="45678912",
+            sender_name="Juana Quispe Mamani",
+            from_area=cls.data["mesa"],
+            to_area=cls.data["gerencia"],
+            subject="Solicitud de licencia de funcionamiento",
+            created_by=cls.data["user"],
+        )
+
+        cls.clerk = User.objects.create_user(
+            email="gerencia@example.com", username="gerencia", password="secret",
+            name="Gerencia", agency=cls.data["agency"],
+        )
+        UserArea.objects.create(user=cls.clerk, area=cls.data["gerencia"])
+
+    def search(self, user, **params):
+
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get("/api/search-procedure/", params)
+
+    def found(self, user, q):
+
+        response = self.search(user, q=q, page_size=100)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row["code"] for row in response.data["results"]]
+
+    def test_full_text_and_fuzzy_matches(self):
+
+        for q in ("licencias de funcionamiento", "Quispe Mamami", "4567891", "000999", "45-2025-GRA"):
+            with self.subTest(q=q):
+                self.assertEqual(self.found(self.clerk, q)[0], self.procedure.code)
+
+    def test_flow_texts_are_indexed(self):
+
+        self.assertNotIn(self.procedure.code, self.found(self.clerk, "expediente técnico"))
+
+        ProcedureFlow.objects.create(
+            procedure=self.procedure,
+            sequence=1,
+            flow_type=ProcedureFlow.NORMAL,
+            status=ProcedureFlow.SENT,
+            from_area=self.data["mesa"],
+            to_area=self.data["gerencia"],
+            subject_derivar="Revisar el expediente técnico",
+            sent_by=self.data["user"],
+        )
+
+        self.assertIn(self.procedure.code, self.found(self.clerk, "expediente técnico"))
+
+        # Los datos del trámite se reindexan al editarlos
+        self.procedure.subject = "Permiso de construcción"
+        self.procedure.save()
+        self.assertIn(self.procedure.code, self.found(self.clerk, "construcciones"))
+        self.assertNotIn(self.procedure.code, self.found(self.clerk, "licencia"))
+
+    def test_only_visible_procedures(self):
+
+        self.assertEqual(self.found(self.outsider, "Quispe"), [])
+
+    def test_cursor_pagination(self):
+
+        codes = self.found(self.data["user"], "Asunto")
+        self.assertGreater(len(codes), 2)
+
+        response = self.search(self.data["user"], q="Asunto", page_size=2)
+        self.assertNotIn("count", response.data)
+
+        seen = []
+        while True:
+            seen += [row["code"] for row in response.data["results"]]
+            if not response.data["next"]:
+                break
+            client = APIClient()
+            client.force_authenticate(self.data["user"])
+            response = client.get(response.data["next"])
+
+        self.assertEqual(seen, codes)
+
+    def test_query_is_required(self):
+
+        self.assertEqual(self.search(self.clerk, q="a").status_code, 400)
+
+class InboxFilterTests(TramiteAPITestMixin, TestCase):
+    """
+    FilterSets de bandejas y listas (filters.py): cada filtro resuelto con índices
+    """
+
+    FLOW_URLS = (
+        "/api/pending/", "/api/reception/", "/api/sent/", "/api/copies/",
+        "/api/finalize/", "/api/reject/", "/api/observed/",
+    )
+    PROCEDURE_URLS = ("/api/list-tramite/", "/api/list-virtual-procedure/")
+
+    # Tablas que crecen con el uso: nunca deben recorrerse completas
+    LARGE_TABLES = ("tramite_procedureflow", "tramite_procedure")
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Procedure.objects.filter(from_area=cls.data["mesa"]).update(sender_dni="45678912")
+
+    def filters(self, flows=True):
+
+        today = timezone.localdate().isoformat()
+        params = [
+            {"date_after": today, "date_before": today},
+            {"document_type": self.data["document"].id},
+            {"origin_type": "TE"},
+            {"sender_dni": "45678912"},
+        ]
+        if flows:
+            params.append({"is_to_finalize": "true"})
+        return params
+
+    def test_filters_apply(self):
+
+        total = self.client.get("/api/list-tramite/").data["count"]
+        self.assertGreater(total, 0)
+
+        # Registrados por mesa de partes (TE)
+        self.assertEqual(self.client.get("/api/list-tramite/", {"origin_type": "TE"}).data["count"], total)
+        self.assertEqual(self.client.get("/api/list-tramite/", {"origin_type": "TI"}).data["count"], 0)
+        self.assertEqual(self.client.get("/api/list-tramite/", {"sender_dni": "45678912"}).data["count"], total)
+        self.assertEqual(self.client.get("/api/list-tramite/", {"sender_dni": "00000000"}).data["count"], 0)
+
+        today = timezone.localdate().isoformat()
+        self.assertEqual(self.client.get("/api/sent/", {"date_before": "2000-01-01"}).data["count"], 0)
+        self.assertEqual(
+            self.client.get("/api/sent/", {"date_after": today, "date_before": today}).data["count"],
+            self.client.get("/api/sent/").data["count"],
+        )
+
+        pending = self.client.get("/api/pending/").data["results"][0]
+        ProcedureFlow.objects.filter(id=pending["id"]).update(is_to_finalize=True)
+        rows = self.client.get("/api/pending/", {"is_to_finalize": "true", "page_size": 100}).data["results"]
+        self.assertEqual([row["is_to_finalize"] for row in rows], [True])
+
+        self.assertEqual(self.client.get("/api/pending/", {"origin_type": "XX"}).status_code, 400)
+
+    def test_filters_use_indexes(self):
+
+        cases = [(url, params) for url in self.FLOW_URLS for params in self.filters()]
+        cases += [(url, params) for url in self.PROCEDURE_URLS for params in self.filters(flows=False)]
+
+        for url, params in cases:
+            with self.subTest(url=url, params=params):
+                with CaptureQueriesContext(connection) as ctx:
+                    response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 200, response.content)
+
+                for query in ctx.captured_queries:
+                    if not query["sql"].startswith("SELECT"):
+                        continue
+                    plan = self.explain(query["sql"])
+                    for table in self.LARGE_TABLES:
+                        # Incluye las particiones de tramite_procedureflow (migración 0014)
+                        self.assertNotRegex(plan + " ", rf"Seq Scan on {table}(_\w+)? ", f"{query['sql']}\n{plan}")
+
+    def explain(self, sql):
+
+        with connection.cursor() as cursor:
+            cursor.execute("SET enable_seqscan = off")
+            try:
+                cursor.execute("EXPLAIN " + sql)
+                return "\n".join(row[0] for row in cursor.fetchall())
+            finally:
+                cursor.execute("RESET enable_seqscan")
+
+class ExportTests(TramiteAPITestMixin, TestCase):
+    """
+    /api/export/<procedures|flows>/<csv|xlsx>/ con los filtros de las bandejas
+    """
+
+    OUTSIDER_AREA = "virtual"
+
+    def area_procedures(self):
+
+        return Procedure.objects.filter(
+            Q(flows__from_area=self.data["mesa"]) | Q(flows__to_area=self.data["mesa"])
+        ).distinct()
+
+    def csv_rows(self, response):
+
+        self.assertEqual(response.status_code, 200)
+        content = b"".join(response.streaming_content).decode("utf-8-sig")
+        return list(csv.reader(StringIO(content)))
+
+    def test_procedures_csv(self):
+
+        rows = self.csv_rows(self.client.get("/api/export/procedures/csv/"))
+        self.assertEqual(rows[0][:2], ["Código", "Código de seguimiento"])
+        self.assertEqual(sorted(row[0] for row in rows[1:]), sorted(self.area_procedures().values_list("code", flat=True)))
+
+        rows = self.csv_rows(self.client.get("/api/export/procedures/csv/", {"sender_dni": "00000000"}))
+        self.assertEqual(len(rows), 1)
+
+    def test_csv_streams_compressed(self):
+
+        for encoding, decompressor in (("gzip", zlib.decompressobj(31)), ("br", brotli.Decompressor())):
+            with self.subTest(encoding=encoding):
+                response = self.client.get("/api/export/procedures/csv/", headers={"Accept-Encoding": encoding})
+                self.assertEqual(response["Content-Encoding"], encoding)
+
+                # Cada bloque llega comprimido y completo, sin esperar al final
+                first = next(iter(response.streaming_content))
+                self.assertTrue(decompressor.process(first) if encoding == "br" else decompressor.decompress(first))
+
+    def test_flows_xlsx(self):
+
+        response = self.client.get("/api/export/flows/xlsx/", {"origin_type": "TE"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(".xlsx", response["Content-Disposition"])
+
+        sheet = load_workbook(BytesIO(b"".join(response.streaming_content)), read_only=True).active
+        rows = list(sheet.iter_rows(values_only=True))
+
+        expected = ProcedureFlow.objects.filter(
+            procedure__in=self.area_procedures(), procedure__from_area__type="TE"
+        )
+        self.assertEqual(rows[0][:4], ("Código", "Secuencia", "Copia", "Estado"))
+        self.assertEqual(len(rows) - 1, expected.count())
+        self.assertIsInstance(rows[1][-1], datetime)
+
+    def test_formula_injection(self):
+
+        procedure = self.area_procedures().first()
+        Procedure.objects.filter(id=procedure.id).update(
+            subject='=HYPERLINK("http://evil.example","x")', sender_name="@SUM(1+1)"
+        )
+
+        rows = self.csv_rows(self.client.get("/api/export/procedures/csv/"))
+        row = next(row for row in rows if row[0] == procedure.code)
+        self.assertIn("'=HYPERLINK(\"http://evil.example\",\"x\")", row)
+        self.assertIn("'@SUM(1+1)", row)
+
+        response = self.client.get("/api/export/procedures/xlsx/")
+        sheet = load_workbook(BytesIO(b"".join(response.streaming_content))).active
+        cells = [cell for row in sheet.iter_rows() if row[0].value == procedure.code for cell in row]
+        self.assertTrue(cells)
+        self.assertNotIn("f", [cell.data_type for cell in cells])
+        self.assertIn("'@SUM(1+1)", [cell.value for cell in cells])
+
+    def test_area_access(self):
+
+        self.authenticate(self.outsider_token)
+        self.assertEqual(self.client.get("/api/export/flows/csv/").status_code, 403)
+        self.assertEqual(self.client.get("/api/export/flows/pdf/").status_code, 404)
+
+class ReportTests(TramiteAPITestMixin, TestCase):
+    """
+    refresh_reports -> AreaDailyStats -> /api/reports/area-stats/
+    analyze_flows -> AreaLeadTimeStats -> /api/reports/lead-times/
+    """
+
+    OUTSIDER_AREA = "gerencia"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        mesa, gerencia, logistica = cls.data["mesa"], cls.data["gerencia"], cls.data["logistica"]
+        user = cls.data["user"]
+
+        # Llega a gerencia el lunes 22/12 a las 16:00 y sale el viernes 26/12 a las 09:00
+        # (el 25 es feriado): 1 h + 9 h + 9 h + 1 h laborables
+        cls.procedure = Procedure.objects.create(
+            code="999999-2025", agency=cls.data["agency"], document_type=cls.data["document"],
+            folios=1, sender_name="Remitente reporte", from_area=mesa, to_area=gerencia,
+            subject="Reporte", created_by=user,
+        )
+        SENT = ProcedureFlow.SENT
+        cls.add_flows(cls.procedure, [
+            (SENT, mesa, gerencia, False, "2025-12-22 16:00"),
+            (ProcedureFlow.RECEIVED, mesa, gerencia, False, "2025-12-23 08:30"),
+            # Derivación a dos destinos: una salida
+            (SENT, gerencia, logistica, True, "2025-12-26 09:00"),
+            (SENT, gerencia, mesa, True, "2025-12-26 09:00"),
+        ])
+        Procedure.objects.filter(id=cls.procedure.id).update(created_at=cls.local("2025-12-22 16:00"))
+
+    @staticmethod
+    def local(value):
+        return timezone.make_aware(datetime.strptime(value, "%Y-%m-%d %H:%M"))
+
+    @classmethod
+    def add_flows(cls, procedure, steps, first_sequence=1):
+        """
+        steps: (status, from_area, to_area, is_derive, fecha local); el estado "RESENT"
+        es el reenvío de un observado
+        """
+        for sequence, (status, origin, target, derive, at) in enumerate(steps, start=first_sequence):
+            flow = ProcedureFlow.objects.create(
+                procedure=procedure, sequence=sequence, flow_type=ProcedureFlow.NORMAL,
+                status=ProcedureFlow.SENT if status == "RESENT" else status, is_to_observed=status == "RESENT",
+                from_area=origin, to_area=target, is_derive=derive, sent_by=cls.data["user"],
+            )
+            ProcedureFlow.objects.filter(id=flow.id).update(created_at=cls.local(at))
+
+    def setUp(self):
+        super().setUp()
+        self.authenticate(self.token, area=None)
+        refresh_area_daily_stats(full=True)
+
+    def report(self, **params):
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/reports/area-stats/", params)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q["sql"] for q in queries if "tramite_procedureflow" in q["sql"]])
+        return response.json()
+
+    def test_business_seconds(self):
+
+        calendar = load_work_calendar()
+        self.assertEqual(business_seconds(self.local("2025-12-22 16:00"), self.local("2025-12-26 09:00"), calendar), 20 * 3600)
+        # Sábado 16:00 -> lunes 09:00: el domingo no cuenta
+        self.assertEqual(business_seconds(self.local("2025-12-27 16:00"), self.local("2025-12-29 09:00"), calendar), 2 * 3600)
+        self.assertEqual(business_seconds(self.local("2025-12-22 18:00"), self.local("2025-12-22 19:00"), calendar), 0)
+
+    def test_report_by_area(self):
+
+        rows = self.report(group_by="area", date_after="2025-12-22", date_before="2025-12-31")["results"]
+        by_area = {row["area_id"]: row for row in rows}
+
+        gerencia = by_area[self.data["gerencia"].id]
+        self.assertEqual((gerencia["received"], gerencia["derived"], gerencia["dwell_count"]), (1, 1, 1))
+        self.assertEqual(gerencia["avg_dwell_hours"], 20.0)
+        self.assertEqual(by_area[self.data["mesa"].id]["created"], 1)
+
+    def test_totals_match_flows(self):
+
+        today = timezone.localdate().isoformat()
+        data = self.report(group_by="date", date_after=today, date_before=today)
+
+        finalized = ProcedureFlow.objects.filter(
+            flow_type=ProcedureFlow.NORMAL, status=ProcedureFlow.FINALIZED
+        ).values("procedure").distinct().count()
+        self.assertEqual(data["totals"]["created"], Procedure.objects.count() - 1)
+        self.assertEqual(data["totals"]["finalized"], finalized)
+        self.assertIsNotNone(data["refreshed_at"])
+
+    @override_settings(REPORTS_SETTLE_MINUTES=0)
+    def test_incremental_refresh(self):
+
+        refresh_area_daily_stats()
+        before = AreaDailyStats.objects.get(area=self.data["gerencia"], date="2025-12-23").refreshed_at
+
+        # Viernes 09:00 -> lunes 10:00: 8 h + 9 h (sábado) + 2 h
+        logistica = self.data["logistica"]
+        self.add_flows(self.procedure, [(ProcedureFlow.REJECTED, logistica, logistica, False, "2025-12-29 10:00")], 5)
+
+        self.assertEqual(refresh_area_daily_stats()["days"], 1)
+        self.assertEqual(refresh_area_daily_stats()["days"], 0)
+
+        stats = AreaDailyStats.objects.get(area=self.data["logistica"], date="2025-12-29")
+        self.assertEqual((stats.rejected, stats.dwell_count, stats.dwell_seconds), (1, 1, 19 * 3600))
+        self.assertEqual(AreaDailyStats.objects.get(area=self.data["gerencia"], date="2025-12-23").refreshed_at, before)
+
+    @override_settings(REPORTS_SETTLE_MINUTES=0)
+    def test_edit_requeues_processed_day(self):
+
+        mesa, logistica = self.data["mesa"], self.data["logistica"]
+        procedure = Procedure.objects.create(
+            code="999998-2025", agency=self.data["agency"], document_type=self.data["document"],
+            folios=1, sender_name="Remitente", from_area=mesa, to_area=self.data["gerencia"],
+            subject="Editado", created_by=self.data["user"],
+        )
+        self.add_flows(procedure, [(ProcedureFlow.SENT, mesa, self.data["gerencia"], False, "2025-12-23 10:00")])
+        Procedure.objects.filter(id=procedure.id).update(created_at=self.local("2025-12-23 10:00"))
+        procedure.refresh_from_db()
+        refresh_area_daily_stats()
+        self.assertEqual(AreaDailyStats.objects.get(area=mesa, date="2025-12-23").created, 1)
+
+        # Edición en el lugar: ningún movimiento nuevo, pero el día se recalcula
+        serializer = ProcedureUpdateSerializer(
+            procedure, data={"from_area": logistica.id}, partial=True,
+            context={"procedure": procedure, "request": SimpleNamespace(user=self.data["user"])},
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.assertEqual(refresh_area_daily_stats()["days"], 1)
+        self.assertEqual(refresh_area_daily_stats()["days"], 0)
+        self.assertEqual(AreaDailyStats.objects.get(area=logistica, date="2025-12-23").created, 1)
+        self.assertFalse(AreaDailyStats.objects.filter(area=mesa, date="2025-12-23", created__gt=0).exists())
+
+    def test_only_own_areas(self):
+
+        self.authenticate(self.outsider_token, area=None)
+        rows = self.report(group_by="area")["results"]
+
+        self.assertEqual({row["area_id"] for row in rows}, {self.data["gerencia"].id})
+        self.assertEqual(self.client.get("/api/reports/area-stats/", {"group_by": "user"}).status_code, 400)
+
+    def test_business_clock(self):
+
+        calendar = load_work_calendar()
+        starts = pd.Series(pd.date_range("2025-12-20 06:00", periods=40, freq="7h13min"))
+        ends = starts + pd.Timedelta(days=3, hours=5)
+        clock = BusinessClock(starts.min().date(), ends.max().date(), calendar)
+
+        expected = [
+            business_seconds(timezone.make_aware(start), timezone.make_aware(end), calendar)
+            for start, end in zip(starts, ends)
+        ]
+        self.assertEqual(clock.between(starts, ends).astype(int).tolist(), expected)
+
+    def test_lead_times(self):
+
+        mesa, gerencia, logistica = self.data["mesa"], self.data["gerencia"], self.data["logistica"]
+
+        # Logística observa a las 2 h y mesa de partes reenvía al día siguiente: 5 h + 2 h
+        procedure = Procedure.objects.create(
+            code="999998-2025", agency=self.data["agency"], document_type=self.data["document"],
+            folios=1, sender_name="Remitente observado", from_area=mesa, to_area=logistica,
+            subject="Observado", created_by=self.data["user"],
+        )
+        self.add_flows(procedure, [
+            (ProcedureFlow.SENT, mesa, logistica, False, "2025-12-22 10:00"),
+            (ProcedureFlow.RECEIVED, mesa, logistica, False, "2025-12-22 11:00"),
+            (ProcedureFlow.OBSERVED, logistica, logistica, False, "2025-12-22 12:00"),
+            ("RESENT", mesa, logistica, False, "2025-12-23 10:00"),
+        ])
+
+        self.assertEqual(refresh_area_lead_time_stats()["rows"], AreaLeadTimeStats.objects.count())
+        stats = {row.area_id: row for row in AreaLeadTimeStats.objects.filter(month="2025-12-01")}
+
+        self.assertEqual(
+            (stats[gerencia.id].stays, stats[gerencia.id].dwell_p90_seconds, stats[gerencia.id].derives, stats[gerencia.id].derive_fanout_avg),
+            (1, 20 * 3600, 1, 2.0),
+        )
+        self.assertEqual(
+            (stats[logistica.id].dwell_p50_seconds, stats[logistica.id].rework_loops, stats[logistica.id].rework_avg_seconds),
+            (2 * 3600, 1, 7 * 3600),
+        )
+        self.assertEqual((stats[gerencia.id].bottleneck_rank, stats[logistica.id].bottleneck_rank), (1, 2))
+
+        # Mismas permanencias que AreaDailyStats
+        refresh_area_daily_stats(full=True)
+        self.assertEqual(
+            AreaLeadTimeStats.objects.aggregate(n=Sum("stays"))["n"],
+            AreaDailyStats.objects.aggregate(n=Sum("dwell_count"))["n"],
+        )
+
+        # Desde un mes: los anteriores no se tocan
+        refresh_area_lead_time_stats(since=timezone.localdate())
+        self.assertTrue(AreaLeadTimeStats.objects.filter(month="2025-12-01").exists())
+
+        response = self.client.get("/api/reports/lead-times/", {"month_after": "2025-12-01", "month_before": "2025-12-01"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["area_name"] for row in response.json()[:2]], ["Gerencia", "Logística"])
+
+class ArchiveTests(TramiteAPITestMixin, TestCase):
+    """
+    archive_procedures: los flujos de trámites cerrados pasan a las particiones de archivo
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+
+        # Finalizados en mesa de partes hace dos años
+        cls.closed = list(
+            Procedure.objects.filter(flows__status=ProcedureFlow.FINALIZED).values_list("id", flat=True)
+        )
+        ProcedureFlow.objects.filter(procedure_id__in=cls.closed).update(
+            created_at=timezone.now() - timedelta(days=730)
+        )
+
+    def search_vectors(self):
+        return list(Procedure.objects.order_by("id").values_list("search_vector", flat=True))
+
+    def test_archive_closed_procedures(self):
+
+        cutoff = timezone.now() - timedelta(days=365)
+        total = ProcedureFlow.all_objects.filter(procedure_id__in=self.closed).count()
+        search_vectors = self.search_vectors()
+        pending = self.client.get("/api/pending/").data["count"]
+        self.assertEqual(self.client.get("/api/finalize/").data["count"], ROWS)
+
+        self.assertEqual(list(closed_procedures(cutoff).values_list("id", flat=True)), self.closed)
+        self.assertEqual(archive_procedures(cutoff, batch_size=5), {"procedures": ROWS, "flows": total})
+        self.assertEqual(archive_procedures(cutoff)["procedures"], 0)
+
+        # Bandejas: sin archivados
+        self.assertFalse(ProcedureFlow.objects.filter(procedure_id__in=self.closed).exists())
+        self.assertEqual(self.client.get("/api/finalize/").data["count"], 0)
+        self.assertEqual(self.client.get("/api/pending/").data["count"], pending)
+
+        # Historial, seguimiento y PDF: completos
+        procedure = Procedure.objects.get(id=self.closed[0])
+        # 3 flujos NORMAL + 2 copias
+        self.assertEqual(self.client.get("/api/flows/", {"code": procedure.code}).data["count"], 5)
+
+        with mock.patch("apps.tramite.views.render_to_string", wraps=render_to_string) as render:
+            self.assertEqual(self.client.get(f"/api/history-procedure/{procedure.id}/pdf/").status_code, 200)
+        self.assertEqual(len(render.call_args.args[1]["flows"]), 3)
+
+        # Búsqueda: mover los flujos no recalcula el documento del trámite
+        self.assertEqual(self.search_vectors(), search_vectors)
+
+    def test_inbox_prunes_archive_partitions(self):
+
+        archive_procedures(timezone.now() - timedelta(days=365))
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get("/api/pending/")
+
+        # Consultas de ProcedureFlow.objects (las copias se precargan de todo el historial)
+        queries = [query["sql"] for query in ctx.captured_queries if 'NOT "tramite_procedureflow"."archived"' in query["sql"]]
+        self.assertTrue(queries)
+
+        for sql in queries:
+            with connection.cursor() as cursor:
+                cursor.execute("EXPLAIN " + sql)
+                plan = "\n".join(row[0] for row in cursor.fetchall())
+            self.assertIn("tramite_procedureflow_active_", plan)
+            self.assertNotIn("tramite_procedureflow_archive_", plan)
@@ -1,6 +1,6 @@
 from rest_framework import routers
-from django.urls import path
-from .views import CompanyViewSet, CheckScheduleAPIView, ProcedureHistorySimplicadoPDFAPIView, HolidayViewSet, WorkScheduleViewSet, ProcedureListVirtualesAPIView, VirtualFlowListAPIView, ProcedureVirtualCreateAPIView, UpdateProcedureCopiesAPIView, CopyInboxFlowListAPIView, TicketProcedureAPIView, ProcedureAnnulAPIView, ProcedureUpdateAPIView, SentFlowListAPIView, FlowDashboardAPIView, ProcedureHistoryPDFAPIView, ResendObservedProcedureFlowAPIView, RejectInboxAPIView, ObservedInboxAPIView, ObservedProcedureFlowAPIView, FinalizeFlowListAPIView, RejectProcedureFlowAPIView, PendingFlowListAPIView, FinalizeProcedureFlowAPIView, DeriveProcedureFlowAPIView, ReceptionFlowListAPIView, ReceiveProcedureFlowAPIView, ProcedureListAPIView, MyAreasView, AreaViewSet, DocumentViewSet, AgencyViewSet, ProcedureCreateAPIView, DepartmentListAPIView, ProvinceListAPIView, DistrictListAPIView
+from django.urls import path, re_path
+from .views import FileUploadCreateAPIView, FileUploadDetailAPIView, FileUploadChunkAPIView, FileUploadCompleteAPIView, ProcedureFileDownloadAPIView, UbigeoBundleAPIView, CompanyViewSet, CheckScheduleAPIView, ProcedureHistorySimplicadoPDFAPIView, HolidayViewSet, WorkScheduleViewSet, ProcedureListVirtualesAPIView, VirtualFlowListAPIView, ProcedureVirtualCreateAPIView, UpdateProcedureCopiesAPIView, CopyInboxFlowListAPIView, TicketProcedureAPIView, ProcedureAnnulAPIView, ProcedureUpdateAPIView, SentFlowListAPIView, FlowDashboardAPIView, ProcedureHistoryPDFAPIView, ResendObservedProcedureFlowAPIView, RejectInboxAPIView, ObservedInboxAPIView, ObservedProcedureFlowAPIView, FinalizeFlowListAPIView, RejectProcedureFlowAPIView, PendingFlowListAPIView, FinalizeProcedureFlowAPIView, DeriveProcedureFlowAPIView, ReceptionFlowListAPIView, ReceiveProcedureFlowAPIView, ProcedureListAPIView, ProcedureSearchAPIView, ProcedureExportAPIView, FlowExportAPIView, AreaStatsReportAPIView, AreaLeadTimeReportAPIView, MyAreasView, AreaViewSet, DocumentViewSet, AgencyViewSet, ProcedureCreateAPIView, DepartmentListAPIView, ProvinceListAPIView, DistrictListAPIView
 
 router = routers.DefaultRouter()
 
@@ -18,12 +18,14 @@ urlpatterns = [
     path("departments/", DepartmentListAPIView.as_view()),
     path("provinces/", ProvinceListAPIView.as_view()),
     path("districts/", DistrictListAPIView.as_view()),
+    path("ubigeo/", UbigeoBundleAPIView.as_view()),
 
     path('areas/user/', MyAreasView.as_view()),
     path('flows/', VirtualFlowListAPIView.as_view()),
     path('list-virtual-procedure/', ProcedureListVirtualesAPIView.as_view()),
 
     path('list-tramite/', ProcedureListAPIView.as_view()),
+    path('search-procedure/', ProcedureSearchAPIView.as_view()),
     path('create-tramite/', ProcedureCreateAPIView.as_view()),
     path('virtual-procedure/', ProcedureVirtualCreateAPIView.as_view()),
     path('update-procedure/<int:pk>/', ProcedureUpdateAPIView.as_view()),
@@ -31,6 +33,12 @@ urlpatterns = [
     path("history-procedure/<int:procedure_id>/pdf/", ProcedureHistoryPDFAPIView.as_view()),
     path("history-procedure-simplificado/<int:procedure_id>/pdf/", ProcedureHistorySimplicadoPDFAPIView.as_view()),
     path("ticket-procedure/<int:procedure_id>/pdf/", TicketProcedureAPIView.as_view()),
+    path("files/<int:pk>/download/", ProcedureFileDownloadAPIView.as_view(), name="procedure-file-download"),
+
+    path("uploads/", FileUploadCreateAPIView.as_view()),
+    path("uploads/<uuid:upload_id>/", FileUploadDetailAPIView.as_view()),
+    path("uploads/<uuid:upload_id>/chunk/", FileUploadChunkAPIView.as_view()),
+    path("uploads/<uuid:upload_id>/complete/", FileUploadCompleteAPIView.as_view()),
 
     path("copies-procedure/<int:pk>/", UpdateProcedureCopiesAPIView.as_view()),
 
@@ -51,4 +59,11 @@ urlpatterns = [
 
     path("dashboard/flows/",  FlowDashboardAPIView.as_view()),
 
+    # El formato va en la ruta: ?format= lo reserva DRF para elegir el renderer
+    re_path(r"^export/procedures/(?P<file_format>csv|xlsx)/$", ProcedureExportAPIView.as_view()),
+    re_path(r"^export/flows/(?P<file_format>csv|xlsx)/$", FlowExportAPIView.as_view()),
+
+    path("reports/area-stats/", AreaStatsReportAPIView.as_view()),
+    path("reports/lead-times/", AreaLeadTimeReportAPIView.as_view()),
+
 ] + router.urls
\ No newline at end of file
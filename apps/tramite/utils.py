@@ -2,14 +2,22 @@ from django.db import transaction
 from django.utils import timezone
 from django.utils.timezone import localtime
 from django.core.mail import EmailMultiAlternatives
+from django.core.cache import cache
 from django.conf import settings
-
-from .models import Agency, ProcedureSequence, ProcedureFlow, Area, WorkSchedule, Holiday, Procedure
-from datetime import datetime, time
+from django.db.models import Exists, F, OuterRef, Q, Sum
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from rest_framework.exceptions import ValidationError
+
+from .models import Agency, ProcedureSequence, ProcedureFlow, Area, WorkSchedule, Holiday, Procedure, Department, Province, District, UserArea, FileUpload, ProcedureFile
+from .core.metrics import time_email
+from .core.attachments import schedule_processing
+from datetime import datetime, time, timedelta
 import qrcode
 import base64
+import hashlib
 import os
 import random
+import re
 from io import BytesIO
 
 def generate_procedure_code(agency: Agency) -> str:
@@ -29,7 +37,7 @@ def generate_procedure_code(agency: Agency) -> str:
 
 def get_next_sequence(procedure):
     last = (
-        ProcedureFlow.objects
+        ProcedureFlow.all_objects
         .filter(
             procedure=procedure,
             flow_type=ProcedureFlow.NORMAL,
@@ -97,6 +105,43 @@ def check_schedule(now=None):
 
     return ScheduleResult.OUT_OF_SCHEDULE
 
+def load_work_calendar():
+    """
+    Horarios activos por día (0=lunes) y feriados activos, para business_seconds
+    """
+    schedules = {
+        schedule.day: (schedule.start_time, schedule.end_time)
+        for schedule in WorkSchedule.objects.filter(is_active=True)
+    }
+    holidays = set(Holiday.objects.filter(is_active=True).values_list("date", flat=True))
+
+    return schedules, holidays
+
+def business_seconds(start, end, calendar):
+    """
+    Segundos en horario laboral entre start y end, con las reglas de check_schedule
+    (sin domingos, feriados ni días sin horario)
+    """
+    schedules, holidays = calendar
+    start, end = localtime(start), localtime(end)
+
+    total = 0
+    day = start.date()
+
+    while day <= end.date():
+        hours = schedules.get(day.weekday())
+
+        if hours and day.weekday() != 6 and day not in holidays:
+            opens = timezone.make_aware(datetime.combine(day, hours[0]))
+            closes = timezone.make_aware(datetime.combine(day, hours[1]))
+            overlap = (min(end, closes) - max(start, opens)).total_seconds()
+            if overlap > 0:
+                total += overlap
+
+        day += timedelta(days=1)
+
+    return int(total)
+
 def send_procedure_email(procedure, is_out_of_schedule=False):
     """
     Envía constancia de registro de trámite virtual
@@ -126,7 +171,9 @@ def send_procedure_email(procedure, is_out_of_schedule=False):
     )
 
     email.attach_alternative(html_content, "text/html")
-    email.send(fail_silently=False)
+
+    with time_email():
+        email.send(fail_silently=False)
 
 def build_procedure_email_html(procedure, is_out_of_schedule):
     status_block = ""
@@ -265,6 +312,62 @@ def get_flow_global_status_display(flow):
         "class": "text-bg-secondary"
     }
 
+def visible_procedures(user, queryset=None):
+    """
+    Trámites que el usuario puede ver: administradores todos; el resto, los que
+    pasaron por alguna de sus áreas (origen, destino, flujos o copias)
+    """
+    if queryset is None:
+        queryset = Procedure.objects.all()
+
+    if user.is_admin or user.is_staff:
+        return queryset
+
+    areas = UserArea.objects.filter(user=user).values("area_id")
+
+    passed_by_area = ProcedureFlow.all_objects.filter(
+        procedure=OuterRef("pk")
+    ).filter(
+        Q(from_area__in=areas) | Q(to_area__in=areas)
+    )
+
+    return queryset.filter(
+        Q(from_area__in=areas) | Q(to_area__in=areas) | Exists(passed_by_area)
+    )
+
+def can_view_procedure(user, procedure_id):
+
+    return visible_procedures(user, Procedure.objects.filter(pk=procedure_id)).exists()
+
+# 🔎 BÚSQUEDA DE TRÁMITES
+
+SEARCH_CONFIG = "spanish"
+
+# Código, DNI o número de documento: se busca también como fragmento (índices trigram)
+IDENTIFIER_RE = re.compile(r"[\w-]*\d[\w-]*")
+
+def search_procedures(queryset, text):
+    """
+    Texto completo sobre search_vector (sintaxis web: "frase", -excluir, OR),
+    nombres del remitente aproximados (pg_trgm) y fragmentos de código / DNI.
+    Anota rank: relevancia + parecido del nombre
+    """
+    text = " ".join(text.split())
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type="websearch")
+
+    matches = Q(search_vector=query) | Q(sender_name__trigram_word_similar=text)
+
+    if IDENTIFIER_RE.fullmatch(text):
+        matches |= Q(code__contains=text) | Q(sender_dni__contains=text)
+
+    return (
+        queryset
+        .filter(matches)
+        .annotate(
+            rank=SearchRank(F("search_vector"), query) + TrigramWordSimilarity(text, "sender_name")
+        )
+    )
+
 def generate_tracking_code():
 
     chars = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
@@ -275,4 +378,178 @@ def generate_unique_tracking_code():
     while True:
         code = generate_tracking_code()
         if not Procedure.objects.filter(tracking_code=code).exists():
-            return code
\ No newline at end of file
+            return code
+
+# 🌐 CACHE DEL SEGUIMIENTO PÚBLICO
+
+TRACKING_FLOW_TYPES = ("",) + tuple(code for code, _ in Area.TYPE_CHOICES)
+
+def tracking_cache_key(tracking_code, flow_type=None):
+
+    return f"tracking:{tracking_code}:{flow_type or ''}"
+
+def invalidate_tracking_cache(tracking_code):
+
+    if not tracking_code:
+        return
+
+    cache.delete_many([
+        tracking_cache_key(tracking_code, flow_type)
+        for flow_type in TRACKING_FLOW_TYPES
+    ])
+
+# 🗺️ UBIGEO COMPLETO
+
+def build_ubigeo_bundle():
+    """
+    Árbol activo Departamento → Provincia → Distrito en formato compacto:
+    [id, descripción, hijos] en cada nivel (los distritos no tienen hijos)
+    """
+    districts = {}
+    for id, description, province_id in (
+        District.objects.filter(active=True)
+        .order_by("description")
+        .values_list("id", "description", "province_id")
+    ):
+        districts.setdefault(province_id, []).append([id, description])
+
+    provinces = {}
+    for id, description, department_id in (
+        Province.objects.filter(active=True)
+        .order_by("description")
+        .values_list("id", "description", "department_id")
+    ):
+        provinces.setdefault(department_id, []).append(
+            [id, description, districts.get(id, [])]
+        )
+
+    departments = [
+        [id, description, provinces.get(id, [])]
+        for id, description in (
+            Department.objects.filter(active=True)
+            .order_by("description")
+            .values_list("id", "description")
+        )
+    ]
+
+    return {"format": ["id", "description", "children"], "departments": departments}
+
+# 📤 SUBIDAS POR PARTES
+
+UPLOAD_READ_SIZE = 64 * 1024
+
+def write_upload_chunk(upload, stream, length, expected_sha256=None):
+    """
+    Agrega `length` bytes del stream al archivo final de la subida, calculando su SHA-256
+    al vuelo. Si el stream se corta o el digest no coincide, la parte se descarta (ValueError).
+    Se llama con la subida bloqueada (select_for_update) y el offset ya validado.
+    """
+    path = upload.file.path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    digest = hashlib.sha256()
+    remaining = length
+
+    with open(path, "a+b") as fh:
+        # Restos de una parte interrumpida: se vuelve al último offset confirmado
+        fh.truncate(upload.received)
+        fh.seek(upload.received)
+
+        while remaining > 0:
+            data = stream.read(min(UPLOAD_READ_SIZE, remaining))
+            if not data:
+                break
+            fh.write(data)
+            digest.update(data)
+            remaining -= len(data)
+
+        if remaining:
+            fh.truncate(upload.received)
+            raise ValueError("La parte llegó incompleta")
+
+        if expected_sha256 and expected_sha256.lower() != digest.hexdigest():
+            fh.truncate(upload.received)
+            raise ValueError("El SHA-256 de la parte no coincide")
+
+    return digest.hexdigest()
+
+def upload_tree_hash(chunk_digests):
+    """
+    SHA-256 de la concatenación de los digests de cada parte (no requiere releer el archivo)
+    """
+    return hashlib.sha256("".join(chunk_digests).encode()).hexdigest()
+
+UPLOADS_UNAVAILABLE = "Hay subidas inexistentes, incompletas o ya asociadas"
+
+def complete_uploads(ids, user):
+    """
+    Subidas completas del usuario, aún sin asociar a un trámite
+    """
+    return FileUpload.objects.filter(id__in=ids, created_by=user, status=FileUpload.COMPLETE)
+
+def attach_uploads(procedures, uploads, user):
+    """
+    Asocia subidas completas a uno o más trámites (el mismo blob, sin copiarlo)
+    """
+    if not uploads:
+        return []
+
+    ids = {upload.id for upload in uploads}
+
+    with transaction.atomic():
+
+        # 🔒 Se validaron antes de la transacción: otra petición pudo asociarlas
+        locked = complete_uploads(ids, user).select_for_update().values_list("id", flat=True)
+        if len(locked) != len(ids):
+            raise ValidationError({"upload_ids": [UPLOADS_UNAVAILABLE]})
+
+        files = ProcedureFile.objects.bulk_create([
+            ProcedureFile(
+                procedure=procedure,
+                file=upload.file.name,
+                uploaded_by=user
+            )
+            for procedure in procedures
+            for upload in uploads
+        ])
+
+        FileUpload.objects.filter(
+            id__in=ids,
+            status=FileUpload.COMPLETE
+        ).update(status=FileUpload.ATTACHED, updated_at=timezone.now())
+
+    schedule_processing(file.id for file in files)
+
+    return files
+
+def refresh_procedure_folios(procedure_id):
+    """
+    Recalcula counted_folios con las páginas de los adjuntos. folios se actualiza
+    solo si no fue corregido a mano (vale 0 o el conteo anterior)
+    """
+    with transaction.atomic():
+        procedure = (
+            Procedure.objects
+            .select_for_update()
+            .only("folios", "counted_folios", "tracking_code")
+            .filter(id=procedure_id)
+            .first()
+        )
+        if procedure is None:
+            return None
+
+        total = (
+            ProcedureFile.objects
+            .filter(procedure_id=procedure_id)
+            .aggregate(total=Sum("page_count"))["total"]
+        )
+
+        update_fields = ["counted_folios"]
+        if total is not None and procedure.folios in (0, procedure.counted_folios):
+            procedure.folios = total
+            update_fields.append("folios")
+
+        procedure.counted_folios = total
+        procedure.save(update_fields=update_fields)
+
+    return procedure
@@ -1,20 +1,35 @@
+import os
+
 from django.shortcuts import render, get_object_or_404
-from .serializers import CompanySerializer, ProvinceSerializer, DepartmentSerializer, ProcedureUpdateCopiesSerializer, DistrictSerializer, ProcedureAnnulSerializer,  WorkScheduleSerializer, HolidaySerializer, ProcedureUpdateSerializer, ResendObservedFlowSerializer, RejectFlowSerializer, ObservedFlowSerializer, AreaSerializer, FinalizeFlowSerializer, DeriveFlowSerializer, ProcedureFlowSerializer, ReceiveFlowSerializer, DocumentSerializer, ProcedureListSerializer, MyAreaSerializer, AgencySerializer, ProcedureCreateSerializer
-from .models import Company, Department, Province, District, UserArea, Area, Document, Agency, Procedure, ProcedureFlow, ProcedureFile, Holiday, WorkSchedule
+from .serializers import AreaLeadTimeStatsSerializer, FileUploadCreateSerializer, FileUploadSerializer, FLOW_SUMMARY_FIELDS, PROCEDURE_SUMMARY_FIELDS, PROCEDURE_EXPORT_COLUMNS, FLOW_EXPORT_COLUMNS, SummaryRowSerializer, PublicTrackingProcedureSerializer, PublicTrackingFlowSerializer, CompanySerializer, ProvinceSerializer, DepartmentSerializer, ProcedureUpdateCopiesSerializer, DistrictSerializer, ProcedureAnnulSerializer,  WorkScheduleSerializer, HolidaySerializer, ProcedureUpdateSerializer, ResendObservedFlowSerializer, RejectFlowSerializer, ObservedFlowSerializer, AreaSerializer, FinalizeFlowSerializer, DeriveFlowSerializer, ProcedureFlowSerializer, ReceiveFlowSerializer, DocumentSerializer, ProcedureListSerializer, ProcedureSearchSerializer, MyAreaSerializer, AgencySerializer, ProcedureCreateSerializer
+from .models import Company, Department, Province, District, UserArea, Area, Document, Agency, Procedure, ProcedureFlow, ProcedureFile, Holiday, WorkSchedule, FileUpload, AreaDailyStats, AreaLeadTimeStats, ReportCheckpoint
 from rest_framework import filters, status, viewsets, generics
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 from rest_framework.decorators import action
-from django.db.models import OuterRef, Subquery
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from django.db.models import OuterRef, Q, Subquery, Prefetch, Sum
 from django.template.loader import render_to_string
 from django.http import HttpResponse
 from weasyprint import HTML
 from django.db import transaction, models
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
-from .utils import generar_qr_base64, send_procedure_email, get_flow_status_display, get_flow_global_status_display, check_schedule, ScheduleResult
+from django.core.cache import cache
+from django.conf import settings
+from .filters import AreaDailyStatsFilter, AreaLeadTimeStatsFilter, ProcedureFilter, ProcedureFlowFilter
+from .utils import search_procedures, visible_procedures, upload_tree_hash, write_upload_chunk, can_view_procedure, generar_qr_base64, send_procedure_email, get_flow_status_display, get_flow_global_status_display, check_schedule, ScheduleResult, tracking_cache_key, TRACKING_FLOW_TYPES, build_ubigeo_bundle
+from .core.http import make_etag, etag_matches, negotiate_encoding
+from .core.throttling import TokenBucketThrottle
+from .core.refcache import ReferenceDataCacheMixin, get_blob, get_compressed
+from .core.renderers import ORJSONRenderer
+from .core.metrics import record_transition, time_pdf
+from .core.media import serve_protected_file, unsign_file_access
+from .core.exports import export_response
+from .core.reports import AREA_DAILY_STATS, COUNTERS
+from apps.user.models import User
 
 class CustomPagination(PageNumberPagination):
 
@@ -22,15 +37,119 @@ class CustomPagination(PageNumberPagination):
     page_size_query_param = 'page_size'  # Permite cambiar el tamaño desde la URL
     max_page_size = 100  # Tamaño máximo permitido
 
-class DepartmentListAPIView(generics.ListAPIView):
+class SearchCursorPagination(CursorPagination):
+    """
+    Paginación por clave (rank, id): sin COUNT(*) ni OFFSET que crece con cada página
+    """
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = ("-rank", "-id")
+
+# ⚡ Relaciones que recorren ProcedureListSerializer / ProcedureFlowSerializer:
+# el número de consultas no depende del tamaño de página
+
+def copies_prefetch(lookup="flows"):
+    """
+    Copias de cada trámite en una sola consulta (ProcedureListSerializer.get_copies)
+    """
+    return Prefetch(
+        lookup,
+        queryset=(
+            ProcedureFlow.all_objects
+            .filter(flow_type=ProcedureFlow.COPY)
+            .select_related("to_area__agency")
+            .order_by("sequence")
+        ),
+        to_attr="copy_flows"
+    )
+
+PROCEDURE_LIST_RELATED = ("from_area__agency", "to_area__agency", "document_type")
+
+FLOW_LIST_RELATED = (
+    "from_area__agency",
+    "to_area__agency",
+    "procedure__from_area__agency",
+    "procedure__to_area__agency",
+    "procedure__document_type",
+)
+
+def procedure_list_queryset(queryset):
+
+    return (
+        queryset
+        .select_related(*PROCEDURE_LIST_RELATED)
+        .prefetch_related("files", copies_prefetch())
+    )
+
+def flow_list_queryset(queryset):
+
+    return (
+        queryset
+        .select_related(*FLOW_LIST_RELATED)
+        .prefetch_related("procedure__files", copies_prefetch("procedure__flows"))
+    )
+
+class SummaryListMixin:
+    """
+    ?view=summary devuelve solo las columnas que muestra la bandeja;
+    ?fields=code,subject,... proyecta un subconjunto. Se consulta con .values().
+    """
+
+    summary_fields = FLOW_SUMMARY_FIELDS
+
+    def list(self, request, *args, **kwargs):
+
+        fields = self.get_summary_fields()
+        if fields is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = (
+            self.filter_queryset(self.get_queryset())
+            .prefetch_related(None)
+            .values(*[self.summary_fields[name] for name in fields])
+        )
+        serializer = SummaryRowSerializer(self.summary_fields, fields)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                [serializer.to_representation(row) for row in page]
+            )
+
+        return Response([serializer.to_representation(row) for row in queryset])
+
+    def get_summary_fields(self):
+
+        fields = self.request.query_params.get("fields")
+
+        if fields:
+            names = [name.strip() for name in fields.split(",") if name.strip()]
+            unknown = [name for name in names if name not in self.summary_fields]
+            if unknown:
+                raise ValidationError({
+                    "fields": [f"Campos no válidos: {', '.join(unknown)}"]
+                })
+            return names
+
+        if self.request.query_params.get("view") == "summary":
+            return list(self.summary_fields)
+
+        return None
+
+class DepartmentListAPIView(ReferenceDataCacheMixin, generics.ListAPIView):
     
+    reference_data = ("tramite.department",)
     queryset = Department.objects.filter(active=True).order_by("description")
     serializer_class = DepartmentSerializer
     authentication_classes = []
     permission_classes = []
 
-class ProvinceListAPIView(generics.ListAPIView):
+class ProvinceListAPIView(ReferenceDataCacheMixin, generics.ListAPIView):
 
+    reference_data = ("tramite.province",)
+    reference_params = ("department",)
     serializer_class = ProvinceSerializer
     authentication_classes = []
     permission_classes = []
@@ -42,8 +161,10 @@ class ProvinceListAPIView(generics.ListAPIView):
             active=True
         ).order_by("description")
 
-class DistrictListAPIView(generics.ListAPIView):
+class DistrictListAPIView(ReferenceDataCacheMixin, generics.ListAPIView):
 
+    reference_data = ("tramite.district",)
+    reference_params = ("province",)
     serializer_class = DistrictSerializer
     authentication_classes = []
     permission_classes = []
@@ -55,6 +176,45 @@ class DistrictListAPIView(generics.ListAPIView):
             active=True
         ).order_by("description")
 
+class UbigeoBundleAPIView(APIView):
+
+    """
+    Todo el ubigeo activo en un solo documento comprimido (br / gzip),
+    para que el formulario virtual filtre provincias y distritos en el cliente
+    """
+
+    authentication_classes = []
+    permission_classes = []
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "reference"
+
+    def get(self, request):
+
+        etag, content = get_blob(
+            "ubigeo-bundle",
+            ("tramite.department", "tramite.province", "tramite.district"),
+            lambda: ORJSONRenderer().render(build_ubigeo_bundle())
+        )
+
+        encoding = negotiate_encoding(request)
+        if encoding:
+            content = get_compressed(etag, content, encoding)
+            # Un ETag distinto por representación
+            etag = f'{etag[:-1]}-{encoding}"'
+
+        if etag_matches(request, etag):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(content, content_type="application/json")
+            if encoding:
+                response["Content-Encoding"] = encoding
+
+        response["ETag"] = etag
+        response["Vary"] = "Accept-Encoding"
+        response["Cache-Control"] = "public, max-age=0, must-revalidate"
+
+        return response
+
 class HolidayViewSet(viewsets.ModelViewSet):
 
     queryset = Holiday.objects.all().order_by('date')
@@ -93,25 +253,36 @@ class CompanyViewSet(viewsets.ModelViewSet):
 
     authentication_classes = [] 
     permission_classes = []    
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "reference"
     queryset = Company.objects.all()
     serializer_class = CompanySerializer
 
-class AreaViewSet(viewsets.ModelViewSet):
+class AreaViewSet(ReferenceDataCacheMixin, viewsets.ModelViewSet):
 
-    queryset = Area.objects.filter(state = True).order_by('code')
+    # agency_name viene de Agency
+    reference_data = ("tramite.area", "tramite.agency")
+    reference_cache_control = "private, max-age=0, must-revalidate"
+    queryset = Area.objects.filter(state = True).select_related('agency').order_by('code')
     serializer_class = AreaSerializer
 
-class AgencyViewSet(viewsets.ModelViewSet):
+class AgencyViewSet(ReferenceDataCacheMixin, viewsets.ModelViewSet):
 
+    reference_data = ("tramite.agency",)
     authentication_classes = [] 
     permission_classes = []    
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "reference"
     queryset = Agency.objects.all()
     serializer_class = AgencySerializer
 
-class DocumentViewSet(viewsets.ModelViewSet):
+class DocumentViewSet(ReferenceDataCacheMixin, viewsets.ModelViewSet):
 
+    reference_data = ("tramite.document",)
     authentication_classes = [] 
     permission_classes = []    
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "reference"
     queryset = Document.objects.all()
     serializer_class = DocumentSerializer
 
@@ -125,7 +296,7 @@ class MyAreasView(APIView):
             user=request.user,
             # activo=True,
             area__state=True
-        )
+        ).select_related("area__agency")
 
         serializer = MyAreaSerializer(user_areas, many=True)
         
@@ -137,6 +308,8 @@ class CheckScheduleAPIView(APIView):
     
     authentication_classes = []
     permission_classes = []
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "schedule"
 
     def get(self, request):
 
@@ -158,21 +331,23 @@ class CheckScheduleAPIView(APIView):
             status=status.HTTP_200_OK
         )
 
-class ProcedureListVirtualesAPIView(generics.ListAPIView):
+class ProcedureListVirtualesAPIView(SummaryListMixin, generics.ListAPIView):
 
     serializer_class = ProcedureListSerializer
+    summary_fields = PROCEDURE_SUMMARY_FIELDS
     pagination_class = CustomPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ProcedureFilter
 
     def get_queryset(self):
 
         area = self.get_active_area()
 
-        return (
+        return procedure_list_queryset(
             Procedure.objects.filter(
                  to_area=area,
                  is_virtual=True
         )
-            .prefetch_related("files", "to_area")
             .order_by("-code")
         )
 
@@ -191,6 +366,8 @@ class ProcedureVirtualCreateAPIView(APIView):
 
     authentication_classes = []
     permission_classes = []
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "virtual_create"
 
     def post(self, request):
 
@@ -323,21 +500,23 @@ class ProcedureUpdateAPIView(APIView):
             status=status.HTTP_200_OK
         )
 
-class ProcedureListAPIView(generics.ListAPIView):
+class ProcedureListAPIView(SummaryListMixin, generics.ListAPIView):
 
     serializer_class = ProcedureListSerializer
+    summary_fields = PROCEDURE_SUMMARY_FIELDS
     pagination_class = CustomPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ProcedureFilter
 
     def get_queryset(self):
 
         area = self.get_active_area()
 
-        return (
+        return procedure_list_queryset(
             Procedure.objects.filter(
                  from_area=area
            
         )
-            .prefetch_related("files", "to_area")
             .order_by("-code")
         )
 
@@ -347,11 +526,31 @@ class ProcedureListAPIView(generics.ListAPIView):
     
     def get_active_area(self):
         area_id = self.request.headers.get("X-Area-Id")
-        print(area_id)
         if not area_id:
             return None
         return Area.objects.filter(id=area_id).first()
 
+class ProcedureSearchAPIView(generics.ListAPIView):
+    """
+    Búsqueda de expedientes (?q=) entre los trámites visibles para el usuario, por relevancia
+    """
+
+    serializer_class = ProcedureSearchSerializer
+    pagination_class = SearchCursorPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ProcedureFilter
+
+    def get_queryset(self):
+
+        text = self.request.query_params.get("q", "").strip()
+
+        if len(text) < 2:
+            raise ValidationError({"q": ["Ingrese al menos 2 caracteres"]})
+
+        return procedure_list_queryset(
+            search_procedures(visible_procedures(self.request.user), text)
+        )
+
 class ProcedureAnnulAPIView(APIView):
 
     def post(self, request, pk):
@@ -368,6 +567,7 @@ class ProcedureAnnulAPIView(APIView):
 
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        record_transition("annul")
 
         return Response(
             {"message": "Trámite anulado correctamente"},
@@ -420,6 +620,8 @@ class VirtualFlowListAPIView(generics.ListAPIView):
 
     authentication_classes = []
     permission_classes = []
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "tracking"
 
     def get_queryset(self):
 
@@ -431,8 +633,8 @@ class VirtualFlowListAPIView(generics.ListAPIView):
         if not code and not tracking_code:
             return ProcedureFlow.objects.none()
 
-        qs = (
-            ProcedureFlow.objects
+        qs = flow_list_queryset(
+            ProcedureFlow.all_objects
             .select_related(
                 "procedure",
                 "from_area",
@@ -458,19 +660,79 @@ class VirtualFlowListAPIView(generics.ListAPIView):
             qs = qs.filter(procedure__from_area__type=flow_type)
 
         return qs
+
+    def list(self, request, *args, **kwargs):
+
+        tracking_code = request.query_params.get("tracking_code")
+        flow_type = request.query_params.get("type") or ""
+
+        # 🔐 Búsqueda interna por código: respuesta completa paginada
+        if (
+            request.query_params.get("code")
+            or not tracking_code
+            or flow_type not in TRACKING_FLOW_TYPES
+        ):
+            return super().list(request, *args, **kwargs)
+
+        # 🌐 Búsqueda pública: respuesta compacta desde cache
+        key = tracking_cache_key(tracking_code, flow_type)
+        entry = cache.get(key)
+
+        if entry is None:
+            entry = self.build_tracking_entry()
+            # Códigos inexistentes no se guardan: enumerarlos no desplaza entradas reales
+            if entry["count"]:
+                cache.set(key, entry, settings.TRACKING_CACHE_TIMEOUT)
+
+        # ♻️ Línea de tiempo sin cambios: 304 sin tocar la base de datos
+        if etag_matches(request, entry["etag"]):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(entry["content"], content_type="application/json")
+
+        response["ETag"] = entry["etag"]
+        response["Cache-Control"] = "no-cache"
+
+        return response
+
+    def build_tracking_entry(self):
+
+        flows = list(
+            self.get_queryset()
+            .prefetch_related(None)
+        )
+
+        procedure = flows[0].procedure if flows else None
+
+        data = {
+            "count": len(flows),
+            "next": None,
+            "previous": None,
+            "procedure": (
+                PublicTrackingProcedureSerializer(procedure).data
+                if procedure else None
+            ),
+            "results": PublicTrackingFlowSerializer(flows, many=True).data,
+        }
+
+        content = ORJSONRenderer().render(data)
+
+        return {"etag": make_etag(content), "content": content, "count": len(flows)}
     
 # PENDIENTES
-class PendingFlowListAPIView(generics.ListAPIView):
+class PendingFlowListAPIView(SummaryListMixin, generics.ListAPIView):
 
     serializer_class = ProcedureFlowSerializer
     pagination_class = CustomPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ProcedureFlowFilter
 
     def get_queryset(self):
         area_id = self.request.headers.get("X-Area-Id")
         if not area_id:
             return ProcedureFlow.objects.none()
 
-        return (
+        return flow_list_queryset(
             ProcedureFlow.objects
             .filter(
                 to_area_id=area_id,
@@ -483,10 +745,12 @@ class PendingFlowListAPIView(generics.ListAPIView):
         )
 
 # RECEPCIONADOS
-class ReceptionFlowListAPIView(generics.ListAPIView):
+class ReceptionFlowListAPIView(SummaryListMixin, generics.ListAPIView):
 
     serializer_class = ProcedureFlowSerializer
     pagination_class = CustomPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ProcedureFlowFilter
 
     def get_queryset(self):
         area_id = self.request.headers.get("X-Area-Id")
@@ -494,7 +758,7 @@ class ReceptionFlowListAPIView(generics.ListAPIView):
         if not area_id:
             return ProcedureFlow.objects.none()
 
-        return (
+        return flow_list_queryset(
             ProcedureFlow.objects
             .filter(
                 to_area_id=area_id,
@@ -507,10 +771,12 @@ class ReceptionFlowListAPIView(generics.ListAPIView):
         )
 
 # ENVIADOS
-class SentFlowListAPIView(generics.ListAPIView):
+class SentFlowListAPIView(SummaryListMixin, generics.ListAPIView):
 
     serializer_class = ProcedureFlowSerializer
     pagination_class = CustomPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ProcedureFlowFilter
 
     def get_queryset(self):
         area_id = self.request.headers.get("X-Area-Id")
@@ -518,7 +784,7 @@ class SentFlowListAPIView(generics.ListAPIView):
         if not area_id:
             return ProcedureFlow.objects.none()
 
-        return (
+        return flow_list_queryset(
             ProcedureFlow.objects
             .filter(
                 from_area_id=area_id,
@@ -531,10 +797,12 @@ class SentFlowListAPIView(generics.ListAPIView):
         )
 
 # COPIAS
-class CopyInboxFlowListAPIView(generics.ListAPIView):
+class CopyInboxFlowListAPIView(SummaryListMixin, generics.ListAPIView):
 
     serializer_class = ProcedureFlowSerializer
     pagination_class = CustomPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ProcedureFlowFilter
 
     def get_queryset(self):
 
@@ -543,7 +811,7 @@ class CopyInboxFlowListAPIView(generics.ListAPIView):
         if not area_id:
             return ProcedureFlow.objects.none()
 
-        return (
+        return flow_list_queryset(
             ProcedureFlow.objects
             .filter(
                 to_area_id=area_id,
@@ -559,10 +827,12 @@ class CopyInboxFlowListAPIView(generics.ListAPIView):
         )
 
 # FINALIZADOS
-class FinalizeFlowListAPIView(generics.ListAPIView):
+class FinalizeFlowListAPIView(SummaryListMixin, generics.ListAPIView):
 
     serializer_class = ProcedureFlowSerializer
     pagination_class = CustomPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ProcedureFlowFilter
 
     def get_queryset(self):
 
@@ -571,7 +841,7 @@ class FinalizeFlowListAPIView(generics.ListAPIView):
         if not area_id:
             return ProcedureFlow.objects.none()
 
-        return (
+        return flow_list_queryset(
             ProcedureFlow.objects
             .filter(
                 to_area_id=area_id,
@@ -584,10 +854,12 @@ class FinalizeFlowListAPIView(generics.ListAPIView):
         )
 
 # RECHAZADOS
-class RejectInboxAPIView(generics.ListAPIView):
+class RejectInboxAPIView(SummaryListMixin, generics.ListAPIView):
 
     serializer_class = ProcedureFlowSerializer
     pagination_class = CustomPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ProcedureFlowFilter
 
     def get_queryset(self):
 
@@ -604,7 +876,7 @@ class RejectInboxAPIView(generics.ListAPIView):
             sequence__lt=OuterRef("sequence")
         ).order_by("-sequence")
 
-        return (
+        return flow_list_queryset(
             ProcedureFlow.objects
             .annotate(
                 last_sender_area=Subquery(
@@ -621,10 +893,12 @@ class RejectInboxAPIView(generics.ListAPIView):
         )
 
 # OBSERVADOS
-class ObservedInboxAPIView(generics.ListAPIView):
+class ObservedInboxAPIView(SummaryListMixin, generics.ListAPIView):
 
     serializer_class = ProcedureFlowSerializer
     pagination_class = CustomPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ProcedureFlowFilter
 
     def get_queryset(self):
 
@@ -641,7 +915,7 @@ class ObservedInboxAPIView(generics.ListAPIView):
             sequence__lt=OuterRef("sequence")
         ).order_by("-sequence")
 
-        return (
+        return flow_list_queryset(
             ProcedureFlow.objects
             .annotate(
                 last_sender_area=Subquery(
@@ -689,6 +963,7 @@ class ReceiveProcedureFlowAPIView(APIView):
         )
         serializer.is_valid(raise_exception=True)
         new_flow = serializer.save()
+        record_transition("receive")
 
         return Response(
             {
@@ -722,6 +997,7 @@ class RejectProcedureFlowAPIView(APIView):
         )
         serializer.is_valid(raise_exception=True)
         new_flow = serializer.save()
+        record_transition("reject")
 
         return Response(
             {
@@ -755,6 +1031,7 @@ class DeriveProcedureFlowAPIView(APIView):
         )
         serializer.is_valid(raise_exception=True)
         created = serializer.save()
+        record_transition("derive")
 
         return Response(
             {
@@ -794,6 +1071,7 @@ class ObservedProcedureFlowAPIView(APIView):
         )
         serializer.is_valid(raise_exception=True)
         new_flow = serializer.save()
+        record_transition("observe")
 
         return Response(
             {
@@ -828,6 +1106,7 @@ class FinalizeProcedureFlowAPIView(APIView):
         )
         serializer.is_valid(raise_exception=True)
         new_flow = serializer.save()
+        record_transition("finalize")
 
         return Response(
             {
@@ -857,6 +1136,7 @@ class ResendObservedProcedureFlowAPIView(APIView):
 
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        record_transition("resend")
 
         # NO guardar archivos aquí
 
@@ -874,6 +1154,212 @@ class ResendObservedProcedureFlowAPIView(APIView):
             status=status.HTTP_200_OK
         )
 
+# ------- ADJUNTOS
+
+class ProcedureFileDownloadAPIView(APIView):
+    """
+    Descarga de un adjunto: con el token de sesión o con la firma de file_url (?signature=)
+    """
+
+    permission_classes = [AllowAny]
+
+    def get(self, request, pk):
+
+        user = request.user if request.user.is_authenticated else None
+
+        signature = request.query_params.get("signature")
+        if user is None and signature:
+            access = unsign_file_access(signature)
+            if access and access[0] == pk:
+                user = User.objects.filter(id=access[1], is_active=True).first()
+
+        if user is None:
+            return Response(
+                {"detail": "Enlace de descarga inválido o expirado"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        procedure_file = get_object_or_404(ProcedureFile, pk=pk)
+
+        # 404 y no 403: no se revela que el adjunto existe
+        if not can_view_procedure(user, procedure_file.procedure_id):
+            return Response(status=status.HTTP_404_NOT_FOUND)
+
+        # ?variant=thumbnail | optimized (generados en segundo plano)
+        variant = request.query_params.get("variant")
+        field_file = {
+            None: procedure_file.file,
+            "thumbnail": procedure_file.thumbnail,
+            "optimized": procedure_file.optimized,
+        }.get(variant)
+
+        if not field_file or not field_file.storage.exists(field_file.name):
+            return Response(status=status.HTTP_404_NOT_FOUND)
+
+        # La variante optimizada se descarga con el nombre del original y su propia
+        # extensión (una imagen optimizada es JPEG)
+        filename = None
+        if variant != "thumbnail":
+            filename = procedure_file.file.name.split("/")[-1]
+        if variant == "optimized":
+            filename = os.path.splitext(filename)[0] + os.path.splitext(field_file.name)[1]
+
+        return serve_protected_file(request, field_file, filename)
+
+# ------- SUBIDAS POR PARTES
+# 1. POST /uploads/ {filename, size}           -> id, chunk_size
+# 2. PUT  /uploads/<id>/chunk/ (cuerpo binario) con Upload-Offset y opcional X-Chunk-SHA256
+# 3. POST /uploads/<id>/complete/ {tree_sha256?} -> el id se envía como upload_ids al trámite
+# GET /uploads/<id>/ devuelve el offset recibido para reanudar tras un corte
+
+class FileUploadCreateAPIView(APIView):
+
+    def post(self, request):
+
+        serializer = FileUploadCreateSerializer(
+            data=request.data,
+            context={"request": request}
+        )
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.save()
+
+        return Response(FileUploadSerializer(upload).data, status=status.HTTP_201_CREATED)
+
+class FileUploadDetailAPIView(APIView):
+
+    def get(self, request, upload_id):
+
+        upload = get_object_or_404(FileUpload, id=upload_id, created_by=request.user)
+        return Response(FileUploadSerializer(upload).data)
+
+    def delete(self, request, upload_id):
+
+        upload = get_object_or_404(FileUpload, id=upload_id, created_by=request.user)
+
+        if upload.status == FileUpload.ATTACHED:
+            return Response(
+                {"detail": "La subida ya está asociada a un trámite"},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        upload.file.delete(save=False)
+        upload.delete()
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class FileUploadChunkAPIView(APIView):
+    """
+    Escribe la parte directamente en el archivo final mientras llega (sin request.FILES
+    ni archivos temporales). Las partes van en orden: Upload-Offset debe ser lo ya recibido.
+    """
+
+    def put(self, request, upload_id):
+
+        try:
+            offset = int(request.headers.get("Upload-Offset", ""))
+            length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            return Response(
+                {"detail": "Upload-Offset y Content-Length son obligatorios"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if length <= 0:
+            return Response({"detail": "La parte está vacía"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if length > settings.UPLOAD_CHUNK_SIZE:
+            return Response(
+                {"detail": f"Cada parte admite hasta {settings.UPLOAD_CHUNK_SIZE} bytes"},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+
+        with transaction.atomic():
+
+            # 🔒 Una parte a la vez por subida
+            upload = (
+                FileUpload.objects
+                .select_for_update()
+                .filter(id=upload_id, created_by=request.user)
+                .first()
+            )
+            if upload is None:
+                return Response(status=status.HTTP_404_NOT_FOUND)
+
+            if upload.status != FileUpload.UPLOADING:
+                return Response(
+                    {"detail": "La subida ya fue completada"},
+                    status=status.HTTP_409_CONFLICT
+                )
+
+            if offset != upload.received:
+                return Response(
+                    {"detail": "Offset inesperado", "received": upload.received},
+                    status=status.HTTP_409_CONFLICT
+                )
+
+            if offset + length > upload.size:
+                return Response(
+                    {"detail": "La parte excede el tamaño declarado", "received": upload.received},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            try:
+                digest = write_upload_chunk(
+                    upload, request.stream, length, request.headers.get("X-Chunk-SHA256")
+                )
+            except ValueError as exc:
+                return Response(
+                    {"detail": str(exc), "received": upload.received},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            upload.received += length
+            upload.chunk_digests.append(digest)
+            upload.save(update_fields=["received", "chunk_digests", "updated_at"])
+
+        return Response({"received": upload.received, "sha256": digest})
+
+class FileUploadCompleteAPIView(APIView):
+
+    def post(self, request, upload_id):
+
+        with transaction.atomic():
+
+            upload = (
+                FileUpload.objects
+                .select_for_update()
+                .filter(id=upload_id, created_by=request.user)
+                .first()
+            )
+            if upload is None:
+                return Response(status=status.HTTP_404_NOT_FOUND)
+
+            # Idempotente: reintentar complete no falla
+            if upload.status != FileUpload.UPLOADING:
+                return Response(FileUploadSerializer(upload).data)
+
+            if upload.received != upload.size:
+                return Response(
+                    {"detail": "Faltan partes por subir", "received": upload.received},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            # Hash de árbol: digest de los digests de cada parte, sin releer el archivo
+            tree_sha256 = upload_tree_hash(upload.chunk_digests)
+            expected = request.data.get("tree_sha256")
+
+            if expected and expected.lower() != tree_sha256:
+                return Response(
+                    {"detail": "El SHA-256 no coincide", "tree_sha256": tree_sha256},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            upload.tree_sha256 = tree_sha256
+            upload.status = FileUpload.COMPLETE
+            upload.save(update_fields=["tree_sha256", "status", "updated_at"])
+
+        return Response(FileUploadSerializer(upload).data)
+
 # ------- PDF
 
 # HISTORICO
@@ -886,17 +1372,17 @@ class ProcedureHistoryPDFAPIView(APIView):
 
         procedure = (
             Procedure.objects
-            .select_related("created_by")
+            .select_related("created_by", "from_area", "to_area", "document_type")
             .get(id=procedure_id)
         )
 
         flows = (
-            ProcedureFlow.objects
+            ProcedureFlow.all_objects
             .filter(
                 procedure=procedure,
                 flow_type=ProcedureFlow.NORMAL, 
             )
-            .select_related("from_area", "to_area")
+            .select_related("from_area", "to_area", "sent_by")
             .order_by("sequence")
         )
 
@@ -919,7 +1405,8 @@ class ProcedureHistoryPDFAPIView(APIView):
         )
 
         html = HTML(string=html_string, base_url=request.build_absolute_uri())
-        pdf = html.write_pdf()
+        with time_pdf("history"):
+            pdf = html.write_pdf()
 
         response = HttpResponse(pdf, content_type="application/pdf")
         response["Content-Disposition"] = (
@@ -938,32 +1425,32 @@ class ProcedureHistorySimplicadoPDFAPIView(APIView):
 
         procedure = (
             Procedure.objects
-            .select_related("created_by")
+            .select_related("created_by", "from_area", "to_area", "document_type")
             .get(id=procedure_id)
         )
 
         # 🟢 1. Primer flow (registro inicial)
         first_flow = (
-            ProcedureFlow.objects
+            ProcedureFlow.all_objects
             .filter(
                 procedure=procedure,
                 flow_type=ProcedureFlow.NORMAL, 
             )
-            .select_related("from_area", "to_area")
+            .select_related("from_area", "to_area", "sent_by")
             .order_by("sequence")
             .first()
         )
 
         # 🟡 2. Último envío AUTORIZADO (Gerencia)
         authorized_flow = (
-            ProcedureFlow.objects
+            ProcedureFlow.all_objects
             .filter(
                 procedure=procedure,
                 flow_type=ProcedureFlow.NORMAL, 
                 status=ProcedureFlow.SENT,
                 origin_options__contains=["AUTHORIZED"]
             )
-            .select_related("from_area", "to_area")
+            .select_related("from_area", "to_area", "sent_by")
             .order_by("-sequence")
             .first()
         )
@@ -971,13 +1458,13 @@ class ProcedureHistorySimplicadoPDFAPIView(APIView):
          # 🔁 Fallback: último FINALIZED
         if not authorized_flow:
             authorized_flow = (
-                ProcedureFlow.objects
+                ProcedureFlow.all_objects
                 .filter(
                     procedure=procedure,
                     flow_type=ProcedureFlow.NORMAL, 
                     status=ProcedureFlow.FINALIZED
                 )
-                .select_related("from_area", "to_area")
+                .select_related("from_area", "to_area", "sent_by")
                 .order_by("-sequence")
                 .first()
             )
@@ -1006,7 +1493,8 @@ class ProcedureHistorySimplicadoPDFAPIView(APIView):
             base_url=request.build_absolute_uri()
         )
 
-        pdf = html.write_pdf()
+        with time_pdf("history_summary"):
+            pdf = html.write_pdf()
 
         response = HttpResponse(pdf, content_type="application/pdf")
         response["Content-Disposition"] = (
@@ -1025,7 +1513,7 @@ class TicketProcedureAPIView(APIView):
 
         procedure = (
             Procedure.objects
-            .select_related("created_by")
+            .select_related("created_by", "from_area", "to_area", "document_type")
             .get(id=procedure_id)
         )
 
@@ -1049,7 +1537,8 @@ class TicketProcedureAPIView(APIView):
 
         html = HTML(string=html_string, base_url=request.build_absolute_uri())
 
-        pdf = html.write_pdf()
+        with time_pdf("ticket"):
+            pdf = html.write_pdf()
 
         response = HttpResponse(pdf, content_type="application/pdf")
         response["Content-Disposition"] = f'inline; filename="ticket_{codigo}.pdf"'
@@ -1174,4 +1663,157 @@ class FlowDashboardAPIView(APIView):
                 "total": counts["TE"] + counts["TI"],
             })
 
-        return Response(data, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response(data, status=status.HTTP_200_OK)
+
+# ------- EXPORTACIONES
+
+class ExportAPIView(generics.GenericAPIView):
+    """
+    /api/export/.../<csv|xlsx>/: trámites que pasaron por el área activa (X-Area-Id),
+    con los mismos filtros que las bandejas
+    """
+
+    filter_backends = [DjangoFilterBackend]
+    export_columns = None
+    export_name = None
+
+    def get_area(self):
+
+        area_id = self.request.headers.get("X-Area-Id")
+        if not area_id or not area_id.isdigit():
+            raise ValidationError({"error": "X-Area-Id header required"})
+
+        user = self.request.user
+        areas = Area.objects.all()
+        if not (user.is_admin or user.is_staff):
+            areas = areas.filter(area_users__user=user)
+
+        area = areas.filter(id=area_id).first()
+        if area is None:
+            raise PermissionDenied("No tiene acceso a esta área")
+
+        return area
+
+    def area_procedure_ids(self):
+
+        # Origen y destino también tienen su flujo inicial: basta con los flujos
+        return ProcedureFlow.all_objects.filter(
+            Q(from_area=self.area) | Q(to_area=self.area)
+        ).values("procedure_id")
+
+    def get(self, request, file_format):
+
+        self.area = self.get_area()
+        queryset = self.filter_queryset(self.get_queryset())
+        filename = f"{self.export_name}-{self.area.code}-{timezone.localdate():%Y%m%d}"
+
+        return export_response(file_format, queryset, self.export_columns, filename)
+
+class ProcedureExportAPIView(ExportAPIView):
+
+    filterset_class = ProcedureFilter
+    export_columns = PROCEDURE_EXPORT_COLUMNS
+    export_name = "tramites"
+
+    def get_queryset(self):
+
+        # Orden por id: sigue la clave primaria, sin ordenar antes de enviar
+        return Procedure.objects.filter(id__in=self.area_procedure_ids()).order_by("id")
+
+class FlowExportAPIView(ExportAPIView):
+    """
+    Historial completo (todos los flujos) de los trámites que pasaron por el área
+    """
+
+    filterset_class = ProcedureFlowFilter
+    export_columns = FLOW_EXPORT_COLUMNS
+    export_name = "movimientos"
+
+    def get_queryset(self):
+
+        return (
+            ProcedureFlow.all_objects
+            .filter(procedure_id__in=self.area_procedure_ids())
+            .order_by("procedure_id", "sequence")
+        )
+
+# ------- REPORTES
+class ReportAreaAccessMixin:
+    """
+    Tablas de reportes: sin ser administrador, solo las áreas del usuario
+    """
+    filter_backends = [DjangoFilterBackend]
+    report_model = None
+
+    def get_queryset(self):
+        user = self.request.user
+        queryset = self.report_model.objects.all()
+
+        if not (user.is_admin or user.is_staff):
+            queryset = queryset.filter(area__in=Area.objects.filter(area_users__user=user))
+
+        return queryset
+
+class AreaStatsReportAPIView(ReportAreaAccessMixin, generics.GenericAPIView):
+    """
+    /api/reports/area-stats/?group_by=date|area|agency&date_after=&date_before=&agency=&area=
+    Solo lee AreaDailyStats (refresh_reports), nunca ProcedureFlow
+    """
+    filterset_class = AreaDailyStatsFilter
+    report_model = AreaDailyStats
+
+    GROUPS = {
+        "date": ["date"],
+        "area": ["area_id", "area__name"],
+        "agency": ["agency_id", "agency__name"],
+    }
+
+    def summarize(self, row):
+        dwell_count = row.pop("dwell_count") or 0
+        dwell_seconds = row.pop("dwell_seconds") or 0
+
+        row["avg_dwell_hours"] = round(dwell_seconds / dwell_count / 3600, 2) if dwell_count else None
+        row["dwell_count"] = dwell_count
+
+        return row
+
+    def get(self, request):
+        group_by = request.query_params.get("group_by", "date")
+        if group_by not in self.GROUPS:
+            raise ValidationError({"group_by": f"Use uno de: {', '.join(self.GROUPS)}"})
+
+        queryset = self.filter_queryset(self.get_queryset())
+        totals = {name: Sum(name) for name in COUNTERS + ["dwell_count", "dwell_seconds"]}
+
+        rows = (
+            queryset
+            .values(*self.GROUPS[group_by])
+            .annotate(**totals)
+            .order_by(*self.GROUPS[group_by])
+        )
+
+        overall = queryset.aggregate(**totals)
+        checkpoint = ReportCheckpoint.objects.filter(name=AREA_DAILY_STATS).first()
+
+        return Response({
+            "refreshed_at": checkpoint.refreshed_at if checkpoint else None,
+            "group_by": group_by,
+            "results": [self.summarize(row) for row in rows],
+            "totals": self.summarize({name: value or 0 for name, value in overall.items()}),
+        })
+
+class AreaLeadTimeReportAPIView(ReportAreaAccessMixin, generics.ListAPIView):
+    """
+    /api/reports/lead-times/: permanencias, cuellos de botella, fan-out y reprocesos
+    por área y mes (analyze_flows); por mes y ranking dentro de cada agencia
+    """
+    serializer_class = AreaLeadTimeStatsSerializer
+    filterset_class = AreaLeadTimeStatsFilter
+    report_model = AreaLeadTimeStats
+
+    def get_queryset(self):
+        return (
+            super().get_queryset()
+            .select_related("area")
+            .order_by("-month", "agency_id", "bottleneck_rank", "area_id")
+        )
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import AsyncRequestFactory, RequestFactory, override_settings
+
+from apps.user.views import RucApiView
+
+
+class FakeUpstreamHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+    latency = 0.2
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        body = json.dumps({"numero": self.path.rsplit("/", 1)[-1], "nombre": "EMPRESA DE PRUEBA SAC"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeUpstreamServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Compara el rendimiento de RucApiView en WSGI (hilos, async_to_sync por petición) "
+        "y en ASGI (un event loop) contra un upstream falso"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--threads", type=int, default=8, help="Hilos por worker WSGI (modo sync)")
+        parser.add_argument("--concurrency", type=int, default=200, help="Consultas simultáneas (modo async)")
+        parser.add_argument("--latency", type=float, default=0.2, help="Latencia simulada del upstream en segundos")
+
+    def handle(self, *args, **options):
+
+        FakeUpstreamHandler.latency = options["latency"]
+        server = FakeUpstreamServer(("127.0.0.1", 0), FakeUpstreamHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        base_url = f"http://127.0.0.1:{server.server_port}/api"
+        total = options["requests"]
+
+        try:
+            # Sin rate limiting: todas las consultas salen de la misma IP
+            no_throttle = {**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {}}
+
+            with override_settings(LOOKUP_API_URL=base_url, REST_FRAMEWORK=no_throttle):
+                sync_times, sync_elapsed = self.run_sync(total, options["threads"])
+                async_times, async_elapsed = asyncio.run(
+                    self.run_async(total, options["concurrency"])
+                )
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.report("sync  (WSGI)", sync_times, sync_elapsed)
+        self.report("async (ASGI)", async_times, async_elapsed)
+
+    def run_sync(self, total, threads):
+
+        # Como el handler WSGI de Django: la vista asíncrona corre con async_to_sync
+        factory = RequestFactory()
+        view = async_to_sync(RucApiView.as_view())
+
+        def call(i):
+            number = str(20000000000 + i)
+            start = time.perf_counter()
+            response = view(factory.get(f"/user/ruc/{number}"), number=number)
+            if response.status_code != 200:
+                raise RuntimeError(response.content)
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            times = list(pool.map(call, range(total)))
+
+        return times, time.perf_counter() - start
+
+    async def run_async(self, total, concurrency):
+
+        factory = AsyncRequestFactory()
+        view = RucApiView.as_view()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call(i):
+            async with semaphore:
+                number = str(20000000000 + i)
+                start = time.perf_counter()
+                response = await view(factory.get(f"/user/ruc/{number}"), number=number)
+                if response.status_code != 200:
+                    raise RuntimeError(response.content)
+                return time.perf_counter() - start
+
+        # El cliente compartido se cierra al terminar asyncio.run()
+        start = time.perf_counter()
+        times = await asyncio.gather(*(call(i) for i in range(total)))
+
+        return times, time.perf_counter() - start
+
+    def report(self, label, times, elapsed):
+
+        times = sorted(times)
+        p95 = times[int(len(times) * 0.95) - 1]
+
+        self.stdout.write(
+            f"{label}: {len(times)} consultas en {elapsed:.2f}s "
+            f"→ {len(times) / elapsed:.1f} req/s | "
+            f"p50 {statistics.median(times) * 1000:.0f} ms | p95 {p95 * 1000:.0f} ms"
+        )
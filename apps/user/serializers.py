@@ -13,7 +13,8 @@ class ModuleSerializer(serializers.ModelSerializer):
         fields = ["id", "name", "code", "icon", "children", "path"]
 
     def get_children(self, obj):
-        children = obj.children.all().order_by("order")
+        # Meta.ordering ya ordena por "order"; all() aprovecha el prefetch de la vista
+        children = obj.children.all()
         return ModuleSerializer(children, many=True).data
     
 class UserPermissionSerializer(serializers.ModelSerializer):
@@ -1,3 +1,8 @@
+import asyncio
+import weakref
+
+import httpx
+from django.conf import settings
 
 from .models import User, Module, UserPermission
 
@@ -8,16 +13,63 @@ def get_allowed_modules(user):
         .values_list("module_id", flat=True)
     )
 
-    # incluir padres automáticamente
+    # incluir padres automáticamente (el árbol completo en una consulta)
     allowed = set(module_ids)
+    parents = dict(Module.objects.values_list("id", "parent_id"))
 
-    def add_parents(module):
-        if module.parent:
-            allowed.add(module.parent.id)
-            add_parents(module.parent)
-
-    for module in Module.objects.filter(id__in=module_ids):
-        add_parents(module)
+    for module_id in module_ids:
+        parent_id = parents.get(module_id)
+        while parent_id and parent_id not in allowed:
+            allowed.add(parent_id)
+            parent_id = parents.get(parent_id)
 
     # devolver módulos raíz
-    return Module.objects.filter(id__in=allowed, parent__isnull=True).order_by("order")
\ No newline at end of file
+    return Module.objects.filter(id__in=allowed, parent__isnull=True).order_by("order")
+
+# 🌐 Cliente HTTP compartido por event loop (un pool de conexiones por worker ASGI).
+# Se cierra junto con su loop: en WSGI async_to_sync crea un loop por petición y el
+# cliente dura lo que la petición; en ASGI, lo que el worker
+_lookup_clients = weakref.WeakKeyDictionary()
+
+async def _close_with_loop(client):
+    """
+    Queda suspendido en el yield mientras viva el loop: asyncio.run() cierra los
+    generadores asíncronos pendientes al terminar (shutdown_asyncgens) y con ellos el cliente
+    """
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+async def get_lookup_client():
+    """
+    Devuelve el cliente asíncrono del servicio RUC/DNI ligado al event loop actual
+    """
+    loop = asyncio.get_running_loop()
+    client, _ = _lookup_clients.get(loop, (None, None))
+
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            base_url=settings.LOOKUP_API_URL,
+            headers={"Authorization": f"Bearer {settings.LOOKUP_API_TOKEN}"},
+            timeout=httpx.Timeout(
+                settings.LOOKUP_API_TIMEOUT,
+                connect=settings.LOOKUP_API_CONNECT_TIMEOUT
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.LOOKUP_API_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LOOKUP_API_MAX_KEEPALIVE
+            ),
+        )
+        closer = _close_with_loop(client)
+        await closer.__anext__()
+        _lookup_clients[loop] = (client, closer)
+
+    return client
+
+async def lookup_document(kind, number):
+    """
+    Consulta el servicio externo (kind = "ruc" | "dni") sin bloquear el worker
+    """
+    client = await get_lookup_client()
+    return await client.get(f"/{kind}/{number}")
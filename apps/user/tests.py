@@ -1,3 +1,177 @@
+import json
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache, caches
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from apps.tramite.models import Agency, Area, UserArea
+
+from .models import GlobalPermission, Module, User, UserPermission
+from .services import get_lookup_client
+
+# Usuarios en el listado: más que el tamaño de página por defecto (5)
+ROWS = 12
+
+PAGE_SIZES = (5, 100)
+
+def seed_user_fixture():
+    """
+    Árbol de módulos, administrador y usuarios con permisos, permisos globales y áreas
+    """
+    agency = Agency.objects.create(name="Andahuaylas")
+    areas = [
+        Area.objects.create(name=f"Área {n}", code=f"{n:03d}", agency=agency)
+        for n in range(1, 4)
+    ]
+
+    modules = []
+    for n in range(3):
+        parent = Module.objects.create(name=f"Módulo {n}", code=f"mod{n}", order=n)
+        modules.append(parent)
+        for c in range(3):
+            modules.append(Module.objects.create(
+                name=f"Opción {n}.{c}", code=f"mod{n}_{c}", order=c, parent=parent
+            ))
+
+    admin = User.objects.create_user(
+        email="admin@example.com", username="admin", password="secret",
+        name="Admin", agency=agency, is_staff=True, is_admin=True,
+    )
+
+    for user in [admin] + [
+        User.objects.create_user(
+            email=f"user{n}@example.com", username=f"user{n}", password="secret",
+            name=f"Usuario {n}", agency=agency,
+        )
+        for n in range(ROWS)
+    ]:
+        GlobalPermission.objects.create(user=user, allowed_actions=["view", "create"])
+        UserPermission.objects.bulk_create([
+            UserPermission(user=user, module=module)
+            for module in modules if module.parent_id
+        ])
+        for area in areas[:2]:
+            UserArea.objects.create(user=user, area=area)
+
+    return {"agency": agency, "areas": areas, "admin": admin}
+
+class UserQueryCountTests(TestCase):
+    """
+    Tope de consultas SQL por endpoint; los listados cuestan lo mismo con 5 y con 100 filas
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_user_fixture()
+        cls.token = Token.objects.create(user=cls.data["admin"])
+
+    def setUp(self):
+        cache.clear()
+        caches["throttle"].clear()
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def request(self, method, url, data=None, **extra):
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data, **extra)
+
+        return response, len(ctx.captured_queries)
+
+    def assertMaxQueries(self, limit, method, url, data=None, status=200, **extra):
+
+        response, count = self.request(method, url, data, **extra)
+
+        self.assertEqual(response.status_code, status, response.content[:500])
+        self.assertLessEqual(count, limit, f"{method.upper()} {url}: {count} consultas (máximo {limit})")
+
+        return response
+
+    def assertListQueries(self, limit, url, params=None):
+
+        counts = {}
+        for page_size in PAGE_SIZES:
+            response, counts[page_size] = self.request("get", url, {**(params or {}), "page_size": page_size})
+            self.assertEqual(response.status_code, 200, response.content[:500])
+
+        self.assertEqual(
+            counts[PAGE_SIZES[0]], counts[PAGE_SIZES[-1]],
+            f"{url}: las consultas dependen del tamaño de página {counts}"
+        )
+        self.assertLessEqual(counts[PAGE_SIZES[-1]], limit, f"{url}: {counts} (máximo {limit})")
+
+    def test_users(self):
+
+        self.assertListQueries(6, "/user/users/")
+
+        user = User.objects.get(username="user0")
+        self.assertMaxQueries(6, "get", f"/user/users/{user.id}/")
+        self.assertMaxQueries(6, "patch", f"/user/users/{user.id}/toggles/", {"can_view_options": True})
+
+    def test_modules(self):
+
+        self.assertListQueries(4, "/user/modules/")
+        self.assertListQueries(2, "/user/user-permissions/", {"user": self.data["admin"].id})
+
+    def test_session(self):
+
+        self.client.credentials()
+        self.assertMaxQueries(
+            6, "post", "/user/login/", {"username": "user0", "password": "secret"}
+        )
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.assertMaxQueries(1, "get", "/user/protected/")
+        self.assertMaxQueries(6, "get", "/user/me/")
+        self.assertMaxQueries(2, "post", "/user/logout/")
+
+    @mock.patch("apps.user.views.lookup_document")
+    def test_document_lookups(self, lookup_document):
+
+        upstream = mock.Mock(status_code=200)
+        upstream.json.return_value = {"numero": "20100000001", "nombre": "EMPRESA SAC"}
+        lookup_document.return_value = upstream
+
+        self.client.credentials()
+        self.assertMaxQueries(0, "get", "/user/ruc/20100000001")
+        self.assertMaxQueries(0, "get", "/user/dni/12345678")
+
+        # Error del servicio con cuerpo JSON: se reenvía su código
+        upstream.status_code = 404
+        upstream.json.return_value = {"message": "No encontrado"}
+        for url in ("/user/ruc/20100000001", "/user/dni/12345678"):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+        # Cuerpo que no es JSON: 502 con el texto recibido
+        upstream.status_code = 502
+        upstream.json.side_effect = json.JSONDecodeError("Expecting value", "", 0)
+        upstream.text = "<html>Bad Gateway</html>"
+        for url in ("/user/ruc/20100000001", "/user/dni/12345678"):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 502)
+                self.assertIn("Bad Gateway", response.json()["error"])
+
+    def test_lookup_client_closed_with_its_loop(self):
+
+        clients = []
+
+        async def lookup():
+            client = await get_lookup_client()
+            # Un cliente por loop
+            self.assertIs(await get_lookup_client(), client)
+            clients.append(client)
+
+        # Como en WSGI: un event loop por petición
+        async_to_sync(lookup)()
+        async_to_sync(lookup)()
 
-# Create your tests here.
+        self.assertIsNot(clients[0], clients[1])
+        self.assertTrue(all(client.is_closed for client in clients))
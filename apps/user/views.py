@@ -1,17 +1,21 @@
 from django.contrib.auth import authenticate
+from django.http import JsonResponse
+from django.views import View
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework import status
+from rest_framework import status, exceptions
 from rest_framework.decorators import action
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.pagination import PageNumberPagination
 from .serializers import UserSerializer, ModuleSerializer, UserPermissionSerializer, UserToggleSerializer
 from .models import User, Module, UserPermission
 from apps.tramite.models import UserArea
-from .services import get_allowed_modules
-import requests
+from apps.tramite.core.throttling import acheck_throttle
+from .services import get_allowed_modules, lookup_document
+import httpx
+import math
 
 class CustomPagination(PageNumberPagination):
 
@@ -19,6 +23,16 @@ class CustomPagination(PageNumberPagination):
     page_size_query_param = 'page_size'  # Permite cambiar el tamaño desde la URL
     max_page_size = 100  # Tamaño máximo permitido
 
+def with_user_relations(queryset):
+    """
+    Relaciones que recorre UserSerializer (evita una consulta por usuario)
+    """
+    return (
+        queryset
+        .select_related("agency", "global_permissions")
+        .prefetch_related("permissions", "user_areas__area")
+    )
+
 class LoginView(APIView):
 
     permission_classes = [AllowAny]
@@ -115,65 +129,83 @@ class ProtectedView(APIView):
 
         return Response({"message": "Accediste a una ruta protegida"}, status=200)
     
-class RucApiView(APIView):
+def throttled_response(wait):
+
+    detail = exceptions.Throttled(wait).detail
+
+    return JsonResponse(
+        {"error": detail},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={"Retry-After": str(math.ceil(wait))},
+    )
+
+class RucApiView(View):
 
-    authentication_classes = [] 
-    permission_classes = []    
+    # ⚡ Vista asíncrona: la espera al servicio externo no ocupa un hilo del worker
 
-    def get(self, request, number):
+    async def get(self, request, number):
 
-        # Construcción del endpoint y encabezados
-        url = f"https://apifoxperu.net/api/ruc/{number}"
-        token = "JDuaRQyRDjiD6a6NpMXdRHoKiOfsUxksnbFRNNK0"
-        headers = {"Authorization": f"Bearer {token}"}
+        # 🚦 Rechazo inmediato si la IP agotó su presupuesto de consultas
+        wait = await acheck_throttle(request, "lookup")
+        if wait is not None:
+            return throttled_response(wait)
 
         try:
             # Solicitud al servicio externo
-            response = requests.get(url, headers=headers, timeout=10)
+            response = await lookup_document("ruc", number)
 
             # Validar respuesta
             if response.status_code == 200:
-                return Response(response.json())
+                return JsonResponse(response.json(), safe=False)
             else:
-                return Response(
+                return JsonResponse(
                     {"error": f"Error al consultar el servicio externo. details {response.json()}"}, status=response.status_code,
                 )
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             # Manejo de excepciones en caso de error de conexión o tiempo de espera
-            return Response(
+            return JsonResponse(
                 {"error": f"Error al conectar con el servicio externo. details {str(e)}"},
                 status=status.HTTP_503_SERVICE_UNAVAILABLE,
             )
+        except ValueError:
+            # Respuesta que no es JSON (p. ej. la página HTML de un 502 o un 429 vacío)
+            return JsonResponse(
+                {"error": f"Respuesta inválida del servicio externo. details {response.text[:500]}"},
+                status=status.HTTP_502_BAD_GATEWAY,
+            )
         
-class DniApiView(APIView):
+class DniApiView(View):
 
-    authentication_classes = [] 
-    permission_classes = []    
-    
-    def get(self, request, number):
+    async def get(self, request, number):
 
-        # Construcción del endpoint y encabezados
-        url = f"https://apifoxperu.net/api/dni/{number}"
-        token = "JDuaRQyRDjiD6a6NpMXdRHoKiOfsUxksnbFRNNK0"
-        headers = {"Authorization": f"Bearer {token}"}
+        # 🚦 Rechazo inmediato si la IP agotó su presupuesto de consultas
+        wait = await acheck_throttle(request, "lookup")
+        if wait is not None:
+            return throttled_response(wait)
 
         try:
             # Solicitud al servicio externo
-            response = requests.get(url, headers=headers, timeout=10)
+            response = await lookup_document("dni", number)
 
             # Validar respuesta
             if response.status_code == 200:
-                return Response(response.json())
+                return JsonResponse(response.json(), safe=False)
             else:
-                return Response(
-                    response.json(), status=response.status_code,
+                return JsonResponse(
+                    response.json(), status=response.status_code, safe=False,
                 )
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             # Manejo de excepciones en caso de error de conexión o tiempo de espera
-            return Response(
+            return JsonResponse(
                 {"error": f"Error al conectar con el servicio externo. details {str(e)}"},
                 status=status.HTTP_503_SERVICE_UNAVAILABLE,
             )
+        except ValueError:
+            # Respuesta que no es JSON (p. ej. la página HTML de un 502 o un 429 vacío)
+            return JsonResponse(
+                {"error": f"Respuesta inválida del servicio externo. details {response.text[:500]}"},
+                status=status.HTTP_502_BAD_GATEWAY,
+            )
         
 class UserViewSet(ModelViewSet):
 
@@ -187,11 +219,11 @@ class UserViewSet(ModelViewSet):
 
         # 🧩 Superusuario global (staff=True, tenant=None)
         if user.is_staff:
-            return User.objects.all().order_by('id')
+            return with_user_relations(User.objects.all().order_by('id'))
 
         # 🧩 Administrador de tenant (is_admin=True, tenant=X)
         elif user.is_admin:
-            return User.objects.exclude(is_staff=True).order_by('id')
+            return with_user_relations(User.objects.exclude(is_staff=True).order_by('id'))
 
         # 🧩 Usuario normal (solo si quieres permitirle verse a sí mismo)
         # elif not user.is_admin and user.tenant is not None:
@@ -224,7 +256,7 @@ class UserViewSet(ModelViewSet):
 
 class ModuleViewSet(ModelViewSet):
 
-    queryset = Module.objects.all().order_by('id')
+    queryset = Module.objects.all().prefetch_related("children__children").order_by('id')
     serializer_class = ModuleSerializer
 
 class UserPermissionViewSet(ModelViewSet):
@@ -248,7 +280,7 @@ class MeView(APIView):
         user = request.user
 
         # módulos permitidos (incluye padres)
-        root_modules = get_allowed_modules(user)
+        root_modules = get_allowed_modules(user).prefetch_related("children__children")
         module_tree = ModuleSerializer(root_modules, many=True).data
 
         user_data = {
@@ -32,6 +32,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'rest_framework',
     'rest_framework.authtoken',
@@ -47,14 +48,17 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
 
+    'apps.tramite.core.middleware.RequestMetricsMiddleware',
     "corsheaders.middleware.CorsMiddleware",
     'django.middleware.security.SecurityMiddleware',
+    'apps.tramite.core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.tramite.core.middleware.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'tramite.urls'
@@ -79,6 +83,29 @@ REST_FRAMEWORK = {
         "rest_framework.authentication.TokenAuthentication",
     ),
     "EXCEPTION_HANDLER": "apps.tramite.core.exceptions.custom_exception_handler",
+    # JSON con orjson (fechas en America/Lima, Decimal, UUID, textos lazy)
+    "DEFAULT_RENDERER_CLASSES": (
+        "apps.tramite.core.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "apps.tramite.core.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
+    # IP del cliente para los límites: proxies de confianza delante de Django. Con 0 se
+    # usa REMOTE_ADDR y se ignora X-Forwarded-For (lo puede enviar cualquier cliente);
+    # detrás del nginx del mismo host, NUM_PROXIES=1
+    "NUM_PROXIES": int(os.environ.get("NUM_PROXIES", "0")),
+    # Presupuestos por IP de los endpoints públicos (token bucket)
+    "DEFAULT_THROTTLE_RATES": {
+        "public": "300/min",
+        "virtual_create": "20/hour",
+        "tracking": "30/min",
+        "schedule": "60/min",
+        "lookup": "20/min",
+        "reference": "120/min",
+    },
 }
 
 
@@ -91,14 +118,154 @@ WSGI_APPLICATION = 'tramite.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'tramite',
-        'USER': 'postgres',
-        'PASSWORD': 'curo',
-        'HOST': 'localhost',
-        'PORT': '5432',
+        'NAME': os.environ.get('DB_NAME', 'tramite'),
+        'USER': os.environ.get('DB_USER', 'postgres'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'curo'),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        # Conexiones persistentes (psycopg2): se reutilizan entre peticiones
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
     }
 }
 
+# Pool nativo de conexiones (Django 5.1+ con psycopg 3).
+# Si solo está instalado psycopg2 se mantienen las conexiones persistentes.
+# Con CONN_HEALTH_CHECKS, Django valida cada conexión del pool antes de entregarla.
+
+try:
+    import psycopg  # noqa: F401
+    import psycopg_pool
+except ImportError:
+    psycopg_pool = None
+
+if psycopg_pool and os.environ.get('DB_POOL', '1') == '1':
+    # Con pool, Django exige CONN_MAX_AGE = 0 (la conexión vuelve al pool al cerrar)
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+        'timeout': int(os.environ.get('DB_POOL_TIMEOUT', '10')),
+        'max_idle': int(os.environ.get('DB_POOL_MAX_IDLE', '300')),
+    }
+
+# Réplica de lectura (opcional). Para pruebas locales basta una segunda base
+# en el mismo servidor: DB_REPLICA_HOST=localhost DB_REPLICA_NAME=tramite_replica
+
+if os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ.get('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'USER': os.environ.get('DB_REPLICA_USER', DATABASES['default']['USER']),
+        'PASSWORD': os.environ.get('DB_REPLICA_PASSWORD', DATABASES['default']['PASSWORD']),
+        'HOST': os.environ.get('DB_REPLICA_HOST'),
+        'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'OPTIONS': {**DATABASES['default']['OPTIONS']},
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['apps.tramite.core.routers.ReplicaRouter']
+
+DATABASE_REPLICA_ALIAS = 'replica'
+
+# Segundos que un usuario sigue leyendo de la principal tras una escritura
+DATABASE_REPLICA_STICKY_SECONDS = int(os.environ.get('DB_REPLICA_STICKY_SECONDS', '5'))
+
+# Vistas de solo lectura que pueden atenderse desde la réplica
+DATABASE_REPLICA_VIEWS = [
+    'apps.tramite.views.ProcedureListAPIView',
+    'apps.tramite.views.ProcedureListVirtualesAPIView',
+    'apps.tramite.views.VirtualFlowListAPIView',
+    'apps.tramite.views.PendingFlowListAPIView',
+    'apps.tramite.views.ReceptionFlowListAPIView',
+    'apps.tramite.views.SentFlowListAPIView',
+    'apps.tramite.views.CopyInboxFlowListAPIView',
+    'apps.tramite.views.FinalizeFlowListAPIView',
+    'apps.tramite.views.RejectInboxAPIView',
+    'apps.tramite.views.ObservedInboxAPIView',
+    'apps.tramite.views.FlowDashboardAPIView',
+    'apps.tramite.views.ProcedureHistoryPDFAPIView',
+    'apps.tramite.views.ProcedureHistorySimplicadoPDFAPIView',
+    'apps.tramite.views.TicketProcedureAPIView',
+]
+
+# Cache (local-memory por defecto: una por proceso, no se comparte entre workers).
+# Con varios workers debe ser compartida (p. ej. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# y CACHE_LOCATION=redis://...): la usan read-your-writes de la réplica y refcache
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'tramite'),
+    }
+}
+
+# Cache del rate limiting: local-memory por defecto; en producción una cache
+# compartida, p. ej. THROTTLE_CACHE_BACKEND=django.core.cache.backends.db.DatabaseCache
+# con THROTTLE_CACHE_LOCATION=throttle_cache (manage.py createcachetable)
+
+CACHES['throttle'] = {
+    'BACKEND': os.environ.get('THROTTLE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+    'LOCATION': os.environ.get('THROTTLE_CACHE_LOCATION', 'throttle'),
+}
+
+THROTTLE_CACHE_ALIAS = 'throttle'
+
+# Segundos que se conserva la línea de tiempo pública de un código de seguimiento
+TRACKING_CACHE_TIMEOUT = 60 * 60
+
+# Segundos máximos que un worker sirve datos de referencia sin reconstruirlos
+# (cota de seguridad si la cache default no es compartida entre procesos)
+REFERENCE_DATA_MAX_AGE = 5 * 60
+
+# Compresión de respuestas (br / gzip)
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_BROTLI_QUALITY = 5
+COMPRESSION_GZIP_LEVEL = 6
+
+# Métricas por petición (consultas SQL, tiempos, tamaño)
+# QUERY_BUDGET: consultas máximas por petición antes de registrar un aviso;
+# cada vista puede fijar el suyo con el atributo `query_budget`
+QUERY_BUDGET = int(os.environ.get('QUERY_BUDGET', '25'))
+REQUEST_METRICS_SERVER_TIMING = os.environ.get('REQUEST_METRICS_SERVER_TIMING', '1') == '1'
+
+# /metrics (Prometheus): con METRICS_TOKEN se exige "Authorization: Bearer <token>";
+# sin token solo se atiende a METRICS_ALLOWED_IPS, vacía por defecto (cerrado).
+# Detrás de un proxy en el mismo host (nginx) toda petición llega desde 127.0.0.1:
+# en ese caso usar METRICS_TOKEN, no la lista de IPs. Con varios workers exportar
+# PROMETHEUS_MULTIPROC_DIR (ver apps/tramite/core/metrics.py)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = [ip for ip in os.environ.get('METRICS_ALLOWED_IPS', '').split(',') if ip]
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {
+            'format': '%(asctime)s %(levelname)s %(name)s %(message)s',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'simple',
+        },
+    },
+    'loggers': {
+        'apps.request': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+        'apps.attachments': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -159,11 +326,57 @@ MEDIA_URL = "/media/"
 
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Adjuntos de trámites (media/procedures/): solo por /api/files/<id>/download/.
+# PROTECTED_MEDIA_SERVER: "nginx" (X-Accel-Redirect), "apache" (X-Sendfile) o "" (Django)
+PROTECTED_MEDIA_SERVER = os.environ.get("PROTECTED_MEDIA_SERVER", "")
+PROTECTED_MEDIA_INTERNAL_URL = os.environ.get("PROTECTED_MEDIA_INTERNAL_URL", "/protected-media/")
+# Segundos de validez de los enlaces firmados que devuelve file_url
+PROTECTED_MEDIA_URL_MAX_AGE = int(os.environ.get("PROTECTED_MEDIA_URL_MAX_AGE", 60 * 60))
+
+# Subidas por partes (/api/uploads/): tamaño máximo por parte y por archivo.
+# En nginx: client_max_body_size >= UPLOAD_CHUNK_SIZE y proxy_request_buffering off
+UPLOAD_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024))
+UPLOAD_MAX_SIZE = int(os.environ.get("UPLOAD_MAX_SIZE", 1024 * 1024 * 1024))
+# Horas sin actividad tras las que purge_stale_uploads borra una subida no asociada
+UPLOAD_STALE_HOURS = int(os.environ.get("UPLOAD_STALE_HOURS", 24))
+
+# Exportaciones CSV / XLSX: filas por lectura del cursor del lado del servidor
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", 2000))
+
+# Reportes (refresh_reports): los movimientos de los últimos minutos se vuelven a procesar
+# en la siguiente ejecución (transacciones aún sin confirmar al leer el checkpoint)
+REPORTS_SETTLE_MINUTES = int(os.environ.get("REPORTS_SETTLE_MINUTES", 10))
+# Análisis de tiempos (analyze_flows): filas por bloque al cargar los movimientos en pandas
+ANALYTICS_CHUNK_SIZE = int(os.environ.get("ANALYTICS_CHUNK_SIZE", 50_000))
+
+# Días sin movimientos tras los que archive_procedures archiva un trámite cerrado
+FLOW_ARCHIVE_DAYS = int(os.environ.get("FLOW_ARCHIVE_DAYS", 365))
+
+# Procesamiento de adjuntos en segundo plano (miniatura, páginas, PDF optimizado).
+# ATTACHMENT_PROCESSING_ASYNC=0 lo ejecuta en línea al confirmar la transacción
+ATTACHMENT_PROCESSING_ASYNC = os.environ.get("ATTACHMENT_PROCESSING_ASYNC", "1") == "1"
+ATTACHMENT_WORKERS = int(os.environ.get("ATTACHMENT_WORKERS", 2))
+ATTACHMENT_THUMBNAIL_SIZE = 320
+ATTACHMENT_OPTIMIZE = os.environ.get("ATTACHMENT_OPTIMIZE", "1") == "1"
+ATTACHMENT_OPTIMIZE_MAX_SIDE = 2000
+ATTACHMENT_OPTIMIZE_QUALITY = 70
+# La variante optimizada se guarda solo si pesa al menos este porcentaje menos
+ATTACHMENT_OPTIMIZE_MIN_SAVING = 0.2
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Servicio externo de consulta RUC / DNI
+
+LOOKUP_API_URL = os.environ.get("LOOKUP_API_URL", "https://apifoxperu.net/api")
+LOOKUP_API_TOKEN = os.environ.get("LOOKUP_API_TOKEN", "JDuaRQyRDjiD6a6NpMXdRHoKiOfsUxksnbFRNNK0")
+LOOKUP_API_TIMEOUT = 10
+LOOKUP_API_CONNECT_TIMEOUT = 5
+LOOKUP_API_MAX_CONNECTIONS = 200
+LOOKUP_API_MAX_KEEPALIVE = 50
+
 # EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
 
 # EMAIL_HOST = "smtp-relay.brevo.com"
@@ -1,7 +1,11 @@
+import re
+
 from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
-from django.conf.urls.static import static
+from django.urls import path, include, re_path
+from django.views.static import serve
+
+from apps.tramite.core.metrics import metrics_view
 
 urlpatterns = [
     # Admin (tenant principal)
@@ -13,8 +17,23 @@ urlpatterns = [
     # Endpoints públicos de tu API
     path('api/', include('apps.tramite.urls')),
 
+    # Métricas Prometheus
+    path('metrics', metrics_view, name='metrics'),
+
 ]
 
-# Archivos media
+# Archivos media públicos (solo DEBUG): lista explícita, el logo de los PDF y los logos
+# de Company. serve() normaliza la ruta después del regex ("//", ".."), así que no basta
+# con excluir procedures/: los adjuntos y subidas se descargan por /api/files/<id>/download/
+# con control de acceso
+
+public_media = [
+    re_path(
+        r"^%s(?P<path>logo\.png|logos/[^/]+)$" % re.escape(settings.MEDIA_URL.lstrip("/")),
+        serve,
+        {"document_root": settings.MEDIA_ROOT},
+    ),
+]
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+if settings.DEBUG:
+    urlpatterns += public_media